@@ -0,0 +1,46 @@
+"""
+Hands work finished on other threads back to a selectors-based server loop; shared by
+server/server.py and server/server_binary_4.py.
+"""
+
+import queue
+import selectors
+import socket
+
+class LoopCallbacks:
+    """
+    Work finished on other threads (storage writer, password pool) is handed back to the
+    selector thread through a queue; a byte on a socketpair registered with sel wakes
+    sel.select() up, and the loop then calls run_pending().
+    """
+    def __init__(self, sel):
+        self.pending = queue.Queue()
+        self.wakeup_recv, self.wakeup_send = socket.socketpair()
+        self.wakeup_recv.setblocking(False)
+        self.wakeup_send.setblocking(False)
+        sel.register(self.wakeup_recv, selectors.EVENT_READ, data=None)
+
+    def call_in_loop(self, fn, *args):
+        """Schedules fn(*args) to run on the selector thread; safe to call from any thread."""
+        self.pending.put((fn, args))
+        try:
+            self.wakeup_send.send(b"\0")
+        except BlockingIOError:
+            pass  # Wakeup already pending
+
+    def run_pending(self):
+        try:
+            while self.wakeup_recv.recv(1024):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                fn, args = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                fn(*args)
+            except Exception as e:
+                # Callbacks reply to their client themselves; this only catches their bugs.
+                print(f"Callback error: {e}")
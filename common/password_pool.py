@@ -0,0 +1,82 @@
+"""
+Bounded bcrypt process pool shared by the chat servers (server/, gRPC/ and replication/
+put common/ on sys.path and import it from here).
+"""
+
+import multiprocessing
+import threading
+import time
+from concurrent import futures
+
+import bcrypt
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool already has max_pending jobs queued or running."""
+
+class PasswordPool:
+    """
+    Runs bcrypt hashing and checking in a bounded process pool, so a burst of logins burns
+    CPU in worker processes instead of holding the GIL on the server's RPC threads or event
+    loop. At most max_pending jobs may be queued or running; past that, submit raises
+    PasswordPoolBusy and the caller sheds the request. metrics() reports counts and job latency.
+    """
+    def __init__(self, workers=2, max_pending=64):
+        # spawn, not fork: a forked worker would inherit the server's threads (gRPC, storage
+        # writer) and sockets mid-use.
+        self.executor = futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def hash(self, password):
+        """Future resolving to the bcrypt hash of password (a str)."""
+        return self.submit(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt())
+
+    def check(self, password, password_hash):
+        """Future resolving to whether password matches password_hash."""
+        return self.submit(bcrypt.checkpw, password.encode("utf-8"), password_hash)
+
+    def submit(self, fn, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy(f"{self.pending} password jobs pending")
+            self.pending += 1
+            self.submitted += 1
+        started = time.time()
+        try:
+            future = self.executor.submit(fn, *args)
+        except:
+            with self.lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(lambda _: self.finished(started))
+        return future
+
+    def finished(self, started):
+        elapsed = time.time() - started
+        with self.lock:
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "avg_ms": 1000 * self.total_seconds / self.completed if self.completed else 0.0,
+                "max_ms": 1000 * self.max_seconds,
+            }
+
+    def close(self):
+        print(f"Password pool: {self.metrics()}")
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,93 @@
+"""
+Group-commit storage writer shared by the chat servers in server/ and gRPC/.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent import futures
+
+class StorageWriter:
+    """
+    Single writer thread that owns the write connection. Handlers submit a function that
+    takes a cursor and get back a Future; everything queued within max_delay_ms (up to
+    max_batch_size requests) runs in one transaction with a single commit, and the futures
+    resolve once that commit returns. The connection runs with synchronous=FULL, so each
+    commit is fsynced and a resolved future means the write is durable; the group shares
+    that one fsync. Each request runs under its own savepoint so one failing write (e.g. a
+    duplicate username) does not roll back the rest of the group.
+    """
+    def __init__(self, db_path, max_batch_size=256, max_delay_ms=2):
+        self.db_path = db_path
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, write):
+        future = futures.Future()
+        self.requests.put((write, future))
+        return future
+
+    def execute(self, write):
+        """Submits a write and waits until it is committed; re-raises its exception."""
+        return self.submit(write).result()
+
+    def stop(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        cursor = conn.cursor()
+        stopping = False
+        while not stopping:
+            item = self.requests.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            results = []
+            try:
+                cursor.execute("BEGIN")
+                for write, future in batch:
+                    cursor.execute("SAVEPOINT request")
+                    try:
+                        results.append((future, write(cursor), None))
+                        cursor.execute("RELEASE request")
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO request")
+                        cursor.execute("RELEASE request")
+                        results.append((future, None, e))
+                cursor.execute("COMMIT")
+            except Exception as e:
+                print(f"Group commit of {len(batch)} writes failed: {e}")
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                for write, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        conn.close()
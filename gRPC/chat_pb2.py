@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x04\x63hat\":\n\x14\x43reateAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"9\n\x15\x43reateAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"J\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x17\n\x0funread_messages\x18\x03 \x01(\x05\"!\n\rLogoutRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"2\n\x0eLogoutResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"4\n\x13ListAccountsRequest\x12\x0f\n\x07pattern\x18\x01 \x01(\t\x12\x0c\n\x04page\x18\x02 \x01(\x05\"(\n\x14ListAccountsResponse\x12\x10\n\x08\x61\x63\x63ounts\x18\x01 \x03(\t\"A\n\x12SendMessageRequest\x12\x0e\n\x06sender\x18\x01 \x01(\t\x12\n\n\x02to\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"7\n\x13SendMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"Y\n\x0b\x43hatMessage\x12\n\n\x02id\x18\x01 \x01(\x03\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\n\n\x02to\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\"6\n\x13ReadMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\";\n\x14ReadMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\"\'\n\x13ListMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\";\n\x14ListMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\">\n\x15\x44\x65leteMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bmessage_ids\x18\x02 \x03(\x03\":\n\x16\x44\x65leteMessagesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"(\n\x14\x44\x65leteAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"9\n\x15\x44\x65leteAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"$\n\x10SubscribeRequest\x12\x10\n\x08username\x18\x01 \x01(\t2\xb0\x05\n\x0b\x43hatService\x12H\n\rCreateAccount\x12\x1a.chat.CreateAccountRequest\x1a\x1b.chat.CreateAccountResponse\x12\x30\n\x05Login\x12\x12.chat.LoginRequest\x1a\x13.chat.LoginResponse\x12\x33\n\x06Logout\x12\x13.chat.LogoutRequest\x1a\x14.chat.LogoutResponse\x12\x45\n\x0cListAccounts\x12\x19.chat.ListAccountsRequest\x1a\x1a.chat.ListAccountsResponse\x12\x42\n\x0bSendMessage\x12\x18.chat.SendMessageRequest\x1a\x19.chat.SendMessageResponse\x12\x45\n\x0cReadMessages\x12\x19.chat.ReadMessagesRequest\x1a\x1a.chat.ReadMessagesResponse\x12\x45\n\x0cListMessages\x12\x19.chat.ListMessagesRequest\x1a\x1a.chat.ListMessagesResponse\x12K\n\x0e\x44\x65leteMessages\x12\x1b.chat.DeleteMessagesRequest\x1a\x1c.chat.DeleteMessagesResponse\x12H\n\rDeleteAccount\x12\x1a.chat.DeleteAccountRequest\x1a\x1b.chat.DeleteAccountResponse\x12@\n\x11SubscribeMessages\x12\x16.chat.SubscribeRequest\x1a\x11.chat.ChatMessage0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x04\x63hat\":\n\x14\x43reateAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"9\n\x15\x43reateAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"J\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x17\n\x0funread_messages\x18\x03 \x01(\x05\"!\n\rLogoutRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"2\n\x0eLogoutResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"4\n\x13ListAccountsRequest\x12\x0f\n\x07pattern\x18\x01 \x01(\t\x12\x0c\n\x04page\x18\x02 \x01(\x05\"(\n\x14ListAccountsResponse\x12\x10\n\x08\x61\x63\x63ounts\x18\x01 \x03(\t\"A\n\x12SendMessageRequest\x12\x0e\n\x06sender\x18\x01 \x01(\t\x12\n\n\x02to\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"7\n\x13SendMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"Y\n\x0b\x43hatMessage\x12\n\n\x02id\x18\x01 \x01(\x03\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\n\n\x02to\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\"6\n\x13ReadMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\";\n\x14ReadMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\";\n\x12\x41\x63kMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bmessage_ids\x18\x02 \x03(\x03\"F\n\x13\x41\x63kMessagesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\r\n\x05\x61\x63ked\x18\x03 \x01(\x05\"\'\n\x13ListMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\";\n\x14ListMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\">\n\x15\x44\x65leteMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bmessage_ids\x18\x02 \x03(\x03\":\n\x16\x44\x65leteMessagesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"(\n\x14\x44\x65leteAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"9\n\x15\x44\x65leteAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"$\n\x10SubscribeRequest\x12\x10\n\x08username\x18\x01 \x01(\t2\xf4\x05\n\x0b\x43hatService\x12H\n\rCreateAccount\x12\x1a.chat.CreateAccountRequest\x1a\x1b.chat.CreateAccountResponse\x12\x30\n\x05Login\x12\x12.chat.LoginRequest\x1a\x13.chat.LoginResponse\x12\x33\n\x06Logout\x12\x13.chat.LogoutRequest\x1a\x14.chat.LogoutResponse\x12\x45\n\x0cListAccounts\x12\x19.chat.ListAccountsRequest\x1a\x1a.chat.ListAccountsResponse\x12\x42\n\x0bSendMessage\x12\x18.chat.SendMessageRequest\x1a\x19.chat.SendMessageResponse\x12\x45\n\x0cReadMessages\x12\x19.chat.ReadMessagesRequest\x1a\x1a.chat.ReadMessagesResponse\x12\x42\n\x0b\x41\x63kMessages\x12\x18.chat.AckMessagesRequest\x1a\x19.chat.AckMessagesResponse\x12\x45\n\x0cListMessages\x12\x19.chat.ListMessagesRequest\x1a\x1a.chat.ListMessagesResponse\x12K\n\x0e\x44\x65leteMessages\x12\x1b.chat.DeleteMessagesRequest\x1a\x1c.chat.DeleteMessagesResponse\x12H\n\rDeleteAccount\x12\x1a.chat.DeleteAccountRequest\x1a\x1b.chat.DeleteAccountResponse\x12@\n\x11SubscribeMessages\x12\x16.chat.SubscribeRequest\x1a\x11.chat.ChatMessage0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -57,20 +57,24 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_READMESSAGESREQUEST']._serialized_end=719
   _globals['_READMESSAGESRESPONSE']._serialized_start=721
   _globals['_READMESSAGESRESPONSE']._serialized_end=780
-  _globals['_LISTMESSAGESREQUEST']._serialized_start=782
-  _globals['_LISTMESSAGESREQUEST']._serialized_end=821
-  _globals['_LISTMESSAGESRESPONSE']._serialized_start=823
-  _globals['_LISTMESSAGESRESPONSE']._serialized_end=882
-  _globals['_DELETEMESSAGESREQUEST']._serialized_start=884
-  _globals['_DELETEMESSAGESREQUEST']._serialized_end=946
-  _globals['_DELETEMESSAGESRESPONSE']._serialized_start=948
-  _globals['_DELETEMESSAGESRESPONSE']._serialized_end=1006
-  _globals['_DELETEACCOUNTREQUEST']._serialized_start=1008
-  _globals['_DELETEACCOUNTREQUEST']._serialized_end=1048
-  _globals['_DELETEACCOUNTRESPONSE']._serialized_start=1050
-  _globals['_DELETEACCOUNTRESPONSE']._serialized_end=1107
-  _globals['_SUBSCRIBEREQUEST']._serialized_start=1109
-  _globals['_SUBSCRIBEREQUEST']._serialized_end=1145
-  _globals['_CHATSERVICE']._serialized_start=1148
-  _globals['_CHATSERVICE']._serialized_end=1836
+  _globals['_ACKMESSAGESREQUEST']._serialized_start=782
+  _globals['_ACKMESSAGESREQUEST']._serialized_end=841
+  _globals['_ACKMESSAGESRESPONSE']._serialized_start=843
+  _globals['_ACKMESSAGESRESPONSE']._serialized_end=913
+  _globals['_LISTMESSAGESREQUEST']._serialized_start=915
+  _globals['_LISTMESSAGESREQUEST']._serialized_end=954
+  _globals['_LISTMESSAGESRESPONSE']._serialized_start=956
+  _globals['_LISTMESSAGESRESPONSE']._serialized_end=1015
+  _globals['_DELETEMESSAGESREQUEST']._serialized_start=1017
+  _globals['_DELETEMESSAGESREQUEST']._serialized_end=1079
+  _globals['_DELETEMESSAGESRESPONSE']._serialized_start=1081
+  _globals['_DELETEMESSAGESRESPONSE']._serialized_end=1139
+  _globals['_DELETEACCOUNTREQUEST']._serialized_start=1141
+  _globals['_DELETEACCOUNTREQUEST']._serialized_end=1181
+  _globals['_DELETEACCOUNTRESPONSE']._serialized_start=1183
+  _globals['_DELETEACCOUNTRESPONSE']._serialized_end=1240
+  _globals['_SUBSCRIBEREQUEST']._serialized_start=1242
+  _globals['_SUBSCRIBEREQUEST']._serialized_end=1278
+  _globals['_CHATSERVICE']._serialized_start=1281
+  _globals['_CHATSERVICE']._serialized_end=2037
 # @@protoc_insertion_point(module_scope)
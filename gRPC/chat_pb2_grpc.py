@@ -65,6 +65,11 @@ class ChatServiceStub(object):
                 request_serializer=chat__pb2.ReadMessagesRequest.SerializeToString,
                 response_deserializer=chat__pb2.ReadMessagesResponse.FromString,
                 _registered_method=True)
+        self.AckMessages = channel.unary_unary(
+                '/chat.ChatService/AckMessages',
+                request_serializer=chat__pb2.AckMessagesRequest.SerializeToString,
+                response_deserializer=chat__pb2.AckMessagesResponse.FromString,
+                _registered_method=True)
         self.ListMessages = channel.unary_unary(
                 '/chat.ChatService/ListMessages',
                 request_serializer=chat__pb2.ListMessagesRequest.SerializeToString,
@@ -127,6 +132,13 @@ class ChatServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AckMessages(self, request, context):
+        """Confirms the client received pushed messages; only then are they marked delivered.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ListMessages(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -146,7 +158,10 @@ class ChatServiceServicer(object):
         raise NotImplementedError('Method not implemented!')
 
     def SubscribeMessages(self, request, context):
-        """Missing associated documentation comment in .proto file."""
+        """Pushed messages stay unread until acked with AckMessages. Ends with RESOURCE_EXHAUSTED
+        if the client falls too far behind; it should then fetch the missed (still unread)
+        messages with ReadMessages and resubscribe.
+        """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
@@ -184,6 +199,11 @@ def add_ChatServiceServicer_to_server(servicer, server):
                     request_deserializer=chat__pb2.ReadMessagesRequest.FromString,
                     response_serializer=chat__pb2.ReadMessagesResponse.SerializeToString,
             ),
+            'AckMessages': grpc.unary_unary_rpc_method_handler(
+                    servicer.AckMessages,
+                    request_deserializer=chat__pb2.AckMessagesRequest.FromString,
+                    response_serializer=chat__pb2.AckMessagesResponse.SerializeToString,
+            ),
             'ListMessages': grpc.unary_unary_rpc_method_handler(
                     servicer.ListMessages,
                     request_deserializer=chat__pb2.ListMessagesRequest.FromString,
@@ -378,6 +398,33 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def AckMessages(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/chat.ChatService/AckMessages',
+            chat__pb2.AckMessagesRequest.SerializeToString,
+            chat__pb2.AckMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ListMessages(request,
             target,
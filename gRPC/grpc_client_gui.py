@@ -8,6 +8,10 @@ import grpc
 import chat_pb2
 import chat_pb2_grpc
 
+def evicted(error):
+    """Whether a RESOURCE_EXHAUSTED subscription error is an eviction for falling behind."""
+    return dict(error.trailing_metadata() or ()).get("subscription-evicted") == "1"
+
 class ChatClient:
     def __init__(self, root, host, port):
         self.root = root
@@ -33,27 +37,71 @@ class ChatClient:
     # ------------------------------ Instant Message Subscription ------------------------------
     def subscribe_instant_messages(self):
         subscribe_request = chat_pb2.SubscribeRequest(username=self.username)
+        backoff = 1
+        while True:
+            try:
+                for chat_msg in self.stub.SubscribeMessages(subscribe_request):
+                    backoff = 1
+                    # Instead of calling update_chat directly, enqueue the message.
+                    self.incoming_queue.put({
+                        "type": "message",
+                        "id": chat_msg.id,
+                        "from": chat_msg.sender,
+                        "message": chat_msg.message
+                    })
+                return
+            except grpc.RpcError as ex:
+                if ex.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                    if evicted(ex):
+                        if self.fetch_missed_messages():
+                            # We fell behind and the server dropped the stream; caught up, so resubscribe.
+                            continue
+                    else:
+                        # Too many subscriptions open on the server: retry, backing off.
+                        time.sleep(backoff)
+                        backoff = min(backoff * 2, 30)
+                        continue
+                error_message = f"[INFO] Instant message subscription ended: {ex}"
+                self.root.after(0, lambda: self.update_chat(error_message))
+                return
+
+    def fetch_missed_messages(self, batch=50):
+        """Pulls unread messages with ReadMessages into the incoming queue; False if that fails."""
         try:
-            for chat_msg in self.stub.SubscribeMessages(subscribe_request):
-                # Instead of calling update_chat directly, enqueue the message.
-                self.incoming_queue.put({
-                    "type": "message",
-                    "from": chat_msg.sender,
-                    "message": chat_msg.message
-                })
-        except grpc.RpcError as ex:
-            error_message = f"[INFO] Instant message subscription ended: {ex}"
-            self.root.after(0, lambda: self.update_chat(error_message))
+            while True:
+                response = self.stub.ReadMessages(chat_pb2.ReadMessagesRequest(username=self.username, count=batch), timeout=5)
+                for msg in response.messages:
+                    self.incoming_queue.put({"type": "message", "from": msg.sender, "message": msg.message})
+                if len(response.messages) < batch:
+                    return True
+        except grpc.RpcError:
+            return False
 
 
 
     def poll_incoming(self):
         """Called periodically in the GUI thread to process any instant messages."""
+        pushed_ids = []
         while not self.incoming_queue.empty():
             response = self.incoming_queue.get_nowait()
             self.handle_server_response(response)
+            if "id" in response:
+                pushed_ids.append(response["id"])
+        if pushed_ids:
+            self.ack_messages(pushed_ids)
         self.root.after(100, self.poll_incoming)
 
+    def ack_messages(self, message_ids):
+        """
+        Acks pushed messages once shown, one batch per poll, without blocking the GUI. If the
+        ack is lost, the messages stay unread and come back from ReadMessages.
+        """
+        request = chat_pb2.AckMessagesRequest(username=self.username, message_ids=message_ids)
+        try:
+            self.stub.AckMessages.future(request, timeout=5)
+        except Exception:
+            pass
+
     # ------------------------------ Response Handling ------------------------------
     def handle_server_response(self, response):
         """
@@ -1,16 +1,44 @@
 import argparse
+import asyncio
+import os
+import sys
 import time
 import sqlite3
-import bcrypt
-import queue
-from concurrent import futures
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import grpc
 import chat_pb2
 import chat_pb2_grpc
 
+# Modules shared by the chat servers live in common/ at the repo root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from password_pool import PasswordPool, PasswordPoolBusy
+from storage_writer import StorageWriter
+
 # ----- Database Setup (using SQLite) -----
-conn = sqlite3.connect("chat.db", check_same_thread=False)
+DB_PATH = "chat.db"
+
+# Each thread that reads gets its own connection instead of sharing one cursor. Handlers never query on the
+# event loop: reads run on the reader pool (see read()) and writes go through the storage writer (common/storage_writer.py).
+_local = threading.local()
+
+def get_connection():
+    """
+    Returns this thread's connection, opening it on first use. WAL mode lets readers run
+    alongside the writer; synchronous=NORMAL drops the per-commit fsync (still safe against
+    application crashes in WAL mode) and the busy timeout makes writers wait for the lock.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _local.conn = conn
+    return conn
+
+conn = get_connection()
 cursor = conn.cursor()
 
 # Create users table
@@ -33,10 +61,160 @@ cursor.execute('''
         delivered INTEGER DEFAULT 0
     )
 ''')
+
+# Indexes for the per-recipient unread and list queries (sorted by id) and the sender/recipient delete.
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient_delivered ON messages (recipient, delivered, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages (recipient, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender)")
 conn.commit()
 
-# Global dictionary to store active subscription queues for instant delivery.
-active_subscriptions = {}
+# Writes go through a single group-committing writer; bcrypt runs in the password pool. Both started in serve().
+storage_writer = None
+password_pool = None
+
+# Per-user count of undelivered messages, so Login doesn't COUNT(*) on every call.
+unread_counts = {}
+unread_lock = threading.Lock()
+
+def rebuild_unread_counts():
+    """Reloads unread_counts from the messages table (at startup)."""
+    cursor.execute("SELECT recipient, COUNT(*) FROM messages WHERE delivered = 0 GROUP BY recipient")
+    with unread_lock:
+        unread_counts.clear()
+        unread_counts.update(cursor.fetchall())
+
+def adjust_unread(username, delta):
+    with unread_lock:
+        count = unread_counts.get(username, 0) + delta
+        if count > 0:
+            unread_counts[username] = count
+        else:
+            unread_counts.pop(username, None)
+
+rebuild_unread_counts()
+
+# Status a subscription ends with when it is evicted; the client reads what it missed with
+# ReadMessages (the messages are still unread in the database) and then resubscribes.
+SUBSCRIPTION_OVERFLOW = "Subscription fell behind and was closed; fetch missed messages with ReadMessages and resubscribe"
+# Trailing metadata marking that eviction, so clients can tell it from a concurrency limit,
+# which fails with the same RESOURCE_EXHAUSTED status but calls for backing off.
+EVICTED_KEY = "subscription-evicted"
+
+class Subscription:
+    """
+    One open SubscribeMessages stream. depth() is how many pushed messages are still queued
+    for it. close() ends the stream after what is already queued; evict() ends it right away,
+    dropping anything still queued.
+    """
+    def __init__(self, username):
+        self.username = username
+        self.queue = asyncio.Queue()
+        self.evicted = False
+
+    def put(self, item):
+        self.queue.put_nowait(item)
+
+    async def get(self):
+        item = await self.queue.get()
+        return None if self.evicted else item
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def close(self):
+        self.put(None)
+
+    def evict(self):
+        self.evicted = True
+        self.put(None)
+
+class SubscriptionRegistry:
+    """
+    Open subscription streams by username. A user can be subscribed from several devices at
+    once, and publish() fans each message out to all of their streams. A stream that already
+    has max_queue messages waiting is a slow consumer: it is evicted, so nothing more is
+    pushed or buffered for it, and its stream ends with RESOURCE_EXHAUSTED (SUBSCRIPTION_OVERFLOW).
+    metrics() reports queue depth, pushes, evictions and dropped pushes.
+    The server runs on one asyncio event loop, so this is only touched from it.
+    """
+    def __init__(self, max_queue=256):
+        self.max_queue = max_queue
+        self.streams = {}
+        self.pushed = 0
+        self.evicted = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def __contains__(self, username):
+        return bool(self.streams.get(username))
+
+    def add(self, subscription):
+        self.streams.setdefault(subscription.username, []).append(subscription)
+
+    def remove(self, subscription):
+        streams = self.streams.get(subscription.username, [])
+        if subscription in streams:
+            streams.remove(subscription)
+            if not streams:
+                del self.streams[subscription.username]
+
+    def publish(self, username, item):
+        """Queues item on every stream of username; returns how many streams took it."""
+        delivered = 0
+        for subscription in list(self.streams.get(username, [])):
+            depth = subscription.depth()
+            if depth >= self.max_queue:
+                # Everything queued plus this message is dropped from the stream.
+                self.evicted += 1
+                self.dropped += depth + 1
+                print(f"Evicting slow subscriber {username}: {depth} messages queued; {self.metrics()}")
+                self.remove(subscription)
+                subscription.evict()
+            else:
+                subscription.put(item)
+                delivered += 1
+                self.max_depth = max(self.max_depth, depth + 1)
+        self.pushed += delivered
+        return delivered
+
+    def close_user(self, username):
+        """Ends every stream of username (logout, account deleted); returns whether there were any."""
+        streams = self.streams.pop(username, [])
+        for subscription in streams:
+            subscription.close()
+        return bool(streams)
+
+    def metrics(self):
+        depths = [subscription.depth() for streams in self.streams.values() for subscription in streams]
+        return {
+            "streams": len(depths),
+            "queued": sum(depths),
+            "deepest": max(depths, default=0),
+            "max_depth": self.max_depth,
+            "pushed": self.pushed,
+            "evicted": self.evicted,
+            "dropped": self.dropped,
+        }
+
+# Open subscription streams for instant delivery, possibly several per user.
+active_subscriptions = SubscriptionRegistry()
+
+# Accounts returned per ListAccounts page.
+ACCOUNTS_PAGE_SIZE = 100
+
+async def write(fn):
+    """Runs fn(cursor) on the storage writer and waits, without blocking the loop, for its commit."""
+    return await asyncio.wrap_future(storage_writer.submit(fn))
+
+def _run_read(fn):
+    return fn(get_connection().cursor())
+
+async def read(fn):
+    """Runs fn(cursor) on a reader thread, so a slow query stalls neither streams nor other RPCs."""
+    return await asyncio.get_running_loop().run_in_executor(reader_pool, _run_read, fn)
+
+def fetchall(query, params):
+    return lambda cursor: cursor.execute(query, params).fetchall()
 
 # ----- Helper Function -----
 def log_message_size(sender, recipient, message):
@@ -48,83 +226,88 @@ def log_message_size(sender, recipient, message):
 
 class ChatServiceServicer(chat_pb2_grpc.ChatServiceServicer):
 
-    def CreateAccount(self, request, context):
+    async def CreateAccount(self, request, context):
         username = request.username
         password = request.password
         if not username or not password:
             return chat_pb2.CreateAccountResponse(success=False, message="Username and password required")
         
-        # Hash password using bcrypt
-        password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+        # Hash password using bcrypt (in the password pool, off the RPC thread)
         try:
-            cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
-            conn.commit()
+            password_hash = await asyncio.wrap_future(password_pool.hash(password))
+        except PasswordPoolBusy:
+            return chat_pb2.CreateAccountResponse(success=False, message="Server busy, please try again")
+        try:
+            await write(lambda cursor: cursor.execute(
+                "INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash)))
             return chat_pb2.CreateAccountResponse(success=True, message="Registration successful")
         except sqlite3.IntegrityError:
             return chat_pb2.CreateAccountResponse(success=False, message="Username already exists")
 
-    def Login(self, request, context):
+    async def Login(self, request, context):
         username = request.username
         password = request.password
         if not username or not password:
             return chat_pb2.LoginResponse(success=False, message="Username and password required", unread_messages=0)
         
-        cursor.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
-        if result and bcrypt.checkpw(password.encode("utf-8"), result[0]):
+        result = await read(lambda cursor: cursor.execute(
+            "SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone())
+        try:
+            password_ok = result is not None and await asyncio.wrap_future(password_pool.check(password, result[0]))
+        except PasswordPoolBusy:
+            return chat_pb2.LoginResponse(success=False, message="Server busy, please try again", unread_messages=0)
+        if password_ok:
             # Do not mark as online here; instant delivery only works if the client subscribes.
-            cursor.execute("SELECT COUNT(*) FROM messages WHERE recipient = ? AND delivered = 0", (username,))
-            unread_count = cursor.fetchone()[0]
+            unread_count = unread_counts.get(username, 0)
             return chat_pb2.LoginResponse(success=True, message="Login successful", unread_messages=unread_count)
         else:
             return chat_pb2.LoginResponse(success=False, message="Invalid username or password", unread_messages=0)
 
-    def Logout(self, request, context):
+    async def Logout(self, request, context):
         username = request.username
-        # Remove subscription if it exists.
-        if username in active_subscriptions:
-            del active_subscriptions[username]
+        # Ends all of the user's open streams.
+        if active_subscriptions.close_user(username):
             return chat_pb2.LogoutResponse(success=True, message="Logged out successfully")
         else:
             return chat_pb2.LogoutResponse(success=False, message="User not subscribed to instant messages")
 
-    def SendMessage(self, request, context):
+    async def SendMessage(self, request, context):
         sender = request.sender
         recipient = request.to
         message_text = request.message
         if not sender or not recipient or not message_text:
             return chat_pb2.SendMessageResponse(success=False, message="Missing sender, recipient, or message")
 
-        # Insert the message into the database with delivered flag = 0.
-        cursor.execute(
-            "INSERT INTO messages (sender, recipient, message, delivered) VALUES (?, ?, ?, 0)",
-            (sender, recipient, message_text)
-        )
-        conn.commit()
+        # Stored unread even if pushed: it only counts as delivered once the client acks it
+        # (AckMessages), so a push lost with a dropped stream is still returned by ReadMessages.
+        def insert(cursor):
+            cursor.execute(
+                "INSERT INTO messages (sender, recipient, message, delivered) VALUES (?, ?, ?, 0)",
+                (sender, recipient, message_text)
+            )
+            return cursor.lastrowid
+
+        # Resumes once the group commit containing this insert is durable.
+        message_id = await write(insert)
         log_message_size(sender, recipient, message_text)
+        adjust_unread(recipient, 1)
 
-        # Check if the recipient has an active subscription for instant delivery.
-        if recipient in active_subscriptions:
-            # Mark this message as delivered.
-            message_id = cursor.lastrowid
-            cursor.execute("UPDATE messages SET delivered = 1 WHERE id = ?", (message_id,))
-            conn.commit()
-            # Create a ChatMessage object to send instantly.
-            chat_msg = chat_pb2.ChatMessage(
-                id=message_id,
-                sender=sender,
-                to=recipient,
-                message=message_text,
-                timestamp=int(time.time())
-            )
-            # Push the message into the recipient's subscription queue.
-            active_subscriptions[recipient].put(chat_msg)
+        # Create a ChatMessage object to send instantly.
+        chat_msg = chat_pb2.ChatMessage(
+            id=message_id,
+            sender=sender,
+            to=recipient,
+            message=message_text,
+            timestamp=int(time.time())
+        )
+        # Push the message to each of the recipient's streams.
+        if active_subscriptions.publish(recipient, chat_msg):
             return chat_pb2.SendMessageResponse(success=True, message="Message delivered instantly")
         else:
             # The recipient is not actively subscribed; message remains for offline retrieval.
             return chat_pb2.SendMessageResponse(success=True, message="Message stored for offline delivery")
 
-    def ReadMessages(self, request, context):
+    async def ReadMessages(self, request, context):
         """
         Retrieves unread (undelivered) messages for a given user, up to a specified limit.
         Once retrieved, the messages are marked as delivered.
@@ -136,16 +319,17 @@ class ChatServiceServicer(chat_pb2_grpc.ChatServiceServicer):
             return chat_pb2.ReadMessagesResponse(messages=[])
 
         # Retrieve unread messages for the user.
-        cursor.execute(
+        messages = await read(fetchall(
             "SELECT id, sender, message, timestamp FROM messages WHERE recipient = ? AND delivered = 0 ORDER BY id ASC LIMIT ?",
             (username, limit)
-        )
-        messages = cursor.fetchall()
+        ))
         message_ids = [msg[0] for msg in messages]
         if message_ids:
             placeholders = ",".join("?" for _ in message_ids)
-            cursor.execute(f"UPDATE messages SET delivered = 1 WHERE id IN ({placeholders})", message_ids)
-            conn.commit()
+            # Only count rows this call flipped, in case a concurrent read already delivered some.
+            delivered = await write(lambda cursor: cursor.execute(
+                f"UPDATE messages SET delivered = 1 WHERE id IN ({placeholders}) AND delivered = 0", message_ids).rowcount)
+            adjust_unread(username, -delivered)
 
         message_list = []
         for msg in messages:
@@ -164,45 +348,68 @@ class ChatServiceServicer(chat_pb2_grpc.ChatServiceServicer):
             message_list.append(chat_msg)
         return chat_pb2.ReadMessagesResponse(messages=message_list)
 
-    def SubscribeMessages(self, request, context):
+    async def SubscribeMessages(self, request, context):
         """
         Server-streaming RPC that registers an instant-delivery subscription for the user.
         Only messages sent while the user is subscribed will be pushed instantly.
+        Each subscriber just awaits its queue, so an idle stream costs no thread and no wakeups.
         """
         username = request.username
         print(f"User {username} subscribed for instant messages.")
-        # Create a subscription queue for this user.
-        sub_queue = queue.Queue()
-        active_subscriptions[username] = sub_queue
+        # Another device of the same user gets its own stream alongside this one.
+        subscription = Subscription(username)
+        active_subscriptions.add(subscription)
 
         try:
-            while context.is_active():
-                try:
-                    chat_msg = sub_queue.get(timeout=1)
-                    yield chat_msg
-                except queue.Empty:
-                    continue
+            while True:
+                chat_msg = await subscription.get()
+                if chat_msg is None:  # Logged out, account deleted or evicted
+                    if subscription.evicted:
+                        await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, SUBSCRIPTION_OVERFLOW, trailing_metadata=((EVICTED_KEY, "1"),))
+                    return
+                yield chat_msg
         finally:
-            if username in active_subscriptions:
-                del active_subscriptions[username]
+            # A client disconnect cancels this coroutine. Anything still queued stays unread.
+            active_subscriptions.remove(subscription)
+
+    async def AckMessages(self, request, context):
+        """
+        Marks pushed messages delivered once the client confirms it received them. Clients
+        ack in batches, so this is one UPDATE per batch through the group-committing writer.
+        """
+        username = request.username
+        message_ids = list(request.message_ids)
+        if not username or not message_ids:
+            return chat_pb2.AckMessagesResponse(success=True, acked=0)
+        placeholders = ",".join("?" for _ in message_ids)
+        # Only count rows still unread, in case ReadMessages or another device got there first.
+        acked = await write(lambda cursor: cursor.execute(
+            f"UPDATE messages SET delivered = 1 WHERE id IN ({placeholders}) AND recipient = ? AND delivered = 0",
+            message_ids + [username]).rowcount)
+        adjust_unread(username, -acked)
+        return chat_pb2.AckMessagesResponse(success=True, acked=acked)
 
-    def ListAccounts(self, request, context):
+    async def ListAccounts(self, request, context):
         pattern = request.pattern if request.pattern else "%"
         pattern = f"%{pattern}%"
-        cursor.execute("SELECT username FROM users WHERE username LIKE ?", (pattern,))
-        accounts = [row[0] for row in cursor.fetchall()]
+        # The LIKE scan can't use an index, so it runs on a reader thread and returns one page at a time.
+        offset = max(request.page, 0) * ACCOUNTS_PAGE_SIZE
+        rows = await read(fetchall(
+            "SELECT username FROM users WHERE username LIKE ? ORDER BY username LIMIT ? OFFSET ?",
+            (pattern, ACCOUNTS_PAGE_SIZE, offset)))
+        accounts = [row[0] for row in rows]
         return chat_pb2.ListAccountsResponse(accounts=accounts)
 
-    def ListMessages(self, request, context):
+    async def ListMessages(self, request, context):
         username = request.username
         if not username:
             return chat_pb2.ListMessagesResponse(messages=[])
         
-        cursor.execute(
-        "SELECT id, sender, message, timestamp, delivered FROM messages WHERE recipient = ? ORDER BY id ASC",
-        (username,)
-        )
-        messages = cursor.fetchall()
+        # The whole history can be large; fetching it on a reader thread keeps the loop free meanwhile.
+        messages = await read(fetchall(
+            "SELECT id, sender, message, timestamp, delivered FROM messages WHERE recipient = ? ORDER BY id ASC",
+            (username,)
+        ))
         message_list = []
         for msg in messages:
             try:
@@ -219,7 +426,7 @@ class ChatServiceServicer(chat_pb2_grpc.ChatServiceServicer):
             message_list.append(chat_msg)
         return chat_pb2.ListMessagesResponse(messages=message_list)
 
-    def DeleteMessages(self, request, context):
+    async def DeleteMessages(self, request, context):
         username = request.username
         message_ids = request.message_ids
         if not username or not message_ids:
@@ -228,43 +435,160 @@ class ChatServiceServicer(chat_pb2_grpc.ChatServiceServicer):
         placeholders = ",".join("?" for _ in message_ids)
         query = f"DELETE FROM messages WHERE id IN ({placeholders}) AND recipient = ?"
         params = list(message_ids) + [username]
-        cursor.execute(query, params)
-        conn.commit()
+
+        def delete(cursor):
+            cursor.execute(f"SELECT COUNT(*) FROM messages WHERE id IN ({placeholders}) AND recipient = ? AND delivered = 0", params)
+            unread_deleted = cursor.fetchone()[0]
+            cursor.execute(query, params)
+            return unread_deleted
+
+        adjust_unread(username, -(await write(delete)))
         return chat_pb2.DeleteMessagesResponse(success=True, message="Messages deleted successfully")
 
-    def DeleteAccount(self, request, context):
+    async def DeleteAccount(self, request, context):
         username = request.username
         if not username:
             return chat_pb2.DeleteAccountResponse(success=False, message="Username required")
         
-        # Delete all messages associated with the user.
-        cursor.execute("DELETE FROM messages WHERE sender = ? OR recipient = ?", (username, username))
-        # Delete the user.
-        cursor.execute("DELETE FROM users WHERE username = ?", (username,))
-        conn.commit()
-        # Remove any active subscription if present.
-        if username in active_subscriptions:
-            del active_subscriptions[username]
+        def delete(cursor):
+            # Unread messages this user sent to others disappear with the account too.
+            cursor.execute(
+                "SELECT recipient, COUNT(*) FROM messages WHERE sender = ? AND recipient != ? AND delivered = 0 GROUP BY recipient",
+                (username, username)
+            )
+            unread_sent = cursor.fetchall()
+            # Delete all messages associated with the user.
+            cursor.execute("DELETE FROM messages WHERE sender = ? OR recipient = ?", (username, username))
+            # Delete the user.
+            cursor.execute("DELETE FROM users WHERE username = ?", (username,))
+            return unread_sent
+
+        for recipient, count in await write(delete):
+            adjust_unread(recipient, -count)
+        with unread_lock:
+            unread_counts.pop(username, None)
+        # End any open subscription streams.
+        active_subscriptions.close_user(username)
         return chat_pb2.DeleteAccountResponse(success=True, message="Account deleted successfully. You are now logged out.")
 
+# ----- Serving limits -----
+def parse_method_limits(values):
+    """Turns ["SubscribeMessages=8", ...] (from --method-limit) into {"SubscribeMessages": 8}."""
+    limits = {}
+    for value in values or []:
+        method, _, limit = value.partition("=")
+        limits[method.strip()] = int(limit)
+    return limits
+
+def server_options(keepalive_time_ms, keepalive_timeout_ms):
+    """Keepalive options for the server: ping idle clients and drop the ones that stop answering."""
+    return [
+        ("grpc.keepalive_time_ms", keepalive_time_ms),
+        ("grpc.keepalive_timeout_ms", keepalive_timeout_ms),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        ("grpc.http2.min_recv_ping_interval_without_data_ms", 5000),
+    ]
+
+class ConcurrencyLimitInterceptor(grpc.aio.ServerInterceptor):
+    """
+    Caps how many calls of a given method may be open at once, e.g. {"SubscribeMessages": 1000}.
+    A call over its limit fails fast with RESOURCE_EXHAUSTED. Everything runs on the event
+    loop, so a plain counter is enough.
+    """
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self.active = {method: 0 for method in self.limits}
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        if handler is None or method not in self.limits:
+            return handler
+        if handler.response_streaming:
+            field = "stream_stream" if handler.request_streaming else "unary_stream"
+            wrapper = self.limit_stream(getattr(handler, field), method)
+        else:
+            field = "stream_unary" if handler.request_streaming else "unary_unary"
+            wrapper = self.limit_unary(getattr(handler, field), method)
+        return handler._replace(**{field: wrapper})
+
+    async def acquire(self, method, context):
+        if self.active[method] >= self.limits[method]:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Too many concurrent {method} calls ({self.limits[method]})")
+        self.active[method] += 1
+
+    def limit_unary(self, behavior, method):
+        async def call(request, context):
+            await self.acquire(method, context)
+            try:
+                return await behavior(request, context)
+            finally:
+                self.active[method] -= 1
+        return call
+
+    def limit_stream(self, behavior, method):
+        async def call(request, context):
+            await self.acquire(method, context)
+            try:
+                async for response in behavior(request, context):
+                    yield response
+            finally:
+                self.active[method] -= 1
+        return call
+
 # ----- gRPC Server Starter -----
-def serve(host, port):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+async def serve(host, port, commit_interval_ms=2, auth_workers=2, auth_max_pending=64, reader_workers=4,
+                max_concurrent_rpcs=None, method_limits=None, keepalive_time_ms=20000, keepalive_timeout_ms=10000):
+    global storage_writer, password_pool, reader_pool
+    storage_writer = StorageWriter(DB_PATH, max_delay_ms=commit_interval_ms)
+    reader_pool = ThreadPoolExecutor(max_workers=reader_workers, thread_name_prefix="reader")
+    password_pool = PasswordPool(auth_workers, auth_max_pending)
+    # grpc.aio: every RPC is a coroutine on one event loop, so open streams don't hold threads
+    # and there is no worker pool to size; max_concurrent_rpcs and method_limits bound the load instead.
+    server = grpc.aio.server(
+        interceptors=[ConcurrencyLimitInterceptor(method_limits or {})],
+        options=server_options(keepalive_time_ms, keepalive_timeout_ms),
+        maximum_concurrent_rpcs=max_concurrent_rpcs,
+    )
     chat_pb2_grpc.add_ChatServiceServicer_to_server(ChatServiceServicer(), server)
     binding_str = f"{host}:{port}"
     server.add_insecure_port(binding_str)
     print(f"gRPC chat server starting on {binding_str}...")
-    server.start()
+    await server.start()
     try:
-        server.wait_for_termination()
-    except KeyboardInterrupt:
+        await server.wait_for_termination()
+    finally:
         print("Server shutting down...")
-        server.stop(0)
+        await server.stop(0)
+        print(f"Subscriptions: {active_subscriptions.metrics()}")
+        storage_writer.stop()
+        password_pool.close()
+        reader_pool.shutdown()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="gRPC Chat Server")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Server IP address (default: 0.0.0.0)")
     parser.add_argument("--port", type=int, default=50051, help="Server port number (default: 50051)")
+    parser.add_argument("--commit-interval-ms", type=float, default=2,
+                        help="How long the storage writer gathers writes into one commit (default: 2)")
+    parser.add_argument("--auth-workers", type=int, default=2, help="Processes used for bcrypt hashing/checking (default: 2)")
+    parser.add_argument("--auth-max-pending", type=int, default=64,
+                        help="Max queued + running password jobs before auth requests are rejected (default: 64)")
+    parser.add_argument("--reader-workers", type=int, default=4, help="Threads that run database reads (default: 4)")
+    parser.add_argument("--max-concurrent-rpcs", type=int, default=None, help="Reject RPCs beyond this many in flight (default: unlimited)")
+    parser.add_argument("--method-limit", action="append", metavar="METHOD=N",
+                        help="Max concurrent calls of one method, e.g. SubscribeMessages=1000 (repeatable)")
+    parser.add_argument("--keepalive-time-ms", type=int, default=20000, help="Server keepalive ping interval (default: 20000)")
+    parser.add_argument("--keepalive-timeout-ms", type=int, default=10000, help="Keepalive ping ack timeout (default: 10000)")
+    parser.add_argument("--subscription-queue-size", type=int, default=256,
+                        help="Messages queued per subscription stream before it is evicted as a slow consumer (default: 256)")
     args = parser.parse_args()
+    active_subscriptions.max_queue = args.subscription_queue_size
 
-    serve(args.host, args.port)
+    try:
+        asyncio.run(serve(args.host, args.port, args.commit_interval_ms, args.auth_workers, args.auth_max_pending,
+                          args.reader_workers, args.max_concurrent_rpcs, parse_method_limits(args.method_limit),
+                          args.keepalive_time_ms, args.keepalive_timeout_ms))
+    except KeyboardInterrupt:
+        pass
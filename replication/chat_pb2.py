@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x04\x63hat\"\x12\n\x10GetLeaderRequest\"+\n\x11GetLeaderResponse\x12\x16\n\x0eleader_address\x18\x01 \x01(\t\"\x11\n\x0fGetStateRequest\"N\n\x10GetStateResponse\x12\x19\n\x05users\x18\x01 \x03(\x0b\x32\n.chat.User\x12\x1f\n\x08messages\x18\x02 \x03(\x0b\x32\r.chat.Message\"/\n\x04User\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rpassword_hash\x18\x02 \x01(\x0c\"o\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x11\n\trecipient\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\x12\x11\n\tdelivered\x18\x06 \x01(\x05\"*\n\x10HeartbeatRequest\x12\x16\n\x0esender_address\x18\x01 \x01(\t\"$\n\x11HeartbeatResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\")\n\x0f\x45lectionRequest\x12\x16\n\x0esender_address\x18\x01 \x01(\t\"\x1e\n\x10\x45lectionResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\"*\n\x10SetLeaderRequest\x12\x16\n\x0eleader_address\x18\x01 \x01(\t\"$\n\x11SetLeaderResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"%\n\x10ReplicateRequest\x12\x11\n\toperation\x18\x01 \x01(\t\"$\n\x11ReplicateResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\":\n\x14\x43reateAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"9\n\x15\x43reateAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"J\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x17\n\x0funread_messages\x18\x03 \x01(\x05\"!\n\rLogoutRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"2\n\x0eLogoutResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"4\n\x13ListAccountsRequest\x12\x0f\n\x07pattern\x18\x01 \x01(\t\x12\x0c\n\x04page\x18\x02 \x01(\x05\"(\n\x14ListAccountsResponse\x12\x10\n\x08\x61\x63\x63ounts\x18\x01 \x03(\t\"A\n\x12SendMessageRequest\x12\x0e\n\x06sender\x18\x01 \x01(\t\x12\n\n\x02to\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"7\n\x13SendMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"Y\n\x0b\x43hatMessage\x12\n\n\x02id\x18\x01 \x01(\x03\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\n\n\x02to\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\"6\n\x13ReadMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\";\n\x14ReadMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\"\'\n\x13ListMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\";\n\x14ListMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\">\n\x15\x44\x65leteMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bmessage_ids\x18\x02 \x03(\x03\":\n\x16\x44\x65leteMessagesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"(\n\x14\x44\x65leteAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"9\n\x15\x44\x65leteAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"$\n\x10SubscribeRequest\x12\x10\n\x08username\x18\x01 \x01(\t2\xa9\x06\n\x0b\x43hatService\x12H\n\rCreateAccount\x12\x1a.chat.CreateAccountRequest\x1a\x1b.chat.CreateAccountResponse\x12\x30\n\x05Login\x12\x12.chat.LoginRequest\x1a\x13.chat.LoginResponse\x12\x33\n\x06Logout\x12\x13.chat.LogoutRequest\x1a\x14.chat.LogoutResponse\x12\x45\n\x0cListAccounts\x12\x19.chat.ListAccountsRequest\x1a\x1a.chat.ListAccountsResponse\x12\x42\n\x0bSendMessage\x12\x18.chat.SendMessageRequest\x1a\x19.chat.SendMessageResponse\x12\x45\n\x0cReadMessages\x12\x19.chat.ReadMessagesRequest\x1a\x1a.chat.ReadMessagesResponse\x12\x45\n\x0cListMessages\x12\x19.chat.ListMessagesRequest\x1a\x1a.chat.ListMessagesResponse\x12K\n\x0e\x44\x65leteMessages\x12\x1b.chat.DeleteMessagesRequest\x1a\x1c.chat.DeleteMessagesResponse\x12H\n\rDeleteAccount\x12\x1a.chat.DeleteAccountRequest\x1a\x1b.chat.DeleteAccountResponse\x12@\n\x11SubscribeMessages\x12\x16.chat.SubscribeRequest\x1a\x11.chat.ChatMessage0\x01\x12<\n\tGetLeader\x12\x16.chat.GetLeaderRequest\x1a\x17.chat.GetLeaderResponse\x12\x39\n\x08GetState\x12\x15.chat.GetStateRequest\x1a\x16.chat.GetStateResponse2\x99\x02\n\x12ReplicationService\x12<\n\tHeartbeat\x12\x16.chat.HeartbeatRequest\x1a\x17.chat.HeartbeatResponse\x12@\n\x0fRequestElection\x12\x15.chat.ElectionRequest\x1a\x16.chat.ElectionResponse\x12<\n\tSetLeader\x12\x16.chat.SetLeaderRequest\x1a\x17.chat.SetLeaderResponse\x12\x45\n\x12ReplicateOperation\x12\x16.chat.ReplicateRequest\x1a\x17.chat.ReplicateResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x04\x63hat\"\x12\n\x10GetLeaderRequest\"X\n\x11GetLeaderResponse\x12\x16\n\x0eleader_address\x18\x01 \x01(\t\x12\x15\n\rapplied_index\x18\x02 \x01(\x03\x12\x14\n\x0cstaleness_ms\x18\x03 \x01(\x03\"\x11\n\x0fGetStateRequest\"N\n\x10GetStateResponse\x12\x19\n\x05users\x18\x01 \x03(\x0b\x32\n.chat.User\x12\x1f\n\x08messages\x18\x02 \x03(\x0b\x32\r.chat.Message\"D\n\x04User\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rpassword_hash\x18\x02 \x01(\x0c\x12\x13\n\x0bsession_key\x18\x03 \x01(\t\"o\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x11\n\trecipient\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\x12\x11\n\tdelivered\x18\x06 \x01(\x05\"O\n\x10HeartbeatRequest\x12\x16\n\x0esender_address\x18\x01 \x01(\t\x12\x15\n\rapplied_index\x18\x02 \x01(\x03\x12\x0c\n\x04term\x18\x03 \x01(\x03\"b\n\x11HeartbeatResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x16\n\x0elast_log_index\x18\x02 \x01(\x03\x12\x16\n\x0esnapshot_index\x18\x03 \x01(\x03\x12\x0c\n\x04term\x18\x04 \x01(\x03\"f\n\x0f\x45lectionRequest\x12\x16\n\x0esender_address\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x03\x12\x16\n\x0elast_log_index\x18\x03 \x01(\x03\x12\x15\n\rlast_log_term\x18\x04 \x01(\x03\",\n\x10\x45lectionResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\x12\x0c\n\x04term\x18\x02 \x01(\x03\"8\n\x10SetLeaderRequest\x12\x16\n\x0eleader_address\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x03\"$\n\x11SetLeaderResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"\xea\x02\n\x08LogEntry\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\r\n\x05index\x18\x02 \x01(\x03\x12/\n\x0e\x63reate_account\x18\x03 \x01(\x0b\x32\x15.chat.CreateAccountOpH\x00\x12+\n\x0csend_message\x18\x04 \x01(\x0b\x32\x13.chat.SendMessageOpH\x00\x12\x31\n\x0f\x64\x65lete_messages\x18\x05 \x01(\x0b\x32\x16.chat.DeleteMessagesOpH\x00\x12/\n\x0e\x64\x65lete_account\x18\x06 \x01(\x0b\x32\x15.chat.DeleteAccountOpH\x00\x12/\n\x0emark_delivered\x18\x07 \x01(\x0b\x32\x15.chat.MarkDeliveredOpH\x00\x12+\n\x0c\x65nd_sessions\x18\x08 \x01(\x0b\x32\x13.chat.EndSessionsOpH\x00\x12\x1b\n\x05no_op\x18\t \x01(\x0b\x32\n.chat.NoOpH\x00\x42\x04\n\x02op\"O\n\x0f\x43reateAccountOp\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rpassword_hash\x18\x02 \x01(\x0c\x12\x13\n\x0bsession_key\x18\x03 \x01(\t\"b\n\rSendMessageOp\x12\n\n\x02id\x18\x01 \x01(\x03\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x11\n\trecipient\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\"9\n\x10\x44\x65leteMessagesOp\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bmessage_ids\x18\x02 \x03(\x03\"#\n\x0f\x44\x65leteAccountOp\x12\x10\n\x08username\x18\x01 \x01(\t\"\x06\n\x04NoOp\"6\n\rEndSessionsOp\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bsession_key\x18\x02 \x01(\t\"7\n\x0fMarkDeliveredOp\x12$\n\x06ranges\x18\x01 \x03(\x0b\x32\x14.chat.DeliveredRange\"F\n\x0e\x44\x65liveredRange\x12\x11\n\trecipient\x18\x01 \x01(\t\x12\x10\n\x08\x66irst_id\x18\x02 \x01(\x03\x12\x0f\n\x07last_id\x18\x03 \x01(\x03\"7\n\x10ReplicateRequest\x12\x1d\n\x05\x65ntry\x18\x02 \x01(\x0b\x32\x0e.chat.LogEntryJ\x04\x08\x01\x10\x02\"$\n\x11ReplicateResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"\x9d\x01\n\x15ReplicateBatchRequest\x12\x1f\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x0e.chat.LogEntry\x12\x0c\n\x04term\x18\x02 \x01(\x03\x12\x15\n\rprev_log_term\x18\x03 \x01(\x03\x12\x16\n\x0eleader_address\x18\x04 \x01(\t\x12\x15\n\rapplied_index\x18\x05 \x01(\x03\x12\x0f\n\x07sent_at\x18\x06 \x01(\x01\"_\n\x16ReplicateBatchResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x12\n\nlast_index\x18\x02 \x01(\x03\x12\x0c\n\x04term\x18\x03 \x01(\x03\x12\x12\n\nlease_from\x18\x04 \x01(\x01\"D\n\x14GetStateSinceRequest\x12\x11\n\tlog_index\x18\x01 \x01(\x03\x12\x19\n\x11max_chunk_entries\x18\x02 \x01(\x05\"C\n\x08LogChunk\x12\x1f\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x0e.chat.LogEntry\x12\x16\n\x0elast_log_index\x18\x02 \x01(\x03\"%\n\x0fSnapshotRequest\x12\x12\n\nchunk_size\x18\x01 \x01(\x05\"\x84\x01\n\rSnapshotChunk\x12\x19\n\x05users\x18\x01 \x03(\x0b\x32\n.chat.User\x12\x1f\n\x08messages\x18\x02 \x03(\x0b\x32\r.chat.Message\x12\x1b\n\x13last_included_index\x18\x03 \x01(\x03\x12\x1a\n\x12last_included_term\x18\x04 \x01(\x03\":\n\x14\x43reateAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"9\n\x15\x43reateAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"{\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x17\n\x0funread_messages\x18\x03 \x01(\x05\x12\x15\n\rsession_token\x18\x04 \x01(\t\x12\x18\n\x10token_expires_at\x18\x05 \x01(\x03\"-\n\x14ResumeSessionRequest\x12\x15\n\rsession_token\x18\x01 \x01(\t\"!\n\rLogoutRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"2\n\x0eLogoutResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"N\n\x13ListAccountsRequest\x12\x0f\n\x07pattern\x18\x01 \x01(\t\x12\x0c\n\x04page\x18\x02 \x01(\x05\x12\x18\n\x10max_staleness_ms\x18\x03 \x01(\x05\"U\n\x14ListAccountsResponse\x12\x10\n\x08\x61\x63\x63ounts\x18\x01 \x03(\t\x12\x15\n\rapplied_index\x18\x02 \x01(\x03\x12\x14\n\x0cstaleness_ms\x18\x03 \x01(\x03\"A\n\x12SendMessageRequest\x12\x0e\n\x06sender\x18\x01 \x01(\t\x12\n\n\x02to\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"7\n\x13SendMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"Y\n\x0b\x43hatMessage\x12\n\n\x02id\x18\x01 \x01(\x03\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\n\n\x02to\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\"6\n\x13ReadMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\";\n\x14ReadMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\";\n\x12\x41\x63kMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bmessage_ids\x18\x02 \x03(\x03\"F\n\x13\x41\x63kMessagesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\r\n\x05\x61\x63ked\x18\x03 \x01(\x05\"A\n\x13ListMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x18\n\x10max_staleness_ms\x18\x02 \x01(\x05\"h\n\x14ListMessagesResponse\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\x12\x15\n\rapplied_index\x18\x02 \x01(\x03\x12\x14\n\x0cstaleness_ms\x18\x03 \x01(\x03\">\n\x15\x44\x65leteMessagesRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x13\n\x0bmessage_ids\x18\x02 \x03(\x03\":\n\x16\x44\x65leteMessagesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"(\n\x14\x44\x65leteAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"9\n\x15\x44\x65leteAccountResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"$\n\x10SubscribeRequest\x12\x10\n\x08username\x18\x01 \x01(\t2\xaf\x07\n\x0b\x43hatService\x12H\n\rCreateAccount\x12\x1a.chat.CreateAccountRequest\x1a\x1b.chat.CreateAccountResponse\x12\x30\n\x05Login\x12\x12.chat.LoginRequest\x1a\x13.chat.LoginResponse\x12@\n\rResumeSession\x12\x1a.chat.ResumeSessionRequest\x1a\x13.chat.LoginResponse\x12\x33\n\x06Logout\x12\x13.chat.LogoutRequest\x1a\x14.chat.LogoutResponse\x12\x45\n\x0cListAccounts\x12\x19.chat.ListAccountsRequest\x1a\x1a.chat.ListAccountsResponse\x12\x42\n\x0bSendMessage\x12\x18.chat.SendMessageRequest\x1a\x19.chat.SendMessageResponse\x12\x45\n\x0cReadMessages\x12\x19.chat.ReadMessagesRequest\x1a\x1a.chat.ReadMessagesResponse\x12\x42\n\x0b\x41\x63kMessages\x12\x18.chat.AckMessagesRequest\x1a\x19.chat.AckMessagesResponse\x12\x45\n\x0cListMessages\x12\x19.chat.ListMessagesRequest\x1a\x1a.chat.ListMessagesResponse\x12K\n\x0e\x44\x65leteMessages\x12\x1b.chat.DeleteMessagesRequest\x1a\x1c.chat.DeleteMessagesResponse\x12H\n\rDeleteAccount\x12\x1a.chat.DeleteAccountRequest\x1a\x1b.chat.DeleteAccountResponse\x12@\n\x11SubscribeMessages\x12\x16.chat.SubscribeRequest\x1a\x11.chat.ChatMessage0\x01\x12<\n\tGetLeader\x12\x16.chat.GetLeaderRequest\x1a\x17.chat.GetLeaderResponse\x12\x39\n\x08GetState\x12\x15.chat.GetStateRequest\x1a\x16.chat.GetStateResponse2\xb9\x04\n\x12ReplicationService\x12<\n\tHeartbeat\x12\x16.chat.HeartbeatRequest\x1a\x17.chat.HeartbeatResponse\x12@\n\x0fRequestElection\x12\x15.chat.ElectionRequest\x1a\x16.chat.ElectionResponse\x12<\n\tSetLeader\x12\x16.chat.SetLeaderRequest\x1a\x17.chat.SetLeaderResponse\x12\x45\n\x12ReplicateOperation\x12\x16.chat.ReplicateRequest\x1a\x17.chat.ReplicateResponse\x12K\n\x0eReplicateBatch\x12\x1b.chat.ReplicateBatchRequest\x1a\x1c.chat.ReplicateBatchResponse\x12R\n\x11ReplicationStream\x12\x1b.chat.ReplicateBatchRequest\x1a\x1c.chat.ReplicateBatchResponse(\x01\x30\x01\x12=\n\rGetStateSince\x12\x1a.chat.GetStateSinceRequest\x1a\x0e.chat.LogChunk0\x01\x12>\n\x0eStreamSnapshot\x12\x15.chat.SnapshotRequest\x1a\x13.chat.SnapshotChunk0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,73 +34,109 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_GETLEADERREQUEST']._serialized_start=20
   _globals['_GETLEADERREQUEST']._serialized_end=38
   _globals['_GETLEADERRESPONSE']._serialized_start=40
-  _globals['_GETLEADERRESPONSE']._serialized_end=83
-  _globals['_GETSTATEREQUEST']._serialized_start=85
-  _globals['_GETSTATEREQUEST']._serialized_end=102
-  _globals['_GETSTATERESPONSE']._serialized_start=104
-  _globals['_GETSTATERESPONSE']._serialized_end=182
-  _globals['_USER']._serialized_start=184
-  _globals['_USER']._serialized_end=231
-  _globals['_MESSAGE']._serialized_start=233
-  _globals['_MESSAGE']._serialized_end=344
-  _globals['_HEARTBEATREQUEST']._serialized_start=346
-  _globals['_HEARTBEATREQUEST']._serialized_end=388
-  _globals['_HEARTBEATRESPONSE']._serialized_start=390
-  _globals['_HEARTBEATRESPONSE']._serialized_end=426
-  _globals['_ELECTIONREQUEST']._serialized_start=428
-  _globals['_ELECTIONREQUEST']._serialized_end=469
-  _globals['_ELECTIONRESPONSE']._serialized_start=471
-  _globals['_ELECTIONRESPONSE']._serialized_end=501
-  _globals['_SETLEADERREQUEST']._serialized_start=503
-  _globals['_SETLEADERREQUEST']._serialized_end=545
-  _globals['_SETLEADERRESPONSE']._serialized_start=547
-  _globals['_SETLEADERRESPONSE']._serialized_end=583
-  _globals['_REPLICATEREQUEST']._serialized_start=585
-  _globals['_REPLICATEREQUEST']._serialized_end=622
-  _globals['_REPLICATERESPONSE']._serialized_start=624
-  _globals['_REPLICATERESPONSE']._serialized_end=660
-  _globals['_CREATEACCOUNTREQUEST']._serialized_start=662
-  _globals['_CREATEACCOUNTREQUEST']._serialized_end=720
-  _globals['_CREATEACCOUNTRESPONSE']._serialized_start=722
-  _globals['_CREATEACCOUNTRESPONSE']._serialized_end=779
-  _globals['_LOGINREQUEST']._serialized_start=781
-  _globals['_LOGINREQUEST']._serialized_end=831
-  _globals['_LOGINRESPONSE']._serialized_start=833
-  _globals['_LOGINRESPONSE']._serialized_end=907
-  _globals['_LOGOUTREQUEST']._serialized_start=909
-  _globals['_LOGOUTREQUEST']._serialized_end=942
-  _globals['_LOGOUTRESPONSE']._serialized_start=944
-  _globals['_LOGOUTRESPONSE']._serialized_end=994
-  _globals['_LISTACCOUNTSREQUEST']._serialized_start=996
-  _globals['_LISTACCOUNTSREQUEST']._serialized_end=1048
-  _globals['_LISTACCOUNTSRESPONSE']._serialized_start=1050
-  _globals['_LISTACCOUNTSRESPONSE']._serialized_end=1090
-  _globals['_SENDMESSAGEREQUEST']._serialized_start=1092
-  _globals['_SENDMESSAGEREQUEST']._serialized_end=1157
-  _globals['_SENDMESSAGERESPONSE']._serialized_start=1159
-  _globals['_SENDMESSAGERESPONSE']._serialized_end=1214
-  _globals['_CHATMESSAGE']._serialized_start=1216
-  _globals['_CHATMESSAGE']._serialized_end=1305
-  _globals['_READMESSAGESREQUEST']._serialized_start=1307
-  _globals['_READMESSAGESREQUEST']._serialized_end=1361
-  _globals['_READMESSAGESRESPONSE']._serialized_start=1363
-  _globals['_READMESSAGESRESPONSE']._serialized_end=1422
-  _globals['_LISTMESSAGESREQUEST']._serialized_start=1424
-  _globals['_LISTMESSAGESREQUEST']._serialized_end=1463
-  _globals['_LISTMESSAGESRESPONSE']._serialized_start=1465
-  _globals['_LISTMESSAGESRESPONSE']._serialized_end=1524
-  _globals['_DELETEMESSAGESREQUEST']._serialized_start=1526
-  _globals['_DELETEMESSAGESREQUEST']._serialized_end=1588
-  _globals['_DELETEMESSAGESRESPONSE']._serialized_start=1590
-  _globals['_DELETEMESSAGESRESPONSE']._serialized_end=1648
-  _globals['_DELETEACCOUNTREQUEST']._serialized_start=1650
-  _globals['_DELETEACCOUNTREQUEST']._serialized_end=1690
-  _globals['_DELETEACCOUNTRESPONSE']._serialized_start=1692
-  _globals['_DELETEACCOUNTRESPONSE']._serialized_end=1749
-  _globals['_SUBSCRIBEREQUEST']._serialized_start=1751
-  _globals['_SUBSCRIBEREQUEST']._serialized_end=1787
-  _globals['_CHATSERVICE']._serialized_start=1790
-  _globals['_CHATSERVICE']._serialized_end=2599
-  _globals['_REPLICATIONSERVICE']._serialized_start=2602
-  _globals['_REPLICATIONSERVICE']._serialized_end=2883
+  _globals['_GETLEADERRESPONSE']._serialized_end=128
+  _globals['_GETSTATEREQUEST']._serialized_start=130
+  _globals['_GETSTATEREQUEST']._serialized_end=147
+  _globals['_GETSTATERESPONSE']._serialized_start=149
+  _globals['_GETSTATERESPONSE']._serialized_end=227
+  _globals['_USER']._serialized_start=229
+  _globals['_USER']._serialized_end=297
+  _globals['_MESSAGE']._serialized_start=299
+  _globals['_MESSAGE']._serialized_end=410
+  _globals['_HEARTBEATREQUEST']._serialized_start=412
+  _globals['_HEARTBEATREQUEST']._serialized_end=491
+  _globals['_HEARTBEATRESPONSE']._serialized_start=493
+  _globals['_HEARTBEATRESPONSE']._serialized_end=591
+  _globals['_ELECTIONREQUEST']._serialized_start=593
+  _globals['_ELECTIONREQUEST']._serialized_end=695
+  _globals['_ELECTIONRESPONSE']._serialized_start=697
+  _globals['_ELECTIONRESPONSE']._serialized_end=741
+  _globals['_SETLEADERREQUEST']._serialized_start=743
+  _globals['_SETLEADERREQUEST']._serialized_end=799
+  _globals['_SETLEADERRESPONSE']._serialized_start=801
+  _globals['_SETLEADERRESPONSE']._serialized_end=837
+  _globals['_LOGENTRY']._serialized_start=840
+  _globals['_LOGENTRY']._serialized_end=1202
+  _globals['_CREATEACCOUNTOP']._serialized_start=1204
+  _globals['_CREATEACCOUNTOP']._serialized_end=1283
+  _globals['_SENDMESSAGEOP']._serialized_start=1285
+  _globals['_SENDMESSAGEOP']._serialized_end=1383
+  _globals['_DELETEMESSAGESOP']._serialized_start=1385
+  _globals['_DELETEMESSAGESOP']._serialized_end=1442
+  _globals['_DELETEACCOUNTOP']._serialized_start=1444
+  _globals['_DELETEACCOUNTOP']._serialized_end=1479
+  _globals['_NOOP']._serialized_start=1481
+  _globals['_NOOP']._serialized_end=1487
+  _globals['_ENDSESSIONSOP']._serialized_start=1489
+  _globals['_ENDSESSIONSOP']._serialized_end=1543
+  _globals['_MARKDELIVEREDOP']._serialized_start=1545
+  _globals['_MARKDELIVEREDOP']._serialized_end=1600
+  _globals['_DELIVEREDRANGE']._serialized_start=1602
+  _globals['_DELIVEREDRANGE']._serialized_end=1672
+  _globals['_REPLICATEREQUEST']._serialized_start=1674
+  _globals['_REPLICATEREQUEST']._serialized_end=1729
+  _globals['_REPLICATERESPONSE']._serialized_start=1731
+  _globals['_REPLICATERESPONSE']._serialized_end=1767
+  _globals['_REPLICATEBATCHREQUEST']._serialized_start=1770
+  _globals['_REPLICATEBATCHREQUEST']._serialized_end=1927
+  _globals['_REPLICATEBATCHRESPONSE']._serialized_start=1929
+  _globals['_REPLICATEBATCHRESPONSE']._serialized_end=2024
+  _globals['_GETSTATESINCEREQUEST']._serialized_start=2026
+  _globals['_GETSTATESINCEREQUEST']._serialized_end=2094
+  _globals['_LOGCHUNK']._serialized_start=2096
+  _globals['_LOGCHUNK']._serialized_end=2163
+  _globals['_SNAPSHOTREQUEST']._serialized_start=2165
+  _globals['_SNAPSHOTREQUEST']._serialized_end=2202
+  _globals['_SNAPSHOTCHUNK']._serialized_start=2205
+  _globals['_SNAPSHOTCHUNK']._serialized_end=2337
+  _globals['_CREATEACCOUNTREQUEST']._serialized_start=2339
+  _globals['_CREATEACCOUNTREQUEST']._serialized_end=2397
+  _globals['_CREATEACCOUNTRESPONSE']._serialized_start=2399
+  _globals['_CREATEACCOUNTRESPONSE']._serialized_end=2456
+  _globals['_LOGINREQUEST']._serialized_start=2458
+  _globals['_LOGINREQUEST']._serialized_end=2508
+  _globals['_LOGINRESPONSE']._serialized_start=2510
+  _globals['_LOGINRESPONSE']._serialized_end=2633
+  _globals['_RESUMESESSIONREQUEST']._serialized_start=2635
+  _globals['_RESUMESESSIONREQUEST']._serialized_end=2680
+  _globals['_LOGOUTREQUEST']._serialized_start=2682
+  _globals['_LOGOUTREQUEST']._serialized_end=2715
+  _globals['_LOGOUTRESPONSE']._serialized_start=2717
+  _globals['_LOGOUTRESPONSE']._serialized_end=2767
+  _globals['_LISTACCOUNTSREQUEST']._serialized_start=2769
+  _globals['_LISTACCOUNTSREQUEST']._serialized_end=2847
+  _globals['_LISTACCOUNTSRESPONSE']._serialized_start=2849
+  _globals['_LISTACCOUNTSRESPONSE']._serialized_end=2934
+  _globals['_SENDMESSAGEREQUEST']._serialized_start=2936
+  _globals['_SENDMESSAGEREQUEST']._serialized_end=3001
+  _globals['_SENDMESSAGERESPONSE']._serialized_start=3003
+  _globals['_SENDMESSAGERESPONSE']._serialized_end=3058
+  _globals['_CHATMESSAGE']._serialized_start=3060
+  _globals['_CHATMESSAGE']._serialized_end=3149
+  _globals['_READMESSAGESREQUEST']._serialized_start=3151
+  _globals['_READMESSAGESREQUEST']._serialized_end=3205
+  _globals['_READMESSAGESRESPONSE']._serialized_start=3207
+  _globals['_READMESSAGESRESPONSE']._serialized_end=3266
+  _globals['_ACKMESSAGESREQUEST']._serialized_start=3268
+  _globals['_ACKMESSAGESREQUEST']._serialized_end=3327
+  _globals['_ACKMESSAGESRESPONSE']._serialized_start=3329
+  _globals['_ACKMESSAGESRESPONSE']._serialized_end=3399
+  _globals['_LISTMESSAGESREQUEST']._serialized_start=3401
+  _globals['_LISTMESSAGESREQUEST']._serialized_end=3466
+  _globals['_LISTMESSAGESRESPONSE']._serialized_start=3468
+  _globals['_LISTMESSAGESRESPONSE']._serialized_end=3572
+  _globals['_DELETEMESSAGESREQUEST']._serialized_start=3574
+  _globals['_DELETEMESSAGESREQUEST']._serialized_end=3636
+  _globals['_DELETEMESSAGESRESPONSE']._serialized_start=3638
+  _globals['_DELETEMESSAGESRESPONSE']._serialized_end=3696
+  _globals['_DELETEACCOUNTREQUEST']._serialized_start=3698
+  _globals['_DELETEACCOUNTREQUEST']._serialized_end=3738
+  _globals['_DELETEACCOUNTRESPONSE']._serialized_start=3740
+  _globals['_DELETEACCOUNTRESPONSE']._serialized_end=3797
+  _globals['_SUBSCRIBEREQUEST']._serialized_start=3799
+  _globals['_SUBSCRIBEREQUEST']._serialized_end=3835
+  _globals['_CHATSERVICE']._serialized_start=3838
+  _globals['_CHATSERVICE']._serialized_end=4781
+  _globals['_REPLICATIONSERVICE']._serialized_start=4784
+  _globals['_REPLICATIONSERVICE']._serialized_end=5353
 # @@protoc_insertion_point(module_scope)
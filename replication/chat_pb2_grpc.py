@@ -45,6 +45,11 @@ class ChatServiceStub(object):
                 request_serializer=chat__pb2.LoginRequest.SerializeToString,
                 response_deserializer=chat__pb2.LoginResponse.FromString,
                 _registered_method=True)
+        self.ResumeSession = channel.unary_unary(
+                '/chat.ChatService/ResumeSession',
+                request_serializer=chat__pb2.ResumeSessionRequest.SerializeToString,
+                response_deserializer=chat__pb2.LoginResponse.FromString,
+                _registered_method=True)
         self.Logout = channel.unary_unary(
                 '/chat.ChatService/Logout',
                 request_serializer=chat__pb2.LogoutRequest.SerializeToString,
@@ -65,6 +70,11 @@ class ChatServiceStub(object):
                 request_serializer=chat__pb2.ReadMessagesRequest.SerializeToString,
                 response_deserializer=chat__pb2.ReadMessagesResponse.FromString,
                 _registered_method=True)
+        self.AckMessages = channel.unary_unary(
+                '/chat.ChatService/AckMessages',
+                request_serializer=chat__pb2.AckMessagesRequest.SerializeToString,
+                response_deserializer=chat__pb2.AckMessagesResponse.FromString,
+                _registered_method=True)
         self.ListMessages = channel.unary_unary(
                 '/chat.ChatService/ListMessages',
                 request_serializer=chat__pb2.ListMessagesRequest.SerializeToString,
@@ -113,6 +123,13 @@ class ChatServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ResumeSession(self, request, context):
+        """Re-establishes a session from a Login token without re-checking the password.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Logout(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -137,6 +154,13 @@ class ChatServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AckMessages(self, request, context):
+        """Confirms the client received pushed messages; only then are they marked delivered.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ListMessages(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -156,7 +180,10 @@ class ChatServiceServicer(object):
         raise NotImplementedError('Method not implemented!')
 
     def SubscribeMessages(self, request, context):
-        """Missing associated documentation comment in .proto file."""
+        """Pushed messages stay unread until acked with AckMessages. Ends with RESOURCE_EXHAUSTED
+        if the client falls too far behind; it should then fetch the missed (still unread)
+        messages with ReadMessages and resubscribe.
+        """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
@@ -186,6 +213,11 @@ def add_ChatServiceServicer_to_server(servicer, server):
                     request_deserializer=chat__pb2.LoginRequest.FromString,
                     response_serializer=chat__pb2.LoginResponse.SerializeToString,
             ),
+            'ResumeSession': grpc.unary_unary_rpc_method_handler(
+                    servicer.ResumeSession,
+                    request_deserializer=chat__pb2.ResumeSessionRequest.FromString,
+                    response_serializer=chat__pb2.LoginResponse.SerializeToString,
+            ),
             'Logout': grpc.unary_unary_rpc_method_handler(
                     servicer.Logout,
                     request_deserializer=chat__pb2.LogoutRequest.FromString,
@@ -206,6 +238,11 @@ def add_ChatServiceServicer_to_server(servicer, server):
                     request_deserializer=chat__pb2.ReadMessagesRequest.FromString,
                     response_serializer=chat__pb2.ReadMessagesResponse.SerializeToString,
             ),
+            'AckMessages': grpc.unary_unary_rpc_method_handler(
+                    servicer.AckMessages,
+                    request_deserializer=chat__pb2.AckMessagesRequest.FromString,
+                    response_serializer=chat__pb2.AckMessagesResponse.SerializeToString,
+            ),
             'ListMessages': grpc.unary_unary_rpc_method_handler(
                     servicer.ListMessages,
                     request_deserializer=chat__pb2.ListMessagesRequest.FromString,
@@ -302,6 +339,33 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ResumeSession(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/chat.ChatService/ResumeSession',
+            chat__pb2.ResumeSessionRequest.SerializeToString,
+            chat__pb2.LoginResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def Logout(request,
             target,
@@ -410,6 +474,33 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def AckMessages(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/chat.ChatService/AckMessages',
+            chat__pb2.AckMessagesRequest.SerializeToString,
+            chat__pb2.AckMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ListMessages(request,
             target,
@@ -602,6 +693,26 @@ class ReplicationServiceStub(object):
                 request_serializer=chat__pb2.ReplicateRequest.SerializeToString,
                 response_deserializer=chat__pb2.ReplicateResponse.FromString,
                 _registered_method=True)
+        self.ReplicateBatch = channel.unary_unary(
+                '/chat.ReplicationService/ReplicateBatch',
+                request_serializer=chat__pb2.ReplicateBatchRequest.SerializeToString,
+                response_deserializer=chat__pb2.ReplicateBatchResponse.FromString,
+                _registered_method=True)
+        self.ReplicationStream = channel.stream_stream(
+                '/chat.ReplicationService/ReplicationStream',
+                request_serializer=chat__pb2.ReplicateBatchRequest.SerializeToString,
+                response_deserializer=chat__pb2.ReplicateBatchResponse.FromString,
+                _registered_method=True)
+        self.GetStateSince = channel.unary_stream(
+                '/chat.ReplicationService/GetStateSince',
+                request_serializer=chat__pb2.GetStateSinceRequest.SerializeToString,
+                response_deserializer=chat__pb2.LogChunk.FromString,
+                _registered_method=True)
+        self.StreamSnapshot = channel.unary_stream(
+                '/chat.ReplicationService/StreamSnapshot',
+                request_serializer=chat__pb2.SnapshotRequest.SerializeToString,
+                response_deserializer=chat__pb2.SnapshotChunk.FromString,
+                _registered_method=True)
 
 
 class ReplicationServiceServicer(object):
@@ -631,6 +742,33 @@ class ReplicationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ReplicateBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReplicationStream(self, request_iterator, context):
+        """Long-lived leader -> follower log stream; each response is a cumulative ack (last_index).
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetStateSince(self, request, context):
+        """Streams log entries after log_index in bounded chunks (incremental catch-up).
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamSnapshot(self, request, context):
+        """Streams the full users/messages state in fixed-size pages, for bootstrapping a replica.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ReplicationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -654,6 +792,26 @@ def add_ReplicationServiceServicer_to_server(servicer, server):
                     request_deserializer=chat__pb2.ReplicateRequest.FromString,
                     response_serializer=chat__pb2.ReplicateResponse.SerializeToString,
             ),
+            'ReplicateBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReplicateBatch,
+                    request_deserializer=chat__pb2.ReplicateBatchRequest.FromString,
+                    response_serializer=chat__pb2.ReplicateBatchResponse.SerializeToString,
+            ),
+            'ReplicationStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.ReplicationStream,
+                    request_deserializer=chat__pb2.ReplicateBatchRequest.FromString,
+                    response_serializer=chat__pb2.ReplicateBatchResponse.SerializeToString,
+            ),
+            'GetStateSince': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetStateSince,
+                    request_deserializer=chat__pb2.GetStateSinceRequest.FromString,
+                    response_serializer=chat__pb2.LogChunk.SerializeToString,
+            ),
+            'StreamSnapshot': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamSnapshot,
+                    request_deserializer=chat__pb2.SnapshotRequest.FromString,
+                    response_serializer=chat__pb2.SnapshotChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'chat.ReplicationService', rpc_method_handlers)
@@ -772,3 +930,111 @@ class ReplicationService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def ReplicateBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/chat.ReplicationService/ReplicateBatch',
+            chat__pb2.ReplicateBatchRequest.SerializeToString,
+            chat__pb2.ReplicateBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReplicationStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/chat.ReplicationService/ReplicationStream',
+            chat__pb2.ReplicateBatchRequest.SerializeToString,
+            chat__pb2.ReplicateBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetStateSince(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/chat.ReplicationService/GetStateSince',
+            chat__pb2.GetStateSinceRequest.SerializeToString,
+            chat__pb2.LogChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamSnapshot(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/chat.ReplicationService/StreamSnapshot',
+            chat__pb2.SnapshotRequest.SerializeToString,
+            chat__pb2.SnapshotChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -17,11 +17,23 @@ class ChatClient:
         with open(config_file, "r") as f:
             config = json.load(f)
         self.server_list = [server["address"] for server in config["servers"]]
+        # With follower_reads, ListAccounts/ListMessages go round-robin to any replica that is
+        # at most max_staleness_ms behind the leader, instead of all hitting the leader.
+        client_config = config.get("client", {})
+        self.follower_reads = client_config.get("follower_reads", False)
+        self.max_staleness_ms = client_config.get("max_staleness_ms", 2000)
+        self.read_index = 0
         self.root.title("Chat Client")
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
 
         self.channel = None
         self.stub = None
+        # One channel per server, kept open across leader changes and shared with follower reads (see use_server).
+        self.channels = {}
+        self.stubs = {}
         self.username = None
+        # Signed token from Login; lets us resume on a new leader without re-sending the password.
+        self.session_token = None
 
         # Thread-safe queue for incoming instant messages from the SubscribeMessages stream.
         self.incoming_queue = queue.Queue()
@@ -33,19 +45,75 @@ class ChatClient:
         if host and port:
             self.host = host
             self.port = port
-        self.channel = grpc.insecure_channel(f"{self.host}:{self.port}")
-        self.stub = chat_pb2_grpc.ChatServiceStub(self.channel)
+        self.use_server(f"{self.host}:{self.port}")
         leader_address = self.get_leader()
         if leader_address:
             if leader_address != f"{self.host}:{self.port}":
-                self.channel.close()
-                self.host, self.port = leader_address.split(":")
-                self.channel = grpc.insecure_channel(f"{self.host}:{self.port}")
-                self.stub = chat_pb2_grpc.ChatServiceStub(self.channel)
+                self.use_server(leader_address)
                 self.update_chat(f"[INFO] Redirected to leader at {leader_address}")
         else:
             self.update_chat("[ERROR] No leader found, retrying connection...")
 
+    def stub_for(self, address):
+        """The stub for address over its cached channel, opening the channel on first use."""
+        if address not in self.channels:
+            self.channels[address] = grpc.insecure_channel(address)
+            self.stubs[address] = chat_pb2_grpc.ChatServiceStub(self.channels[address])
+        return self.stubs[address]
+
+    def use_server(self, address):
+        """
+        Points self.stub at address, reusing its channel if we have been connected before.
+        Channels to addresses that are neither configured nor current are closed.
+        """
+        self.stub = self.stub_for(address)
+        self.host, self.port = address.split(":")
+        self.channel = self.channels[address]
+        for old in [a for a in self.channels if a != address and a not in self.server_list]:
+            self.channels.pop(old).close()
+            del self.stubs[old]
+
+    def close_channels(self):
+        for channel in self.channels.values():
+            channel.close()
+        self.channels = {}
+        self.stubs = {}
+        self.channel = None
+        self.stub = None
+
+    def shutdown(self):
+        """Window closed: close every channel before exiting."""
+        self.close_channels()
+        self.root.destroy()
+
+    @staticmethod
+    def leader_hint(call):
+        """
+        The leader address a follower attaches (trailing metadata) to a leader-only RPC it
+        didn't serve: None if the call was served, "" if the follower knows no leader.
+        """
+        return dict(call.trailing_metadata() or ()).get("leader-address")
+
+    def follow_hint(self, hint):
+        """Switches to the hinted leader; without a hint, falls back to asking every server."""
+        leader_address = hint or self.get_leader()
+        if leader_address and leader_address != f"{self.host}:{self.port}":
+            self.use_server(leader_address)
+            self.update_chat(f"[INFO] Redirected to leader at {leader_address}")
+            return True
+        return False
+
+    def call_leader(self, method, request):
+        """
+        Calls a leader-only RPC. If a follower refuses it, retries once on the leader it names,
+        over a pooled channel, so a leadership change costs one extra round trip.
+        """
+        response, call = getattr(self.stub, method).with_call(request)
+        hint = self.leader_hint(call)
+        if hint is not None and self.follow_hint(hint):
+            response = getattr(self.stub, method)(request)
+        return response
+
     def get_leader(self):
         """Queries the current server for the leader's address, falling back to other servers if needed."""
         for server in self.server_list:
@@ -65,31 +133,82 @@ class ChatClient:
         return None
     # ------------------------------ Instant Message Subscription ------------------------------
     def subscribe_instant_messages(self):
+        backoff = 1
         while True:
             try:
                 subscribe_request = chat_pb2.SubscribeRequest(username=self.username)
                 for chat_msg in self.stub.SubscribeMessages(subscribe_request):
-                    self.incoming_queue.put({"type": "message", "from": chat_msg.sender, "message": chat_msg.message})
+                    backoff = 1
+                    self.incoming_queue.put({"type": "message", "id": chat_msg.id, "from": chat_msg.sender, "message": chat_msg.message})
             except grpc.RpcError as ex:
-                self.update_chat(f"[INFO] Subscription interrupted: {ex}")
-                leader_address = self.get_leader()
-                if leader_address:
-                    if leader_address != f"{self.host}:{self.port}":
-                        self.channel.close()
-                        self.connect_to_server(*leader_address.split(":"))
+                if ex.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                    if dict(ex.trailing_metadata() or ()).get("subscription-evicted") == "1":
+                        # We fell behind and the server dropped the stream; read what it didn't push.
+                        self.fetch_missed_messages()
                     else:
-                        self.update_chat("[INFO] On leader, retrying subscription")
-                else:
-                    self.update_chat("[ERROR] No leader found, retrying...")
+                        # A concurrency limit on the server: don't hammer it, back off and retry.
+                        self.update_chat(f"[INFO] Server busy, resubscribing in {backoff}s: {ex.details()}")
+                        time.sleep(backoff)
+                        backoff = min(backoff * 2, 30)
+                    continue
+                self.update_chat(f"[INFO] Subscription interrupted: {ex}")
+                # A follower names the leader; a dead server doesn't, so we ask around.
+                if self.follow_hint(self.leader_hint(ex)):
+                    self.resume_session()
+                    continue
+                self.update_chat("[INFO] Retrying subscription")
                 time.sleep(1)
 
+    def fetch_missed_messages(self, batch=50):
+        """Pulls unread messages with ReadMessages into the incoming queue, until none are left."""
+        try:
+            while True:
+                response = self.stub.ReadMessages(chat_pb2.ReadMessagesRequest(username=self.username, count=batch), timeout=5)
+                for msg in response.messages:
+                    self.incoming_queue.put({"type": "message", "from": msg.sender, "message": msg.message})
+                if len(response.messages) < batch:
+                    return
+        except grpc.RpcError as e:
+            self.update_chat(f"[INFO] Could not fetch missed messages: {e}")
+
+    def resume_session(self):
+        """Re-establishes the session on the current (new) leader using the Login token."""
+        if not self.session_token:
+            return
+        try:
+            response = self.stub.ResumeSession(chat_pb2.ResumeSessionRequest(session_token=self.session_token), timeout=2)
+        except grpc.RpcError as e:
+            self.update_chat(f"[INFO] Could not resume session: {e}")
+            return
+        if response.success:
+            self.session_token = response.session_token
+            self.update_chat(f"[INFO] Session resumed on {self.host}:{self.port}")
+        else:
+            self.update_chat(f"[ERROR] {response.message}, please log in again")
+
     def poll_incoming(self):
         """Called periodically in the GUI thread to process any instant messages."""
+        pushed_ids = []
         while not self.incoming_queue.empty():
             response = self.incoming_queue.get_nowait()
             self.handle_server_response(response)
+            if "id" in response:
+                pushed_ids.append(response["id"])
+        if pushed_ids:
+            self.ack_messages(pushed_ids)
         self.root.after(100, self.poll_incoming)
 
+    def ack_messages(self, message_ids):
+        """
+        Acks pushed messages once shown, one batch per poll, without blocking the GUI. If the
+        ack is lost, the messages stay unread and come back from ReadMessages.
+        """
+        request = chat_pb2.AckMessagesRequest(username=self.username, message_ids=message_ids)
+        try:
+            self.stub.AckMessages.future(request, timeout=5)
+        except Exception:
+            pass
+
     # ------------------------------ Response Handling ------------------------------
     def handle_server_response(self, response):
         """
@@ -177,29 +296,19 @@ class ChatClient:
         self.username = username
 
         if command == "REGISTER":
-            response = self.stub.CreateAccount(chat_pb2.CreateAccountRequest(username=username, password=password))
+            response = self.call_leader("CreateAccount", chat_pb2.CreateAccountRequest(username=username, password=password))
         elif command == "LOGIN":
-            response = self.stub.Login(chat_pb2.LoginRequest(username=username, password=password))
+            response = self.call_leader("Login", chat_pb2.LoginRequest(username=username, password=password))
         else:
             messagebox.showerror("Error", "Unknown command")
             return
 
-        # Check if the server is not the leader and reconnect if necessary
-        if not response.success and "Not leader" in response.message:
-            leader_address = self.get_leader()
-            if leader_address and leader_address != f"{self.host}:{self.port}":
-                host, port = leader_address.split(":")
-                self.connect_to_server(host, int(port))
-                if command == "REGISTER":
-                    response = self.stub.CreateAccount(chat_pb2.CreateAccountRequest(username=username, password=password))
-                elif command == "LOGIN":
-                    response = self.stub.Login(chat_pb2.LoginRequest(username=username, password=password))
-
         if response.success:
             self.create_chat_screen()
             threading.Thread(target=self.subscribe_instant_messages, daemon=True).start()
             self.update_chat(f"[SERVER] {response.message}")
             if command == "LOGIN":
+                self.session_token = response.session_token
                 self.update_chat(f"[INFO] You have {response.unread_messages} unread messages")
         else:
             messagebox.showerror("Error", response.message)
@@ -207,12 +316,11 @@ class ChatClient:
     def logout(self):
         if not self.stub or not self.username:
             return
-        response = self.stub.Logout(chat_pb2.LogoutRequest(username=self.username))
+        response = self.call_leader("Logout", chat_pb2.LogoutRequest(username=self.username))
         self.update_chat(f"[SERVER] {response.message}")
-        self.channel.close()
-        self.channel = None
-        self.stub = None
+        self.close_channels()
         self.username = None
+        self.session_token = None
         self.create_login_screen()
 
     # ------------------------------ Commands ------------------------------
@@ -231,13 +339,7 @@ class ChatClient:
             return
 
         request = chat_pb2.SendMessageRequest(sender=self.username, to=recipient, message=message)
-        response = self.stub.SendMessage(request)
-        if not response.success and "Not leader" in response.message:
-            leader_address = self.get_leader()
-            if leader_address and leader_address != f"{self.host}:{self.port}":
-                host, port = leader_address.split(":")
-                self.connect_to_server(host, int(port))
-                response = self.stub.SendMessage(request)
+        response = self.call_leader("SendMessage", request)
         if response.success:
             self.update_chat(f"You -> {recipient}: {message}")
             self.message_entry.delete(0, tk.END)
@@ -250,15 +352,28 @@ class ChatClient:
             return
 
         request = chat_pb2.ReadMessagesRequest(username=self.username, count=10)
-        response = self.stub.ReadMessages(request)
-        if not response.messages:  # Empty response might indicate a follower
-            leader_address = self.get_leader()
-            if leader_address and leader_address != f"{self.host}:{self.port}":
-                host, port = leader_address.split(":")
-                self.connect_to_server(host, int(port))
-                response = self.stub.ReadMessages(request)
+        response = self.call_leader("ReadMessages", request)
         self.process_rpc_response(response)
 
+    def follower_read(self, method, request):
+        """
+        Sends a read to the replicas in turn, starting after the one used last time. A replica
+        that is too stale answers UNAVAILABLE and we try the next; returns None if none could
+        answer, so the caller falls back to the leader.
+        """
+        if not self.follower_reads:
+            return None
+        request.max_staleness_ms = self.max_staleness_ms
+        for i in range(len(self.server_list)):
+            address = self.server_list[(self.read_index + i) % len(self.server_list)]
+            try:
+                response = getattr(self.stub_for(address), method)(request, timeout=2)
+            except grpc.RpcError:
+                continue
+            self.read_index = (self.read_index + i + 1) % len(self.server_list)
+            return response
+        return None
+
     def list_users(self):
         if not self.username:
             messagebox.showerror("Error", "You must be logged in.")
@@ -267,13 +382,16 @@ class ChatClient:
         pattern = simpledialog.askstring("List Users", "Enter search pattern (empty = all users):")
         pattern = pattern if pattern is not None else ""
         request = chat_pb2.ListAccountsRequest(pattern=pattern, page=0)
-        response = self.stub.ListAccounts(request)
-        if not response.accounts:  # Empty response might indicate a follower
-            leader_address = self.get_leader()
-            if leader_address and leader_address != f"{self.host}:{self.port}":
-                host, port = leader_address.split(":")
-                self.connect_to_server(host, int(port))
-                response = self.stub.ListAccounts(request)
+        response = self.follower_read("ListAccounts", request)
+        if response is not None:
+            self.process_rpc_response(response)
+            return
+        try:
+            response = self.call_leader("ListAccounts", request)
+        except grpc.RpcError as e:
+            # e.g. UNAVAILABLE from a leader whose lease lapsed (it may no longer be the leader)
+            self.update_chat(f"[INFO] Could not list accounts: {e.details()}")
+            return
         self.process_rpc_response(response)
 
     def list_all_messages(self):
@@ -282,13 +400,16 @@ class ChatClient:
             return
 
         request = chat_pb2.ListMessagesRequest(username=self.username)
-        response = self.stub.ListMessages(request)
-        if not response.messages:  # Empty response might indicate a follower
-            leader_address = self.get_leader()
-            if leader_address and leader_address != f"{self.host}:{self.port}":
-                host, port = leader_address.split(":")
-                self.connect_to_server(host, int(port))
-                response = self.stub.ListMessages(request)
+        response = self.follower_read("ListMessages", request)
+        if response is not None:
+            self.process_rpc_response(response)
+            return
+        try:
+            response = self.call_leader("ListMessages", request)
+        except grpc.RpcError as e:
+            # e.g. UNAVAILABLE from a leader whose lease lapsed (it may no longer be the leader)
+            self.update_chat(f"[INFO] Could not list messages: {e.details()}")
+            return
         self.process_rpc_response(response)
 
     def delete_messages(self):
@@ -297,7 +418,12 @@ class ChatClient:
             return
 
         request = chat_pb2.ListMessagesRequest(username=self.username)
-        response = self.stub.ListMessages(request)
+        try:
+            response = self.call_leader("ListMessages", request)
+        except grpc.RpcError as e:
+            # e.g. UNAVAILABLE from a leader whose lease lapsed (it may no longer be the leader)
+            self.update_chat(f"[INFO] Could not list messages: {e.details()}")
+            return
         self.process_rpc_response(response)
 
         def ask_for_ids():
@@ -308,13 +434,7 @@ class ChatClient:
             if not ids_list:
                 return
             del_request = chat_pb2.DeleteMessagesRequest(username=self.username, message_ids=ids_list)
-            del_response = self.stub.DeleteMessages(del_request)
-            if not del_response.success and "Not leader" in del_response.message:
-                leader_address = self.get_leader()
-                if leader_address and leader_address != f"{self.host}:{self.port}":
-                    host, port = leader_address.split(":")
-                    self.connect_to_server(host, int(port))
-                    del_response = self.stub.DeleteMessages(del_request)
+            del_response = self.call_leader("DeleteMessages", del_request)
             if del_response.success:
                 self.update_chat(f"[SERVER] {del_response.message}")
             else:
@@ -331,13 +451,7 @@ class ChatClient:
             return
 
         request = chat_pb2.DeleteAccountRequest(username=self.username)
-        response = self.stub.DeleteAccount(request)
-        if not response.success and "Not leader" in response.message:
-            leader_address = self.get_leader()
-            if leader_address and leader_address != f"{self.host}:{self.port}":
-                host, port = leader_address.split(":")
-                self.connect_to_server(host, int(port))
-                response = self.stub.DeleteAccount(request)
+        response = self.call_leader("DeleteAccount", request)
         if response.success:
             self.update_chat(f"[SERVER] {response.message}")
             self.logout()
@@ -0,0 +1,123 @@
+"""
+Failover benchmark for the replicated chat server. Starts the cluster from --config itself,
+in a scratch directory so the databases here are left alone. Stop any running servers first.
+Each trial then:
+
+- writes --writes messages through the leader;
+- kills the leader and times how long until another server accepts a write;
+- checks that every write the old leader acknowledged is on the new leader;
+- restarts the killed server.
+
+    python failover_benchmark.py --trials 5
+    python failover_benchmark.py --trials 5 --server-args="--aio"
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import grpc
+import chat_pb2
+import chat_pb2_grpc
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+# Reconnect quickly to servers that are (re)starting, so the backoff doesn't count as failover time.
+CHANNEL_OPTIONS = [
+    ("grpc.initial_reconnect_backoff_ms", 100),
+    ("grpc.min_reconnect_backoff_ms", 100),
+    ("grpc.max_reconnect_backoff_ms", 200),
+]
+
+def start_server(server_id, address, workdir, config_path, extra_args):
+    log = open(os.path.join(workdir, f"server_{server_id}.log"), "a")
+    return subprocess.Popen(
+        [sys.executable, "-u", SERVER_PATH, "--id", str(server_id), "--address", address, "--config", config_path] + extra_args,
+        cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+def try_write(stub, text):
+    # wait_for_ready: wait out a (re)connect to a starting server instead of failing fast.
+    try:
+        return stub.SendMessage(chat_pb2.SendMessageRequest(sender="bench_sender", to="bench_recipient", message=text),
+                                timeout=1, wait_for_ready=True).success
+    except grpc.RpcError:
+        return False
+
+def wait_for_leader(stubs, addresses, timeout=60):
+    """Returns the first of addresses that accepts a write, polling until one does."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for address in addresses:
+            if try_write(stubs[address], "probe"):
+                return address
+        time.sleep(0.05)
+    raise SystemExit(f"No leader among {addresses} after {timeout}s")
+
+def list_messages(stub, timeout=10):
+    """ListMessages on the leader, retrying while it has no read lease yet."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return [msg.message for msg in stub.ListMessages(chat_pb2.ListMessagesRequest(username="bench_recipient"), timeout=2, wait_for_ready=True).messages]
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.UNAVAILABLE or time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Leader failover time and data loss for the replicated chat server")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--trials", type=int, default=5, help="Number of leader kills (default: 5)")
+    parser.add_argument("--writes", type=int, default=50, help="Acknowledged writes before each kill (default: 50)")
+    parser.add_argument("--server-args", type=str, default="", help="Extra arguments for every server, e.g. \"--aio\"")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        servers = {server["address"]: server["id"] for server in json.load(f)["servers"]}
+    workdir = tempfile.mkdtemp(prefix="failover_benchmark_")
+    config_path = os.path.join(workdir, "config.json")
+    shutil.copy(args.config, config_path)
+    extra_args = args.server_args.split()
+    procs = {address: start_server(server_id, address, workdir, config_path, extra_args) for address, server_id in servers.items()}
+    channels = {address: grpc.insecure_channel(address, options=CHANNEL_OPTIONS) for address in servers}
+    stubs = {address: chat_pb2_grpc.ChatServiceStub(channel) for address, channel in channels.items()}
+
+    try:
+        print(f"Waiting for the first leader (server logs in {workdir})...")
+        wait_for_leader(stubs, list(servers))
+
+        failovers, lost_total = [], 0
+        print(f"{'trial':>5} {'old leader':>16} {'new leader':>16} {'failover ms':>12} {'acked':>6} {'lost':>5}")
+        for trial in range(args.trials):
+            leader = wait_for_leader(stubs, list(servers))
+            acked = [f"trial {trial} write {i}" for i in range(args.writes)]
+            acked = [text for text in acked if try_write(stubs[leader], text)]
+
+            procs[leader].kill()
+            procs[leader].wait()
+            started = time.perf_counter()
+            new_leader = wait_for_leader(stubs, [address for address in servers if address != leader])
+            failover_ms = 1000 * (time.perf_counter() - started)
+
+            lost = set(acked) - set(list_messages(stubs[new_leader]))
+            failovers.append(failover_ms)
+            lost_total += len(lost)
+            print(f"{trial:>5} {leader:>16} {new_leader:>16} {failover_ms:>12.0f} {len(acked):>6} {len(lost):>5}")
+
+            procs[leader] = start_server(servers[leader], leader, workdir, config_path, extra_args)
+            time.sleep(2)  # Let it rejoin before the next kill
+
+        print(f"Failover: median {statistics.median(failovers):.0f} ms, max {max(failovers):.0f} ms; "
+              f"{lost_total} acknowledged writes lost")
+    finally:
+        for proc in procs.values():
+            proc.kill()
+        for channel in channels.values():
+            channel.close()
+        shutil.rmtree(workdir, ignore_errors=True)
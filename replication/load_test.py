@@ -0,0 +1,125 @@
+"""
+Load test for the replicated chat server. Start the cluster first, e.g. with different
+--workers / --max-concurrent-rpcs / --method-limit / --aio settings, then run:
+
+    python load_test.py --levels 1,4,16,64 --duration 5 --subscribers 8
+
+For each concurrency level it runs that many client threads sending messages for
+--duration seconds and prints throughput and latency, so the curves for different
+server settings can be compared. --subscribers keeps that many SubscribeMessages streams
+open during the run, to show whether long-lived streams starve the unary RPCs.
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import grpc
+import chat_pb2
+import chat_pb2_grpc
+
+def find_leader(addresses):
+    for address in addresses:
+        try:
+            stub = chat_pb2_grpc.ChatServiceStub(grpc.insecure_channel(address))
+            leader = stub.GetLeader(chat_pb2.GetLeaderRequest(), timeout=1).leader_address
+            if leader:
+                return leader
+        except grpc.RpcError:
+            pass
+    return None
+
+def percentile(latencies, fraction):
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+def subscribe(channel, username, stop, results):
+    stub = chat_pb2_grpc.ChatServiceStub(channel)
+    try:
+        for _ in stub.SubscribeMessages(chat_pb2.SubscribeRequest(username=username)):
+            results["pushed"] += 1
+            if stop.is_set():
+                return
+    except grpc.RpcError as e:
+        if e.code() != grpc.StatusCode.CANCELLED:
+            results["ended"] += 1
+            print(f"Subscription {username} ended: {e.code().name} {e.details()}")
+
+def sender(stub, sender_name, recipients, deadline, latencies, errors, lock):
+    mine = []
+    failed = 0
+    i = 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            response = stub.SendMessage(chat_pb2.SendMessageRequest(
+                sender=sender_name, to=recipients[i % len(recipients)], message=f"load {i}"), timeout=5)
+            if response.success:
+                mine.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        except grpc.RpcError:
+            failed += 1
+        i += 1
+    with lock:
+        latencies.extend(mine)
+        errors[0] += failed
+
+def run_level(stub, concurrency, duration, recipients):
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.time() + duration
+    threads = [
+        threading.Thread(target=sender, args=(stub, "loadtest_sender", recipients, deadline, latencies, errors, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), errors[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput curve for the replicated chat server")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--levels", type=str, default="1,2,4,8,16,32,64", help="Comma-separated client concurrency levels")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per level (default: 5)")
+    parser.add_argument("--subscribers", type=int, default=0, help="SubscribeMessages streams held open during the run")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        addresses = [server["address"] for server in json.load(f)["servers"]]
+    leader = find_leader(addresses)
+    if not leader:
+        raise SystemExit("No leader found")
+    print(f"Leader: {leader}")
+    # One channel for all senders, like a client process; subscribers get their own.
+    channel = grpc.insecure_channel(leader)
+    stub = chat_pb2_grpc.ChatServiceStub(channel)
+
+    recipients = [f"loadtest_recipient_{i}" for i in range(max(1, args.subscribers))]
+    for username in ["loadtest_sender"] + recipients:
+        stub.CreateAccount(chat_pb2.CreateAccountRequest(username=username, password="loadtest"))
+
+    stop = threading.Event()
+    sub_results = {"pushed": 0, "ended": 0}
+    sub_channels = [grpc.insecure_channel(leader) for _ in range(args.subscribers)]
+    for sub_channel, username in zip(sub_channels, recipients):
+        threading.Thread(target=subscribe, args=(sub_channel, username, stop, sub_results), daemon=True).start()
+    time.sleep(0.5)
+
+    print(f"{'clients':>8} {'msgs/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for level in [int(level) for level in args.levels.split(",")]:
+        throughput, p50, p99, errors = run_level(stub, level, args.duration, recipients)
+        print(f"{level:>8} {throughput:>10.1f} {1000 * p50:>8.1f} {1000 * p99:>8.1f} {errors:>7}")
+
+    stop.set()
+    for sub_channel in sub_channels:
+        sub_channel.close()
+    if args.subscribers:
+        print(f"Subscriptions: {args.subscribers} opened, {sub_results['ended']} ended early, {sub_results['pushed']} messages pushed")
+    channel.close()
@@ -1,20 +1,65 @@
 import argparse
+import asyncio
 import time
 import sqlite3
-import bcrypt
+import sys
 import queue
+import collections
+import base64
+import bisect
+import hashlib
+import hmac
+import os
 from concurrent import futures
 
 import grpc
 import chat_pb2
 import chat_pb2_grpc
 
+# Modules shared by the chat servers live in common/ at the repo root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from password_pool import PasswordPool, PasswordPoolBusy
+
 import threading
 import time
 import json
+import math
+import random
+
 
+# Upper bound on the payload of one catch-up chunk, well under gRPC's 4MB message limit.
+MAX_CHUNK_BYTES = 1024 * 1024
+# Trailing metadata a follower sets on leader-only RPCs it didn't serve: the leader's
+# address, or "" if it doesn't know one.
+LEADER_HINT_KEY = "leader-address"
+# Request metadata on RPCs a follower proxied to the leader, so they are never proxied twice.
+FORWARDED_BY_KEY = "forwarded-by"
+# The replicas' shared session secret comes from this environment variable, or else from the
+# untracked file named by auth.session_secret_file; it is never read from config.json itself.
+SESSION_SECRET_ENV = "CHAT_SESSION_SECRET"
+# Secrets that have been published (config.json once shipped this one); refused at startup.
+PUBLISHED_SESSION_SECRETS = {"change-me-shared-by-all-replicas"}
 
 # ----- Helper Function -----
+def load_session_secret(auth_config, config_file):
+    """
+    Returns the session secret from $CHAT_SESSION_SECRET or auth.session_secret_file (relative
+    to config_file), or None if neither is set. Raises ValueError for a secret in config.json
+    itself or a published one, since anyone holding it can sign tokens for any user.
+    """
+    if "session_secret" in auth_config:
+        raise ValueError(f"{config_file}: auth.session_secret is not supported; set {SESSION_SECRET_ENV} or auth.session_secret_file instead")
+    secret = os.environ.get(SESSION_SECRET_ENV, "").strip()
+    secret_file = auth_config.get("session_secret_file")
+    if not secret and secret_file:
+        path = os.path.join(os.path.dirname(os.path.abspath(config_file)), secret_file)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                secret = f.read().strip()
+    if secret in PUBLISHED_SESSION_SECRETS:
+        raise ValueError("The session secret is a published placeholder; generate one with: python -c 'import os; print(os.urandom(32).hex())'")
+    return secret or None
+
 def log_message_size(sender, recipient, message):
     sender_bytes = len(sender.encode("utf-8"))
     recipient_bytes = len(recipient.encode("utf-8"))
@@ -22,34 +67,549 @@ def log_message_size(sender, recipient, message):
     total_size = sender_bytes + recipient_bytes + message_bytes
     print(f"Message Size: {total_size} bytes | {sender} -> {recipient}: {message}")
 
+class PeerPool:
+    """
+    Keeps one long-lived channel per peer (and lazily built stubs on it) so heartbeats,
+    elections and replication reuse connections instead of redialing on every call.
+    A peer that keeps failing is skipped for an exponentially growing backoff window.
+    """
+    CHANNEL_OPTIONS = [
+        ("grpc.initial_reconnect_backoff_ms", 100),
+        ("grpc.min_reconnect_backoff_ms", 100),
+        ("grpc.max_reconnect_backoff_ms", 1000),
+        ("grpc.keepalive_time_ms", 10000),
+    ]
+
+    def __init__(self, peers, base_backoff=0.1, max_backoff=1.0):
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.stubs = {}
+        self.failures = {peer: 0 for peer in peers}
+        self.retry_at = {peer: 0 for peer in peers}
+        self.executor = None  # For call_all, created on first use
+
+    def stub(self, peer, service="replication"):
+        with self.lock:
+            if time.time() < self.retry_at.get(peer, 0):
+                raise ConnectionError(f"Peer {peer} is backing off")
+            key = (peer, service)
+            if key not in self.stubs:
+                if peer not in self.channels:
+                    self.channels[peer] = self.new_channel(peer)
+                if service == "chat":
+                    self.stubs[key] = chat_pb2_grpc.ChatServiceStub(self.channels[peer])
+                else:
+                    self.stubs[key] = chat_pb2_grpc.ReplicationServiceStub(self.channels[peer])
+            return self.stubs[key]
+
+    def new_channel(self, peer):
+        return grpc.insecure_channel(peer, options=self.CHANNEL_OPTIONS)
+
+    def call(self, peer, method, request, timeout=1, service="replication", metadata=None):
+        """Invokes a unary RPC on the peer, tracking failures for the backoff window."""
+        stub = self.stub(peer, service)
+        try:
+            response = getattr(stub, method)(request, timeout=timeout, metadata=metadata)
+        except Exception:
+            self.mark_failure(peer)
+            raise
+        self.mark_success(peer)
+        return response
+
+    def call_all(self, peers, method, request, timeout=1, service="replication"):
+        """
+        Calls every peer at once, so one slow or partitioned peer doesn't delay the rest.
+        Returns one result per peer: the response, or the exception the call raised.
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = futures.ThreadPoolExecutor(max_workers=max(1, len(self.failures)))
+        pending = [self.executor.submit(self.call, peer, method, request, timeout, service) for peer in peers]
+        results = []
+        for future in pending:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def mark_success(self, peer):
+        with self.lock:
+            self.failures[peer] = 0
+            self.retry_at[peer] = 0
+
+    def mark_failure(self, peer):
+        with self.lock:
+            self.failures[peer] = self.failures.get(peer, 0) + 1
+            backoff = min(self.max_backoff, self.base_backoff * (2 ** (self.failures[peer] - 1)))
+            self.retry_at[peer] = time.time() + backoff
+
+    def close(self):
+        with self.lock:
+            for channel in self.channels.values():
+                try:
+                    channel.close()
+                except Exception:
+                    pass
+            self.channels.clear()
+            self.stubs.clear()
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+
+class FollowerStream:
+    """
+    Long-lived ReplicationStream to one follower. Every new connection opens with an
+    empty probe batch; the follower answers with its last log index and the stream
+    resumes from there, reading older entries back from the leader's durable log.
+    Pending entries are batched (up to max_batch_size, waiting at most max_linger for
+    more) and the follower streams back cumulative acks. At most max_inflight entries
+    are outstanding at once.
+    """
+    def __init__(self, server, peer, max_batch_size=64, max_linger_ms=2, max_inflight=1024):
+        self.server = server
+        self.peer = peer
+        self.max_batch_size = max_batch_size
+        self.max_linger = max_linger_ms / 1000.0
+        self.max_inflight = max_inflight
+        self.cond = threading.Condition()
+        self.sent_index = 0
+        self.acked_index = 0
+        self.synced = False  # Set once the probe ack tells us where the follower is
+        self.rejected = False
+        self.generation = 0  # Bumped on every reconnect so stale request generators exit
+        self.last_ack_at = 0  # Recent acks stand in for heartbeats (see ChatServer.heartbeat_peers)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def notify(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def reset(self):
+        """Forgets the follower's position (on winning an election) and re-probes it."""
+        with self.cond:
+            self.generation += 1
+            self.synced = False
+            self.sent_index = self.acked_index = 0
+            self.cond.notify_all()
+
+    def pending(self):
+        return self.server.last_log_index - self.sent_index
+
+    def batch(self, entries=(), prev_log_term=0):
+        """A batch carries the leader's heartbeat fields too, so a busy follower needs no separate heartbeats."""
+        server = self.server
+        return chat_pb2.ReplicateBatchRequest(entries=entries, term=server.current_term, prev_log_term=prev_log_term,
+                                              leader_address=server.address, applied_index=server.last_applied,
+                                              sent_at=time.time())
+
+    def requests(self, generation):
+        yield self.batch()
+        while True:
+            with self.cond:
+                # Only a leader streams; a deposed one idles until it wins again.
+                self.cond.wait_for(lambda: generation != self.generation or
+                                   (self.server.is_leader and self.synced and self.pending() > 0 and
+                                    self.sent_index - self.acked_index < self.max_inflight))
+                if generation != self.generation:
+                    return
+                # Linger briefly so concurrent writes share a batch.
+                deadline = time.time() + self.max_linger
+                while self.pending() < self.max_batch_size and generation == self.generation:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if generation != self.generation:
+                    return
+                start = self.sent_index + 1
+                count = min(self.max_batch_size, self.pending())
+                self.sent_index += count
+                throttle = self.rejected
+                self.rejected = False
+            if throttle:
+                time.sleep(0.2)  # The follower is catching up out of band; don't spin on rejections
+            yield self.batch(self.server.read_log(start, count), self.server.entry_term(start - 1))
+
+    def on_ack(self, ack):
+        if self.server.observe_term(ack.term):
+            return  # The follower has seen a newer leader; its ack says nothing about our log
+        self.last_ack_at = time.time()
+        if ack.lease_from:
+            self.server.record_lease_grants([(self.peer, ack.lease_from)])
+        with self.cond:
+            if not self.synced:
+                self.synced = True
+                self.sent_index = min(ack.last_index, self.server.last_log_index)
+                # The probe doesn't check terms, so entries up to last_index may still differ
+                # from ours; only batches that pass the prev_log_term check count as acks.
+                self.acked_index = min(self.acked_index, ack.last_index)
+                self.cond.notify_all()
+                return
+            elif not ack.success:
+                # The follower is missing earlier entries, or holds a conflicting one it won't
+                # drop; resend from its last index. Its log there isn't ours, so it acks nothing.
+                self.sent_index = min(self.sent_index, ack.last_index)
+                self.rejected = True
+            else:
+                self.acked_index = max(self.acked_index, ack.last_index)
+            self.cond.notify_all()
+        with self.server.replication_acked:
+            self.server.replication_acked.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                generation = self.generation
+            try:
+                stub = self.server.peer_pool.stub(self.peer)
+            except ConnectionError:
+                time.sleep(0.1)  # Peer is still in its backoff window
+                continue
+            try:
+                for ack in stub.ReplicationStream(self.requests(generation)):
+                    self.server.peer_pool.mark_success(self.peer)
+                    self.on_ack(ack)
+            except Exception:
+                self.server.peer_pool.mark_failure(self.peer)
+            # Stream ended: stop the old generator and re-probe on the next connection.
+            with self.cond:
+                self.generation += 1
+                self.synced = False
+                self.sent_index = self.acked_index
+                self.cond.notify_all()
+            time.sleep(0.1)
+
+class PhiAccrualDetector:
+    """
+    Phi-accrual failure detector over the arrival times of a leader's heartbeats. phi is
+    -log10 of the probability that the next heartbeat comes this late, given the mean and
+    deviation of recent inter-arrival times (a normal approximation), so it rises faster
+    after regular heartbeats than after jittery ones. min_std keeps a perfectly regular
+    history from making the detector trigger-happy.
+    """
+    def __init__(self, expected_interval, min_std, window=100):
+        self.expected_interval = expected_interval
+        self.min_std = min_std
+        self.intervals = collections.deque(maxlen=window)
+        self.reset()
+
+    def reset(self):
+        """Forgets the history (new leader); until it speaks, time is counted from now."""
+        self.intervals.clear()
+        self.intervals.append(self.expected_interval)
+        self.last = time.time()
+
+    def heartbeat(self, now=None):
+        now = now if now is not None else time.time()
+        self.intervals.append(now - self.last)
+        self.last = now
+
+    def phi(self, now=None):
+        now = now if now is not None else time.time()
+        mean = sum(self.intervals) / len(self.intervals)
+        variance = sum((i - mean) ** 2 for i in self.intervals) / len(self.intervals)
+        std = max(math.sqrt(variance), self.min_std)
+        p_later = 0.5 * math.erfc((now - self.last - mean) / (std * math.sqrt(2)))
+        return -math.log10(p_later) if p_later > 0 else float("inf")
+
+# Status a subscription ends with when it is evicted; the client reads what it missed with
+# ReadMessages (the messages are still unread in the database) and then resubscribes.
+SUBSCRIPTION_OVERFLOW = "Subscription fell behind and was closed; fetch missed messages with ReadMessages and resubscribe"
+# Trailing metadata marking that eviction, so clients can tell it from a concurrency limit,
+# which fails with the same RESOURCE_EXHAUSTED status but calls for backing off.
+EVICTED_KEY = "subscription-evicted"
+
+class Subscription:
+    """
+    One open SubscribeMessages stream. depth() is how many pushed messages are still queued
+    for it. close() ends the stream after what is already queued; evict() ends it right away,
+    dropping anything still queued.
+    """
+    def __init__(self, username):
+        self.username = username
+        self.queue = queue.Queue()
+        self.evicted = False
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def get(self):
+        item = self.queue.get()
+        return None if self.evicted else item
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def close(self):
+        self.put(None)
+
+    def evict(self):
+        self.evicted = True
+        self.put(None)
+
+class SubscriptionRegistry:
+    """
+    Open subscription streams by username. A user can be subscribed from several devices at
+    once, and publish() fans each message out to all of their streams. A stream that already
+    has max_queue messages waiting is a slow consumer: it is evicted, so nothing more is
+    pushed or buffered for it, and its stream ends with RESOURCE_EXHAUSTED (SUBSCRIPTION_OVERFLOW).
+    metrics() reports queue depth, pushes, evictions and dropped pushes.
+    """
+    def __init__(self, max_queue=256):
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.streams = {}
+        self.pushed = 0
+        self.evicted = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def __contains__(self, username):
+        with self.lock:
+            return bool(self.streams.get(username))
+
+    def add(self, subscription):
+        with self.lock:
+            self.streams.setdefault(subscription.username, []).append(subscription)
+
+    def remove(self, subscription):
+        with self.lock:
+            self.discard(subscription)
+
+    def discard(self, subscription):
+        streams = self.streams.get(subscription.username, [])
+        if subscription in streams:
+            streams.remove(subscription)
+            if not streams:
+                del self.streams[subscription.username]
+
+    def publish(self, username, item):
+        """Queues item on every stream of username; returns how many streams took it."""
+        delivered = 0
+        with self.lock:
+            for subscription in list(self.streams.get(username, [])):
+                depth = subscription.depth()
+                if depth >= self.max_queue:
+                    # Everything queued plus this message is dropped from the stream.
+                    self.evicted += 1
+                    self.dropped += depth + 1
+                    print(f"Evicting slow subscriber {username}: {depth} messages queued; {self.metrics_locked()}")
+                    self.discard(subscription)
+                    subscription.evict()
+                else:
+                    subscription.put(item)
+                    delivered += 1
+                    self.max_depth = max(self.max_depth, depth + 1)
+            self.pushed += delivered
+        return delivered
+
+    def close_user(self, username):
+        """Ends every stream of username (logout, account deleted); returns whether there were any."""
+        with self.lock:
+            streams = self.streams.pop(username, [])
+        for subscription in streams:
+            subscription.close()
+        return bool(streams)
+
+    def metrics(self):
+        with self.lock:
+            return self.metrics_locked()
+
+    def metrics_locked(self):
+        depths = [subscription.depth() for streams in self.streams.values() for subscription in streams]
+        return {
+            "streams": len(depths),
+            "queued": sum(depths),
+            "deepest": max(depths, default=0),
+            "max_depth": self.max_depth,
+            "pushed": self.pushed,
+            "evicted": self.evicted,
+            "dropped": self.dropped,
+        }
+
+def parse_method_limits(values):
+    """Turns ["SubscribeMessages=8", ...] (from --method-limit) into {"SubscribeMessages": 8}."""
+    limits = {}
+    for value in values or []:
+        method, _, limit = value.partition("=")
+        limits[method.strip()] = int(limit)
+    return limits
+
+def server_options(keepalive_time_ms, keepalive_timeout_ms):
+    """Channel options for a serving gRPC server: keepalive pings, and accepting the peers' own pings."""
+    return [
+        ("grpc.keepalive_time_ms", keepalive_time_ms),
+        ("grpc.keepalive_timeout_ms", keepalive_timeout_ms),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        # Peers ping every 10s (PeerPool.CHANNEL_OPTIONS); the 5 minute default would GOAWAY them.
+        ("grpc.http2.min_recv_ping_interval_without_data_ms", 5000),
+    ]
+
+def method_name(handler_call_details):
+    return handler_call_details.method.rsplit("/", 1)[-1]
+
+class ConcurrencyLimitInterceptor(grpc.ServerInterceptor):
+    """
+    Caps how many calls of a given method may run at once, e.g. {"SubscribeMessages": 5}.
+    Each open call holds a worker thread (a stream for its whole life), so without a cap
+    long-lived subscriptions can occupy the whole pool. A call over its limit fails fast
+    with RESOURCE_EXHAUSTED instead of queueing behind them.
+    """
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self.semaphores = {method: threading.BoundedSemaphore(limit) for method, limit in self.limits.items()}
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        method = method_name(handler_call_details)
+        semaphore = self.semaphores.get(method)
+        if handler is None or semaphore is None:
+            return handler
+        if handler.response_streaming:
+            field = "stream_stream" if handler.request_streaming else "unary_stream"
+            wrapper = self.limit_stream(getattr(handler, field), semaphore, method)
+        else:
+            field = "stream_unary" if handler.request_streaming else "unary_unary"
+            wrapper = self.limit_unary(getattr(handler, field), semaphore, method)
+        return handler._replace(**{field: wrapper})
+
+    def limit_unary(self, behavior, semaphore, method):
+        def call(request, context):
+            if not semaphore.acquire(blocking=False):
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Too many concurrent {method} calls ({self.limits[method]})")
+            try:
+                return behavior(request, context)
+            finally:
+                semaphore.release()
+        return call
+
+    def limit_stream(self, behavior, semaphore, method):
+        def call(request, context):
+            if not semaphore.acquire(blocking=False):
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Too many concurrent {method} calls ({self.limits[method]})")
+            try:
+                # Held until the stream ends, including a client cancel (which closes the generator).
+                yield from behavior(request, context)
+            finally:
+                semaphore.release()
+        return call
+
 class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationServiceServicer):
-    def __init__(self, server_id, address, config_file="config.json"):
+    def __init__(self, server_id, address, config_file="config.json", max_batch_size=None, max_linger_ms=None):
         self.id = server_id
         self.address = address
         with open(config_file, "r") as f:  # Use config_file here
             config_data = json.load(f)    # Assign loaded JSON to config_data
         self.all_servers = {server["id"]: server["address"] for server in config_data["servers"]}
         self.peers = [addr for sid, addr in self.all_servers.items() if sid != self.id]
+        self.server_ids = {addr: sid for sid, addr in self.all_servers.items()}
         self.is_leader = False
         self.leader_address = None  # Initially unknown
         self.alive_peers = {peer: 0 for peer in self.peers}  # Last heartbeat timestamp
-        self.conn = sqlite3.connect(f"chat_db_{server_id}.db", check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.active_subscriptions = {}  # Only leader uses this
+        # Peer acks needed (besides the leader itself) for a write to reach a majority.
+        self.quorum = len(self.all_servers) // 2
+        # Long-lived channels to every peer, shared by heartbeats, elections and replication.
+        self.peer_pool = PeerPool(self.peers)
+        # Replication streams to followers, started the first time this server replicates.
+        # Batch settings come from config.json ("replication") unless overridden on the CLI.
+        replication_config = config_data.get("replication", {})
+        self.replication_timeout = replication_config.get("timeout", 1.0)
+        # Replicas more than this many entries behind a peer bootstrap from a snapshot instead.
+        self.snapshot_threshold = replication_config.get("snapshot_threshold", 10000)
+        self.follower_streams = {
+            peer: FollowerStream(
+                self,
+                peer,
+                max_batch_size=max_batch_size or replication_config.get("max_batch_size", 64),
+                max_linger_ms=max_linger_ms if max_linger_ms is not None else replication_config.get("max_linger_ms", 2),
+            )
+            for peer in self.peers
+        }
+        self.streams_started = False
+        # Messages marked delivered by reads and acks, replicated in batches (flush_delivered).
+        self.delivered_pending = {}
+        self.delivered_lock = threading.Lock()
+        self.delivery_flush_interval = replication_config.get("delivery_flush_ms", 50) / 1000
+        # The leader heartbeats every heartbeat_interval, except to followers that got a
+        # replication batch more recently (batches carry the same information).
+        self.heartbeat_interval = replication_config.get("heartbeat_interval_ms", 100) / 1000
+        # Leader lease for local reads: runs lease_duration from when a majority was last asked
+        # and granted it. A replica that grants promises not to grant (or vote for) another
+        # leader for lease_duration, so two leaders never hold a lease at once.
+        self.lease_duration = replication_config.get("lease_ms", 3 * 1000 * self.heartbeat_interval) / 1000
+        self.lease_expires = 0  # As leader: until when reads may be served locally
+        self.lease_grants = {}  # As leader: peer -> when we sent the request it last granted
+        # As any replica: who we promised, and until when. A promise made before a restart is
+        # forgotten, so count one to an unknown holder ("") as just made: no votes or grants
+        # to anyone until it would have run out.
+        self.lease_holder = ""
+        self.lease_granted_until = time.time() + self.lease_duration
+        self.lease_lock = threading.Lock()
+        # Raft-style elections: a follower stands for the next term once the failure detector
+        # suspects the leader (phi past phi_threshold) and its lease promise has run out, both
+        # checked a random election_jitter later than for other followers so they rarely collide.
+        self.phi_threshold = replication_config.get("phi_threshold", 8.0)
+        self.failure_detector = PhiAccrualDetector(self.heartbeat_interval, self.heartbeat_interval / 4)
+        self.election_jitter_max = replication_config.get("election_jitter_ms", 2 * 1000 * self.heartbeat_interval) / 1000
+        self.election_deadline = 0  # Not before this (after standing or voting)
+        self.reset_election_timer()
+        self.replication_acked = threading.Condition()
+        # bcrypt runs in worker processes; sized from config.json ("auth").
+        auth_config = config_data.get("auth", {})
+        self.password_pool = PasswordPool(auth_config.get("workers", 2), auth_config.get("max_pending", 64))
+        # Session tokens are signed with a secret shared by every replica, so a token from
+        # Login still resumes on whichever server becomes leader after a failover.
+        session_secret = load_session_secret(auth_config, config_file)
+        if not session_secret:
+            print(f"Server {self.id}: WARNING: no {SESSION_SECRET_ENV} or auth.session_secret_file; session tokens will only be valid on this server")
+            session_secret = os.urandom(32).hex()
+        self.session_secret = session_secret.encode("utf-8")
+        self.session_ttl = auth_config.get("session_ttl", 3600)
+        # RPC serving limits from config.json ("server"); the CLI flags override them.
+        server_config = config_data.get("server", {})
+        self.workers = server_config.get("workers", 10)
+        self.max_concurrent_rpcs = server_config.get("max_concurrent_rpcs")
+        self.method_limits = server_config.get("method_limits", {})
+        self.keepalive_time_ms = server_config.get("keepalive_time_ms", 20000)
+        self.keepalive_timeout_ms = server_config.get("keepalive_timeout_ms", 10000)
+        # With forward_writes a follower proxies leader-only RPCs to the leader over its pooled
+        # peer channel; otherwise it refuses them with a leader hint (see not_leader).
+        self.forward_writes = server_config.get("forward_writes", False)
+        self.forward_timeout = server_config.get("forward_timeout", 5.0)
+        # Guards the replicated log and the apply path (the cursor is shared across threads).
+        self.log_lock = threading.RLock()
+        self.log_cache = collections.OrderedDict()  # Recent entries by index, to avoid rereading the log
+        # Open subscription streams, possibly several per user (only the leader has any).
+        self.active_subscriptions = SubscriptionRegistry(server_config.get("subscription_queue_size", 256))
         # Initialize database (move schema creation here if not already done globally)
 
         # Database setup
-        self.conn = sqlite3.connect(f"chat_db_{server_id}.db", check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        # Every thread (gRPC workers, heartbeat, replication streams) gets its own connection;
+        # see the conn/cursor properties below.
+        self.db_path = f"chat_db_{server_id}.db"
+        self.local = threading.local()
+        self.connections = {}  # Thread -> its connection, closed once the thread has exited
+        self.connections_lock = threading.Lock()
         
         # Create tables
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT UNIQUE NOT NULL,
-                password_hash BLOB NOT NULL
+                password_hash BLOB NOT NULL,
+                session_key TEXT NOT NULL DEFAULT ''
             )
         ''')
+        # Databases from before session keys get the column; their accounts keep signing with
+        # an empty key until the user's next logout.
+        self.cursor.execute("PRAGMA table_info(users)")
+        if "session_key" not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE users ADD COLUMN session_key TEXT NOT NULL DEFAULT ''")
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS messages (
                 id INTEGER PRIMARY KEY,
@@ -60,145 +620,702 @@ class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationSer
                 delivered INTEGER DEFAULT 0
             )
         ''')
+        # Indexes for the per-recipient unread and list queries (sorted by id) and the sender/recipient delete.
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient_delivered ON messages (recipient, delivered, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages (recipient, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender)")
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS sequence (
                 name TEXT PRIMARY KEY,
                 value INTEGER
             )
         ''')
+        # Append-only replicated log; entry holds a serialized chat_pb2.LogEntry.
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS replication_log (
+                log_index INTEGER PRIMARY KEY,
+                term INTEGER NOT NULL,
+                entry BLOB NOT NULL
+            )
+        ''')
         self.conn.commit()
 
+        self.last_applied = self.get_sequence_value("last_applied")
+        self.current_term = self.get_sequence_value("current_term")
+        self.voted_for = self.get_sequence_value("voted_for")  # Server id we voted for in current_term (0: nobody)
+        # Log entries up to snapshot_index were replaced by a snapshot and are not kept.
+        self.snapshot_index = self.get_sequence_value("snapshot_index")
+        self.snapshot_term = self.get_sequence_value("snapshot_term")  # Term of the entry at snapshot_index
+        self.cursor.execute("SELECT COALESCE(MAX(log_index), 0) FROM replication_log")
+        self.last_log_index = max(self.cursor.fetchone()[0], self.snapshot_index)
+        self.catching_up = False
+        # The leader's applied index as of its last heartbeat, and when that arrived; bounds
+        # how stale this replica's data is for follower reads (read_staleness_ms).
+        self.leader_applied_index = 0
+        self.leader_applied_at = 0
+        # Our last log index known to agree with the current leader's log. Followers apply
+        # entries only once the leader has (it applies what a majority has acked) and only
+        # up to here, so a deposed leader's unacked entries never reach the chat tables.
+        self.leader_match_index = self.last_applied
+
+        # Per-user count of undelivered messages, so Login doesn't COUNT(*) on every call.
+        self.unread_counts = {}
+        self.unread_lock = threading.Lock()
+        self.rebuild_unread_counts()
+
+    # Unread counters
+    def rebuild_unread_counts(self):
+        """Reloads the unread counters from the messages table (at startup and after a snapshot)."""
+        self.cursor.execute("SELECT recipient, COUNT(*) FROM messages WHERE delivered = 0 GROUP BY recipient")
+        with self.unread_lock:
+            self.unread_counts = dict(self.cursor.fetchall())
+
+    def adjust_unread(self, username, delta):
+        with self.unread_lock:
+            count = self.unread_counts.get(username, 0) + delta
+            if count > 0:
+                self.unread_counts[username] = count
+            else:
+                self.unread_counts.pop(username, None)
+
+    # Session tokens
+    def session_signature(self, payload, session_key):
+        return hmac.new(self.session_secret, f"{payload}.{session_key}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def session_key(self, username):
+        """Returns the user's current session key, or None if there is no such account."""
+        self.cursor.execute("SELECT session_key FROM users WHERE username = ?", (username,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def issue_session_token(self, username):
+        """
+        Returns (token, expires_at); the token is base64(username:expires_at).hmac, signed over
+        the user's session key too, so logging out or recreating the account revokes it.
+        """
+        expires_at = int(time.time()) + self.session_ttl
+        payload = base64.urlsafe_b64encode(f"{username}:{expires_at}".encode("utf-8")).decode("ascii")
+        return f"{payload}.{self.session_signature(payload, self.session_key(username))}", expires_at
+
+    def verify_session_token(self, token):
+        """Returns the token's username, or None if it is malformed, forged, expired or revoked."""
+        try:
+            payload, signature = token.split(".")
+            username, expires_at = base64.urlsafe_b64decode(payload).decode("utf-8").rsplit(":", 1)
+            session_key = self.session_key(username)
+            if session_key is None:
+                return None
+            if not hmac.compare_digest(signature, self.session_signature(payload, session_key)):
+                return None
+            if int(expires_at) < time.time():
+                return None
+            return username
+        except Exception:
+            return None
+
+    # Storage
+    def connect(self):
+        """
+        Opens a connection in WAL mode so readers never block the writer (or each other).
+        synchronous=NORMAL is durable across application crashes in WAL mode and skips an
+        fsync per commit; the busy timeout makes concurrent writers wait instead of failing.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @property
+    def conn(self):
+        """
+        This thread's SQLite connection, opened on first use. Opening one also closes those
+        of threads that have exited (catch-up threads, replication request iterators), so
+        short-lived threads don't leak connections.
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self.local.conn = conn
+            self.local.cursor = conn.cursor()
+            with self.connections_lock:
+                for thread in [thread for thread in self.connections if not thread.is_alive()]:
+                    self.connections.pop(thread).close()
+                self.connections[threading.current_thread()] = conn
+        return conn
+
+    @property
+    def cursor(self):
+        """This thread's cursor on its own connection."""
+        self.conn
+        return self.local.cursor
+
+    def close(self):
+        """Closes the peer channels, the password pool and every thread's database connection."""
+        self.peer_pool.close()
+        self.password_pool.close()
+        print(f"Subscriptions: {self.active_subscriptions.metrics()}")
+        with self.connections_lock:
+            for conn in self.connections.values():
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self.connections.clear()
+
     def start(self):
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        method_limits = dict(self.method_limits)
+        # A subscription holds a worker thread for as long as the client stays connected;
+        # unless configured, let subscriptions take at most half the pool.
+        method_limits.setdefault("SubscribeMessages", max(1, self.workers // 2))
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=self.workers),
+            interceptors=[ConcurrencyLimitInterceptor(method_limits)],
+            options=server_options(self.keepalive_time_ms, self.keepalive_timeout_ms),
+            maximum_concurrent_rpcs=self.max_concurrent_rpcs,
+        )
         chat_pb2_grpc.add_ChatServiceServicer_to_server(self, server)
         chat_pb2_grpc.add_ReplicationServiceServicer_to_server(self, server)
         server.add_insecure_port(self.address)
-        print(f"Server {self.id} starting on {self.address}...")
+        print(f"Server {self.id} starting on {self.address} ({self.workers} workers, limits {method_limits})...")
         server.start()
+        # Bootstrap (snapshot if empty or far behind) and catch up before taking part in elections.
+        self.synchronize_database()
         threading.Thread(target=self.heartbeat_loop, daemon=True).start()
+        threading.Thread(target=self.delivery_flush_loop, daemon=True).start()
         try:
             server.wait_for_termination()
         except KeyboardInterrupt:
             print("Server shutting down...")
             server.stop(0)
+            self.close()
 
     def heartbeat_loop(self):
+        self.hold_off_elections()
         while True:
-            # Send heartbeats
-            for peer in self.peers:
-                try:
-                    with grpc.insecure_channel(peer) as channel:
-                        stub = chat_pb2_grpc.ReplicationServiceStub(channel)
-                        stub.Heartbeat(chat_pb2.HeartbeatRequest(sender_address=self.address), timeout=1)
-                except:
-                    pass
-            # Check leader status
-            if self.leader_address:
-                if self.leader_address == self.address:
-                    self.is_leader = True
-                elif time.time() - self.alive_peers.get(self.leader_address, 0) > 3:  # 3s timeout
-                    self.initiate_election()
-            else:
+            if self.is_leader:
+                self.send_heartbeats()
+                time.sleep(self.heartbeat_interval)
+            elif self.election_due():
                 self.initiate_election()
-            time.sleep(1)
+            else:
+                time.sleep(self.heartbeat_interval / 2)
+
+    def send_heartbeats(self):
+        started = time.time()
+        peers = self.heartbeat_peers(started)
+        responses = self.peer_pool.call_all(peers, "Heartbeat", self.heartbeat_request(), timeout=self.heartbeat_interval)
+        self.on_heartbeat_responses(started, peers, responses)
+
+    def heartbeat_peers(self, now):
+        """Peers that have not acked a replication batch (a piggybacked heartbeat) within the interval."""
+        return [peer for peer in self.peers if now - self.follower_streams[peer].last_ack_at >= self.heartbeat_interval]
+
+    def heartbeat_request(self):
+        return chat_pb2.HeartbeatRequest(sender_address=self.address, applied_index=self.last_applied, term=self.current_term)
+
+    def on_heartbeat_responses(self, started, peers, responses):
+        """Steps down if a peer has seen a newer term; otherwise records the lease grants."""
+        for peer, response in zip(peers, responses):
+            if isinstance(response, Exception):
+                continue
+            if self.observe_term(response.term):
+                return
+        self.record_lease_grants([(peer, started) for peer, response in zip(peers, responses)
+                                  if not isinstance(response, Exception) and response.success])
+
+    # Elections
+    def reset_election_timer(self):
+        """Draws a new random election delay, after hearing from the leader or granting a vote."""
+        self.election_jitter = random.uniform(0, self.election_jitter_max)
+
+    def hold_off_elections(self):
+        """
+        On startup, gives the leader time to reach us before we suspect it: its channel to us
+        may still be in reconnect backoff, and standing now would depose a healthy leader.
+        """
+        self.failure_detector.reset()
+        self.election_deadline = time.time() + self.peer_pool.max_backoff + self.election_jitter_max
+
+    def election_due(self):
+        now = time.time() - self.election_jitter
+        return (time.time() >= self.election_deadline and now >= self.lease_granted_until and
+                self.failure_detector.phi(now) >= self.phi_threshold)
+
+    def observe_term(self, term):
+        """
+        Adopts a newer term seen in any request or response: forgets our vote and leader and
+        steps down. Returns whether the term was newer.
+        """
+        with self.log_lock:
+            if term <= self.current_term:
+                return False
+            self.current_term = term
+            self.voted_for = 0
+            self.set_sequence_value("current_term", term)
+            self.set_sequence_value("voted_for", 0)
+            self.conn.commit()
+        if self.is_leader:
+            print(f"Server {self.id}: saw term {term}, stepping down")
+        self.is_leader = False
+        self.lease_expires = 0
+        self.leader_address = None
+        with self.replication_acked:
+            self.replication_acked.notify_all()  # Pending writes fail instead of waiting out the timeout
+        return True
+
+    def follow(self, leader_address):
+        """Accepts leader_address as the leader of the current term, and counts this as hearing from it."""
+        if leader_address != self.leader_address:
+            self.leader_applied_at = 0  # Not fresh for follower reads until the new leader's first heartbeat
+            self.leader_address = leader_address
+            self.leader_match_index = self.last_applied  # Every leader has the applied entries
+            self.failure_detector.reset()
+        else:
+            self.failure_detector.heartbeat()
+        self.is_leader = (self.address == leader_address)
+        if not self.is_leader:
+            self.lease_expires = 0
+        self.reset_election_timer()
+
+    def on_leader_contact(self, leader_address, applied_index):
+        """A heartbeat, or a replication batch, from the leader of our term. Returns whether we granted it a lease."""
+        self.alive_peers[leader_address] = time.time()
+        self.follow(leader_address)
+        self.leader_applied_index = applied_index
+        self.leader_applied_at = time.time()
+        self.apply_committed(applied_index)
+        return self.grant_lease(leader_address)
+
+    def new_election(self):
+        """Starts a candidacy: moves to the next term, votes for ourselves, and returns the vote request."""
+        with self.log_lock:
+            self.current_term += 1
+            self.voted_for = self.id
+            self.set_sequence_value("current_term", self.current_term)
+            self.set_sequence_value("voted_for", self.id)
+            self.conn.commit()
+            request = chat_pb2.ElectionRequest(sender_address=self.address, term=self.current_term,
+                                               last_log_index=self.last_log_index, last_log_term=self.entry_term(self.last_log_index))
+        self.is_leader = False
+        self.lease_expires = 0
+        self.leader_address = None
+        # If the vote splits, try again after a random delay long enough for this round's votes.
+        self.election_deadline = time.time() + self.heartbeat_interval + random.uniform(0, self.election_jitter_max)
+        self.reset_election_timer()
+        print(f"Server {self.id}: standing for election in term {request.term}")
+        return request
+
+    def won_election(self, request, responses):
+        """Counts the votes for request (ours included); responses holds exceptions for unreachable peers."""
+        votes = 1
+        for response in responses:
+            if isinstance(response, Exception):
+                continue
+            if self.observe_term(response.term):
+                return False
+            votes += response.ok
+        return votes > len(self.all_servers) // 2 and self.current_term == request.term and self.leader_address is None
 
     def initiate_election(self):
-        higher_peers = [p for p in self.peers if int(p.split(':')[-1]) - 50050 > self.id]
-        if not higher_peers:
-            self.become_leader()
-            return
-        any_higher_alive = False
-        for peer in higher_peers:
-            try:
-                with grpc.insecure_channel(peer) as channel:
-                    stub = chat_pb2_grpc.ReplicationServiceStub(channel)
-                    response = stub.RequestElection(chat_pb2.ElectionRequest(sender_address=self.address), timeout=1)
-                    if response.ok:
-                        any_higher_alive = True
-                        break
-            except:
-                pass
-        if not any_higher_alive:
+        request = self.new_election()
+        if self.won_election(request, self.peer_pool.call_all(self.peers, "RequestElection", request, timeout=self.heartbeat_interval)):
             self.become_leader()
 
     def become_leader(self):
-        self.is_leader = True
-        self.leader_address = self.address
-        print(f"Server {self.id} elected as leader at {self.address}")
-        self.synchronize_database()
-        for peer in self.peers:
-            try:
-                with grpc.insecure_channel(peer) as channel:
-                    stub = chat_pb2_grpc.ReplicationServiceStub(channel)
-                    stub.SetLeader(chat_pb2.SetLeaderRequest(leader_address=self.address), timeout=1)
-            except:
-                pass
+        self.take_leadership()
+        self.peer_pool.call_all(self.peers, "SetLeader", chat_pb2.SetLeaderRequest(leader_address=self.address, term=self.current_term))
+
+    def grant_lease(self, holder):
+        """
+        Promises holder not to ack any other leader for lease_duration. False while an
+        earlier promise to another server has not yet run out.
+        """
+        with self.lease_lock:
+            now = time.time()
+            if self.lease_holder not in (None, holder) and now < self.lease_granted_until:
+                return False
+            self.lease_holder = holder
+            self.lease_granted_until = now + self.lease_duration
+            return True
+
+    def record_lease_grants(self, grants):
+        """grants: (peer, sent_at) for heartbeats or batches, sent at sent_at, that the peer granted."""
+        with self.lease_lock:
+            for peer, sent_at in grants:
+                self.lease_grants[peer] = max(self.lease_grants.get(peer, 0), sent_at)
+        self.renew_lease()
+
+    def renew_lease(self):
+        """
+        Extends our read lease. lease_grants holds, per peer, the send time of the latest
+        heartbeat or batch it granted; it granted after that, so its promise outlasts that
+        time + lease_duration. The lease runs until the quorum-th latest of those.
+        """
+        with self.lease_lock:
+            grants = sorted(self.lease_grants.values(), reverse=True)
+        if not self.is_leader or len(grants) < self.quorum or not self.grant_lease(self.address):
+            return
+        started = grants[self.quorum - 1] if self.quorum else time.time()
+        self.lease_expires = max(self.lease_expires, started + self.lease_duration)
+
+    def has_lease(self):
+        return self.is_leader and time.time() < self.lease_expires
+
+    def take_leadership(self):
+        """
+        Local half of becoming leader. Voters only elect a candidate whose log is at least as
+        up to date as theirs, so there is nothing to pull from peers: we just resume message
+        ids after our own and start streaming our log, which overwrites conflicting entries.
+        """
+        with self.lease_lock:
+            self.lease_grants = {}  # Grants to us in an earlier term are void
+        self.follow(self.address)
+        print(f"Server {self.id} elected as leader at {self.address} for term {self.current_term}")
+        self.reset_message_id()
+        for stream in self.follower_streams.values():
+            stream.reset()
+        self.start_replication_streams()
+        threading.Thread(target=self.commit_no_op, daemon=True).start()
+
+    def commit_no_op(self):
+        """
+        Entries from earlier terms that we hold but haven't applied may or may not have been
+        committed; committing an entry of our own term commits them too, so they are applied
+        now rather than on the next client write.
+        """
+        entry = self.append_to_log(chat_pb2.LogEntry(no_op=chat_pb2.NoOp()))
+        if self.replicate_operation(entry):
+            self.apply_operation(entry)
 
     def synchronize_database(self):
-        users = set()
-        messages = set()
-        acks = 0
-        for peer in self.peers:
+        """
+        Catches this replica up from the leader of the current term. A replica that is empty,
+        or too far behind to replay the log cheaply, first loads a StreamSnapshot; after that
+        only the missing log entries are streamed (GetStateSince). Other peers may still hold
+        a deposed leader's entries, so with no known leader this does nothing: the leader's
+        replication stream reaches us soon, and a gap in it calls request_catch_up.
+        """
+        leader = self.leader_address
+        if leader and leader != self.address:
             try:
-                with grpc.insecure_channel(peer) as channel:
-                    stub = chat_pb2_grpc.ChatServiceStub(channel)
-                    response = stub.GetState(chat_pb2.GetStateRequest(), timeout=1)
-                    for user in response.users:
-                        users.add((user.username, user.password_hash))
-                    for msg in response.messages:
-                        messages.add((msg.id, msg.sender, msg.recipient, msg.message, msg.timestamp, msg.delivered))
-                    acks += 1
-                    if acks >= 2:
-                        break
-            except:
-                pass
-        if acks >= 2:
-            for user in users:
-                self.cursor.execute("INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)", user)
-            for msg in messages:
-                self.cursor.execute("INSERT OR IGNORE INTO messages (id, sender, recipient, message, timestamp, delivered) VALUES (?, ?, ?, ?, ?, ?)", msg)
-            self.conn.commit()
+                status = self.peer_pool.call(leader, "Heartbeat", chat_pb2.HeartbeatRequest(), timeout=1)  # Status probe
+                if status.term < self.current_term:
+                    print(f"Server {self.id}: not catching up from {leader}, it is behind term {self.current_term}")
+                else:
+                    self.catch_up_from(leader, status)
+            except (grpc.RpcError, ConnectionError) as e:
+                self.peer_pool.mark_failure(leader)
+                print(f"Server {self.id}: catch-up from {leader} failed: {e}")
+        self.reset_message_id()
+
+    def catch_up_from(self, leader, status):
+        stub = self.peer_pool.stub(leader)
+        if self.needs_snapshot(status):
+            loaded = self.load_snapshot(stub.StreamSnapshot(chat_pb2.SnapshotRequest(), timeout=300))
+            print(f"Server {self.id}: loaded snapshot up to log index {loaded} from {leader}")
+        # Entries after last_applied are resent even if we have them, so append_entries
+        # replaces any of ours whose term doesn't match the leader's.
+        request = chat_pb2.GetStateSinceRequest(log_index=self.last_applied)
+        received = 0
+        for chunk in stub.GetStateSince(request, timeout=30):
+            if chunk.entries:
+                self.append_entries(chunk.entries, commit_index=self.leader_applied_index)
+                received += len(chunk.entries)
+        self.peer_pool.mark_success(leader)
+        if received:
+            print(f"Server {self.id}: caught up {received} log entries from {leader}")
+
+    def reset_message_id(self):
+        """Followers don't allocate message ids; a new leader continues after the highest one it has."""
+        with self.log_lock:
             self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM messages")
             max_id = self.cursor.fetchone()[0]
             self.cursor.execute("INSERT OR REPLACE INTO sequence (name, value) VALUES ('message_id', ?)", (max_id + 1,))
             self.conn.commit()
 
-    def apply_operation(self, operation):
-        parts = operation.split(":")
-        cmd = parts[0]
-        if cmd == "CreateAccount":
-            username, password_hash = parts[1], parts[2].encode()
-            self.cursor.execute("INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
-        elif cmd == "SendMessage":
-                id, sender, recipient, message, timestamp = int(parts[1]), parts[2], parts[3], parts[4], int(parts[5])
-                print(f"Server {self.id}: Storing message with timestamp {timestamp}")
+    def needs_snapshot(self, peer_status):
+        if self.last_applied < peer_status.snapshot_index:
+            return True  # The peer no longer has the log entries we are missing
+        if peer_status.last_log_index - self.last_log_index > self.snapshot_threshold:
+            return True
+        with self.log_lock:
+            self.cursor.execute("SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM messages)")
+            has_data = self.cursor.fetchone()[0]
+        return self.last_applied == 0 and not has_data
+
+    def request_catch_up(self):
+        """Runs synchronize_database in the background, at most once at a time."""
+        with self.log_lock:
+            if self.catching_up:
+                return
+            self.catching_up = True
+
+        def run():
+            try:
+                self.synchronize_database()
+            finally:
+                self.catching_up = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # Replicated Log
+    def get_sequence_value(self, name):
+        self.cursor.execute("SELECT value FROM sequence WHERE name = ?", (name,))
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
+    def set_sequence_value(self, name, value):
+        self.cursor.execute("INSERT OR REPLACE INTO sequence (name, value) VALUES (?, ?)", (name, value))
+
+    def write_log_entry(self, entry):
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO replication_log (log_index, term, entry) VALUES (?, ?, ?)",
+            (entry.index, entry.term, entry.SerializeToString())
+        )
+        self.last_log_index = entry.index
+        self.log_cache[entry.index] = entry
+        while len(self.log_cache) > 4096:
+            self.log_cache.popitem(last=False)
+
+    def log_term(self, index):
+        self.cursor.execute("SELECT term FROM replication_log WHERE log_index = ?", (index,))
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
+    def entry_term(self, index):
+        """Term of our log entry at index; 0 if we don't have it (e.g. it is before the snapshot)."""
+        with self.log_lock:
+            if index == self.snapshot_index:
+                return self.snapshot_term
+            if index in self.log_cache:
+                return self.log_cache[index].term
+            return self.log_term(index)
+
+    def truncate_log(self, index):
+        """
+        Drops log entries from index onward (they conflict with the leader's log). Applied
+        entries are committed, so no leader's log can differ there: returns False, dropping
+        nothing, if index is at or below last_applied.
+        """
+        if index <= self.last_applied:
+            print(f"Server {self.id}: refusing to truncate the log at {index}, entries up to {self.last_applied} are committed")
+            return False
+        self.cursor.execute("DELETE FROM replication_log WHERE log_index >= ?", (index,))
+        for cached in [i for i in self.log_cache if i >= index]:
+            del self.log_cache[cached]
+        self.last_log_index = index - 1
+        self.leader_match_index = min(self.leader_match_index, index - 1)
+        return True
+
+    def read_log(self, start, count):
+        """Returns up to count entries starting at index start, in index order."""
+        with self.log_lock:
+            indexes = range(start, min(start + count, self.last_log_index + 1))
+            if all(i in self.log_cache for i in indexes):
+                return [self.log_cache[i] for i in indexes]
+            self.cursor.execute(
+                "SELECT entry FROM replication_log WHERE log_index >= ? ORDER BY log_index ASC LIMIT ?",
+                (start, count)
+            )
+            return [chat_pb2.LogEntry.FromString(row[0]) for row in self.cursor.fetchall()]
+
+    def append_entries(self, entries, prev_log_term=0, commit_index=0):
+        """
+        Follower side: appends the leader's entries to the local log, then applies entries up
+        to commit_index (the leader's applied index). Entries already present with the same
+        term are skipped; a conflicting term truncates the log from that index. Returns
+        (ok, last_index): on success the batch's last index, which now agrees with the
+        leader's log; otherwise our last log index, from which the leader resends.
+        With prev_log_term, our entry just before the batch must have that term too;
+        if it doesn't, it is dropped (with everything after it) and the batch refused.
+        """
+        with self.log_lock:
+            prev = entries[0].index - 1 if entries else 0
+            if prev_log_term and self.snapshot_index < prev <= self.last_log_index and self.log_term(prev) != prev_log_term:
+                self.truncate_log(prev)
+                self.conn.commit()
+                return False, self.last_log_index
+            ok = True
+            for entry in entries:
+                if entry.index <= self.snapshot_index:
+                    continue  # Already covered by the snapshot we loaded
+                if entry.index <= self.last_log_index:
+                    if self.log_term(entry.index) == entry.term:
+                        continue
+                    if not self.truncate_log(entry.index):
+                        ok = False
+                        break
+                if entry.index != self.last_log_index + 1:
+                    ok = False
+                    break
+                if entry.term > self.current_term:
+                    self.current_term = entry.term
+                    self.voted_for = 0
+                    self.set_sequence_value("current_term", self.current_term)
+                    self.set_sequence_value("voted_for", 0)
+                self.write_log_entry(entry)
+            self.conn.commit()
+            if ok and entries:
+                self.leader_match_index = max(self.leader_match_index, entries[-1].index)
+            self.apply_committed(commit_index)
+        if not ok and entries and entries[0].index > self.last_log_index + 1:
+            # The sender skipped entries we never saw (e.g. they were compacted into its snapshot).
+            self.request_catch_up()
+        if ok and entries:
+            return ok, entries[-1].index
+        return ok, self.last_log_index
+
+    def apply_committed(self, commit_index):
+        """Applies our log up to commit_index, as far as it is known to match the leader's."""
+        with self.log_lock:
+            target = min(commit_index, self.leader_match_index, self.last_log_index)
+            if target > self.last_applied:
+                self.apply_operation(self.read_log(target, 1)[0])
+
+    def load_snapshot(self, chunks):
+        """
+        Replaces the local users/messages with a streamed snapshot, bulk-inserting every
+        chunk inside a single transaction. Returns the log index the snapshot covers.
+        """
+        with self.log_lock:
+            try:
+                self.cursor.execute("DELETE FROM users")
+                self.cursor.execute("DELETE FROM messages")
+                last_included, last_included_term = 0, 0
+                for chunk in chunks:
+                    self.cursor.executemany(
+                        "INSERT OR IGNORE INTO users (username, password_hash, session_key) VALUES (?, ?, ?)",
+                        [(user.username, user.password_hash, user.session_key) for user in chunk.users]
+                    )
+                    self.cursor.executemany(
+                        "INSERT OR IGNORE INTO messages (id, sender, recipient, message, timestamp, delivered) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(msg.id, msg.sender, msg.recipient, msg.message, msg.timestamp, msg.delivered) for msg in chunk.messages]
+                    )
+                    last_included, last_included_term = chunk.last_included_index, chunk.last_included_term
+                # The snapshot is authoritative; the local log is restarted after it.
+                self.cursor.execute("DELETE FROM replication_log")
+                self.log_cache.clear()
+                self.snapshot_index = last_included
+                self.snapshot_term = last_included_term
+                self.last_log_index = last_included
+                self.last_applied = last_included
+                self.set_sequence_value("snapshot_index", self.snapshot_index)
+                self.set_sequence_value("snapshot_term", self.snapshot_term)
+                self.set_sequence_value("last_applied", self.last_applied)
+                self.conn.commit()
+            except:
+                self.conn.rollback()
+                raise
+            self.rebuild_unread_counts()
+            return last_included
+
+    def apply_operation(self, entry):
+        """
+        Applies log entries to the chat tables in index order, up to and including entry.
+        Unapplied entries before it are replayed from the log first; entries at or below
+        last_applied are skipped, so replay is idempotent.
+        """
+        with self.log_lock:
+            if entry.index > self.last_applied + 1:
+                for earlier in self.read_log(self.last_applied + 1, entry.index - self.last_applied - 1):
+                    self.execute_entry(earlier)
+            self.execute_entry(entry)
+            self.set_sequence_value("last_applied", self.last_applied)
+            self.conn.commit()
+
+    def execute_entry(self, entry):
+        if entry.index <= self.last_applied:
+            return
+        op = entry.WhichOneof("op")
+        if op == "create_account":
+            account = entry.create_account
+            self.cursor.execute("INSERT OR IGNORE INTO users (username, password_hash, session_key) VALUES (?, ?, ?)",
+                                (account.username, account.password_hash, account.session_key))
+        elif op == "send_message":
+            msg = entry.send_message
+            print(f"Server {self.id}: Storing message with timestamp {msg.timestamp}")
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO messages (id, sender, recipient, message, timestamp, delivered) VALUES (?, ?, ?, ?, ?, 0)",
+                (msg.id, msg.sender, msg.recipient, msg.message, msg.timestamp)
+            )
+            if self.cursor.rowcount == 1:
+                self.adjust_unread(msg.recipient, 1)
+        elif op == "delete_messages":
+            message_ids = list(entry.delete_messages.message_ids)
+            if message_ids:
+                placeholders = ",".join("?" for _ in message_ids)
+                params = message_ids + [entry.delete_messages.username]
+                self.cursor.execute(f"SELECT COUNT(*) FROM messages WHERE id IN ({placeholders}) AND recipient = ? AND delivered = 0", params)
+                unread_deleted = self.cursor.fetchone()[0]
+                self.cursor.execute(f"DELETE FROM messages WHERE id IN ({placeholders}) AND recipient = ?", params)
+                self.adjust_unread(entry.delete_messages.username, -unread_deleted)
+        elif op == "mark_delivered":
+            for delivered in entry.mark_delivered.ranges:
                 self.cursor.execute(
-                    "INSERT OR IGNORE INTO messages (id, sender, recipient, message, timestamp, delivered) VALUES (?, ?, ?, ?, ?, 0)",
-                    (id, sender, recipient, message, timestamp)
+                    "UPDATE messages SET delivered = 1 WHERE recipient = ? AND id BETWEEN ? AND ? AND delivered = 0",
+                    (delivered.recipient, delivered.first_id, delivered.last_id)
                 )
-        elif cmd == "DeleteMessages":
-            recipient, message_ids = parts[1], [int(i) for i in parts[2].split(",")]
-            placeholders = ",".join("?" for _ in message_ids)
-            self.cursor.execute(f"DELETE FROM messages WHERE id IN ({placeholders}) AND recipient = ?", message_ids + [recipient])
-        elif cmd == "DeleteAccount":
-            username = parts[1]
+                self.adjust_unread(delivered.recipient, -self.cursor.rowcount)
+        elif op == "delete_account":
+            username = entry.delete_account.username
+            # Unread messages this user sent to others disappear with the account too.
+            self.cursor.execute(
+                "SELECT recipient, COUNT(*) FROM messages WHERE sender = ? AND recipient != ? AND delivered = 0 GROUP BY recipient",
+                (username, username)
+            )
+            for recipient, count in self.cursor.fetchall():
+                self.adjust_unread(recipient, -count)
             self.cursor.execute("DELETE FROM messages WHERE sender = ? OR recipient = ?", (username, username))
             self.cursor.execute("DELETE FROM users WHERE username = ?", (username,))
-        self.conn.commit()
+            with self.unread_lock:
+                self.unread_counts.pop(username, None)
+        elif op == "end_sessions":
+            self.cursor.execute("UPDATE users SET session_key = ? WHERE username = ?",
+                                (entry.end_sessions.session_key, entry.end_sessions.username))
+        self.last_applied = entry.index
 
     # ChatService Methods
+    def not_leader(self, method, request, context, refusal):
+        """
+        Answers a leader-only RPC that reached a follower. With forward_writes it is proxied to
+        the leader and the leader's response returned as is. Otherwise, or if the leader can't
+        be reached, returns refusal with a "Not leader" message and the leader hint, so the
+        client can switch straight to the leader without asking around.
+        """
+        leader = self.leader_address
+        forwarded = any(key == FORWARDED_BY_KEY for key, _ in (context.invocation_metadata() or ()))
+        if self.forward_writes and leader and leader != self.address and not forwarded:
+            try:
+                return self.peer_pool.call(leader, method, request, timeout=self.forward_timeout, service="chat",
+                                           metadata=((FORWARDED_BY_KEY, self.address),))
+            except Exception as e:
+                print(f"Could not forward {method} to leader {leader}: {e}")
+        self.leader_hint(context)
+        if "message" in refusal.DESCRIPTOR.fields_by_name:
+            refusal.message = f"Not leader, current leader is {leader}"
+        return refusal
+
+    def leader_hint(self, context):
+        context.set_trailing_metadata(((LEADER_HINT_KEY, self.leader_address or ""),))
+
     def CreateAccount(self, request, context):
         if not self.is_leader:
-            return chat_pb2.CreateAccountResponse(success=False, message=f"Not leader, current leader is {self.leader_address}")
-        operation = f"CreateAccount:{request.username}:{bcrypt.hashpw(request.password.encode(), bcrypt.gensalt()).decode()}"
-        if self.replicate_operation(operation):
-            self.apply_operation(operation)
+            return self.not_leader("CreateAccount", request, context, chat_pb2.CreateAccountResponse(success=False))
+        try:
+            password_hash = self.password_pool.hash(request.password).result()
+        except PasswordPoolBusy:
+            return chat_pb2.CreateAccountResponse(success=False, message="Server busy, please try again")
+        entry = self.append_to_log(chat_pb2.LogEntry(create_account=chat_pb2.CreateAccountOp(
+            username=request.username, password_hash=password_hash, session_key=os.urandom(16).hex())))
+        if self.replicate_operation(entry):
+            self.apply_operation(entry)
             return chat_pb2.CreateAccountResponse(success=True, message="Registration successful")
         return chat_pb2.CreateAccountResponse(success=False, message="Failed to replicate")
 
     def Login(self, request, context):
         if not self.is_leader:
-            return chat_pb2.LoginResponse(success=False, message=f"Not leader, current leader is {self.leader_address}", unread_messages=0)
+            return self.not_leader("Login", request, context, chat_pb2.LoginResponse(success=False, unread_messages=0))
         username = request.username
         password = request.password
         if not username or not password:
@@ -206,39 +1323,66 @@ class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationSer
         
         self.cursor.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
         result = self.cursor.fetchone()
-        if result and bcrypt.checkpw(password.encode("utf-8"), result[0]):
+        try:
+            password_ok = result is not None and self.password_pool.check(password, result[0]).result()
+        except PasswordPoolBusy:
+            return chat_pb2.LoginResponse(success=False, message="Server busy, please try again", unread_messages=0)
+        if password_ok:
             # Do not mark as online here; instant delivery only works if the client subscribes.
-            self.cursor.execute("SELECT COUNT(*) FROM messages WHERE recipient = ? AND delivered = 0", (username,))
-            unread_count = self.cursor.fetchone()[0]
-            return chat_pb2.LoginResponse(success=True, message="Login successful", unread_messages=unread_count)
+            unread_count = self.unread_counts.get(username, 0)
+            token, expires_at = self.issue_session_token(username)
+            return chat_pb2.LoginResponse(success=True, message="Login successful", unread_messages=unread_count,
+                                          session_token=token, token_expires_at=expires_at)
         else:
             return chat_pb2.LoginResponse(success=False, message="Invalid username or password", unread_messages=0)
 
+    def ResumeSession(self, request, context):
+        """Cheap re-login after a reconnect: checks the token's HMAC instead of running bcrypt."""
+        if not self.is_leader:
+            return self.not_leader("ResumeSession", request, context, chat_pb2.LoginResponse(success=False, unread_messages=0))
+        username = self.verify_session_token(request.session_token)
+        if username is None:
+            return chat_pb2.LoginResponse(success=False, message="Invalid or expired session", unread_messages=0)
+        token, expires_at = self.issue_session_token(username)
+        return chat_pb2.LoginResponse(success=True, message="Session resumed", unread_messages=self.unread_counts.get(username, 0),
+                                      session_token=token, token_expires_at=expires_at)
+
     def Logout(self, request, context):
         if not self.is_leader:
-            return chat_pb2.LogoutResponse(success=False, message="Request must be sent to the leader")
+            return self.not_leader("Logout", request, context, chat_pb2.LogoutResponse(success=False))
         username = request.username
-        # Remove subscription if it exists.
-        if username in self.active_subscriptions:
-            del self.active_subscriptions[username]
+        # A new session key revokes every session token issued to the user so far.
+        if self.session_key(username) is not None:
+            entry = self.append_to_log(chat_pb2.LogEntry(end_sessions=chat_pb2.EndSessionsOp(username=username, session_key=os.urandom(16).hex())))
+            if not self.replicate_operation(entry):
+                return chat_pb2.LogoutResponse(success=False, message="Failed to replicate")
+            self.apply_operation(entry)
+        # Ends all of the user's open streams.
+        if self.active_subscriptions.close_user(username):
             return chat_pb2.LogoutResponse(success=True, message="Logged out successfully")
         else:
             return chat_pb2.LogoutResponse(success=False, message="User not subscribed to instant messages")
 
     def SendMessage(self, request, context):
         if not self.is_leader:
-            return chat_pb2.SendMessageResponse(success=False, message=f"Not leader, current leader is {self.leader_address}")
-        self.cursor.execute("INSERT OR REPLACE INTO sequence (name, value) VALUES ('message_id', COALESCE((SELECT value FROM sequence WHERE name = 'message_id'), 0) + 1)")
-        self.cursor.execute("SELECT value FROM sequence WHERE name = 'message_id'")
-        message_id = self.cursor.fetchone()[0]
+            return self.not_leader("SendMessage", request, context, chat_pb2.SendMessageResponse(success=False))
         current_time = int(time.time())  # Get current Unix timestamp
-        operation = f"SendMessage:{message_id}:{request.sender}:{request.to}:{request.message}:{current_time}"
-        if self.replicate_operation(operation):
-            self.apply_operation(operation)
-            if request.to in self.active_subscriptions:
-                chat_msg = chat_pb2.ChatMessage(id=message_id, sender=request.sender, to=request.to, message=request.message, timestamp=current_time)
-                self.active_subscriptions[request.to].put(chat_msg)
-                print(f"Server {self.id}: Pushed message {message_id} to {request.to}’s queue")
+        # The id is allocated and logged under one hold of log_lock (append_to_log commits
+        # both), so every allocated id is either applied or in the unapplied log tail;
+        # flush_delivered relies on this.
+        with self.log_lock:
+            self.cursor.execute("INSERT OR REPLACE INTO sequence (name, value) VALUES ('message_id', COALESCE((SELECT value FROM sequence WHERE name = 'message_id'), 0) + 1)")
+            self.cursor.execute("SELECT value FROM sequence WHERE name = 'message_id'")
+            message_id = self.cursor.fetchone()[0]
+            entry = self.append_to_log(chat_pb2.LogEntry(send_message=chat_pb2.SendMessageOp(
+                id=message_id, sender=request.sender, recipient=request.to, message=request.message, timestamp=current_time
+            )))
+        if self.replicate_operation(entry):
+            self.apply_operation(entry)
+            chat_msg = chat_pb2.ChatMessage(id=message_id, sender=request.sender, to=request.to, message=request.message, timestamp=current_time)
+            pushed = self.active_subscriptions.publish(request.to, chat_msg)
+            if pushed:
+                print(f"Server {self.id}: Pushed message {message_id} to {pushed} stream(s) of {request.to}")
             else:
                 print(f"Server {self.id}: No active subscription for {request.to}")
             return chat_pb2.SendMessageResponse(success=True, message="Message sent")
@@ -246,7 +1390,7 @@ class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationSer
 
     def ReadMessages(self, request, context):
         if not self.is_leader:
-            return chat_pb2.ReadMessagesResponse(messages=[])
+            return self.not_leader("ReadMessages", request, context, chat_pb2.ReadMessagesResponse(messages=[]))
         """
         Retrieves unread (undelivered) messages for a given user, up to a specified limit.
         Once retrieved, the messages are marked as delivered.
@@ -265,9 +1409,7 @@ class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationSer
         messages = self.cursor.fetchall()
         message_ids = [msg[0] for msg in messages]
         if message_ids:
-            placeholders = ",".join("?" for _ in message_ids)
-            self.cursor.execute(f"UPDATE messages SET delivered = 1 WHERE id IN ({placeholders})", message_ids)
-            self.conn.commit()
+            self.mark_delivered(username, message_ids)
 
         message_list = []
         for msg in messages:
@@ -281,44 +1423,183 @@ class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationSer
             message_list.append(chat_msg)
         return chat_pb2.ReadMessagesResponse(messages=message_list)
 
+    def AckMessages(self, request, context):
+        """
+        Marks pushed messages delivered once the client confirms it received them (clients
+        ack in batches). Until then they stay unread and ReadMessages still returns them.
+        """
+        if not self.is_leader:
+            return self.not_leader("AckMessages", request, context, chat_pb2.AckMessagesResponse(success=False))
+        message_ids = list(request.message_ids)
+        acked = self.mark_delivered(request.username, message_ids) if request.username and message_ids else 0
+        return chat_pb2.AckMessagesResponse(success=True, acked=acked)
+
+    def mark_delivered(self, username, message_ids):
+        """Marks username's messages delivered; returns how many of them were still unread."""
+        placeholders = ",".join("?" for _ in message_ids)
+        # Only count rows this call flipped, in case a concurrent read or ack already delivered some.
+        self.cursor.execute(
+            f"UPDATE messages SET delivered = 1 WHERE id IN ({placeholders}) AND recipient = ? AND delivered = 0",
+            message_ids + [username]
+        )
+        delivered = self.cursor.rowcount
+        self.conn.commit()
+        self.adjust_unread(username, -delivered)
+        if delivered:
+            # Replicated in the next MarkDelivered batch rather than a round trip per read.
+            with self.delivered_lock:
+                self.delivered_pending.setdefault(username, set()).update(message_ids)
+        return delivered
+
+    def delivery_flush_loop(self):
+        while True:
+            time.sleep(self.delivery_flush_interval)
+            if self.is_leader:
+                try:
+                    self.flush_delivered()
+                except Exception as e:
+                    print(f"Server {self.id}: failed to replicate delivered marks: {e}")
+
+    def flush_delivered(self):
+        """
+        Leader side: logs and replicates the messages marked delivered since the last flush
+        as one MarkDelivered entry of id ranges. Marks not yet flushed when the leader fails
+        are lost, so those messages may be delivered again (at-least-once).
+        """
+        with self.delivered_lock:
+            pending, self.delivered_pending = self.delivered_pending, {}
+        if not pending or not self.is_leader:
+            return False
+        with self.log_lock:
+            # Sends still waiting for a quorum aren't in the messages table yet; their ids
+            # must not be covered by a range either.
+            unapplied = self.read_log(self.last_applied + 1, self.last_log_index - self.last_applied)
+            ranges = []
+            for username, message_ids in pending.items():
+                in_flight = [e.send_message.id for e in unapplied if e.WhichOneof("op") == "send_message" and e.send_message.recipient == username]
+                ranges.extend(
+                    chat_pb2.DeliveredRange(recipient=username, first_id=first, last_id=last)
+                    for first, last in self.delivered_ranges(username, message_ids, in_flight)
+                )
+            entry = self.append_to_log(chat_pb2.LogEntry(mark_delivered=chat_pb2.MarkDeliveredOp(ranges=ranges)))
+        if self.replicate_operation(entry):
+            self.apply_operation(entry)
+            return True
+        return False
+
+    def delivered_ranges(self, username, message_ids, in_flight=()):
+        """
+        Collapses delivered ids into (first, last) ranges. Neighbouring ids are merged unless
+        one of username's unread messages (or an in_flight id) lies between them.
+        """
+        ids = sorted(message_ids)
+        self.cursor.execute(
+            "SELECT id FROM messages WHERE recipient = ? AND delivered = 0 AND id BETWEEN ? AND ?",
+            (username, ids[0], ids[-1])
+        )
+        holes = sorted([row[0] for row in self.cursor.fetchall()] + list(in_flight))
+        ranges = []
+        first = last = ids[0]
+        for message_id in ids[1:]:
+            if bisect.bisect_right(holes, last) == bisect.bisect_left(holes, message_id):
+                last = message_id
+            else:
+                ranges.append((first, last))
+                first = last = message_id
+        ranges.append((first, last))
+        return ranges
+
     def SubscribeMessages(self, request, context):
         if not self.is_leader:
+            # Streams are not proxied: the client resubscribes on the leader named in the hint.
+            self.leader_hint(context)
             context.set_code(grpc.StatusCode.UNAVAILABLE)
             context.set_details(f"Not leader, current leader is {self.leader_address}")
             return
         """
         Server-streaming RPC that registers an instant-delivery subscription for the user.
         Only messages sent while the user is subscribed will be pushed instantly.
+        The stream blocks on its queue until a message or a None (end of stream) arrives;
+        there is no periodic wakeup.
         """
         username = request.username
         print(f"User {username} subscribed for instant messages.")
-        # Create a subscription queue for this user.
-        sub_queue = queue.Queue()
-        self.active_subscriptions[username] = sub_queue
+        # Another device of the same user gets its own stream alongside this one.
+        subscription = Subscription(username)
+        self.active_subscriptions.add(subscription)
 
         try:
-            while context.is_active():
-                try:
-                    chat_msg = sub_queue.get(timeout=1)
-                    yield chat_msg
-                except queue.Empty:
-                    continue
+            # Wake the stream up when the client goes away instead of polling context.is_active().
+            if not context.add_callback(subscription.close):
+                return
+            while True:
+                chat_msg = subscription.get()
+                if chat_msg is None:  # Client gone, logged out, account deleted or evicted
+                    if subscription.evicted:
+                        context.set_trailing_metadata(((EVICTED_KEY, "1"),))
+                        context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, SUBSCRIPTION_OVERFLOW)
+                    return
+                yield chat_msg
         finally:
-            if username in self.active_subscriptions:
-                del self.active_subscriptions[username]
+            self.active_subscriptions.remove(subscription)
+
+    # Follower reads
+    def read_staleness_ms(self):
+        """
+        Upper bound on how far this replica's data lags the leader, in ms: 0 on a leader
+        holding its lease. A follower that has applied everything the leader had applied at
+        its last heartbeat is at most that heartbeat's age behind; otherwise (or with no
+        heartbeat yet, or on a leader without a lease) None.
+        """
+        if self.is_leader:
+            return 0 if self.has_lease() else None
+        if not self.leader_applied_at or self.last_applied < self.leader_applied_index:
+            return None
+        return int(1000 * (time.time() - self.leader_applied_at))
+
+    def can_serve_read(self, max_staleness_ms, context):
+        """
+        Whether to answer a read here: on the leader only while it holds its lease (another
+        leader may have been elected otherwise); on a follower only if the client accepts
+        stale reads (max_staleness_ms > 0) and we are within that bound. A refusal other than
+        the plain follower one sets UNAVAILABLE so the client retries elsewhere; a follower's
+        refusals carry the leader hint.
+        """
+        if self.is_leader:
+            if self.has_lease():
+                return True
+            context.set_code(grpc.StatusCode.UNAVAILABLE)
+            context.set_details("Leader lease expired; leadership may have moved, retry shortly")
+            return False
+        if max_staleness_ms <= 0:
+            self.leader_hint(context)
+            return False
+        staleness = self.read_staleness_ms()
+        if staleness is not None and staleness <= max_staleness_ms:
+            return True
+        self.leader_hint(context)
+        context.set_code(grpc.StatusCode.UNAVAILABLE)
+        context.set_details(f"Replica staleness {staleness if staleness is not None else 'unknown'}ms exceeds {max_staleness_ms}ms; "
+                            f"current leader is {self.leader_address}")
+        return False
+
+    def read_position(self):
+        """applied_index / staleness_ms fields reported with every read."""
+        staleness = self.read_staleness_ms()
+        return {"applied_index": self.last_applied, "staleness_ms": staleness if staleness is not None else -1}
 
     def ListAccounts(self, request, context):
-        if not self.is_leader:
-            return chat_pb2.ListAccountsResponse(accounts=[])
+        if not self.can_serve_read(request.max_staleness_ms, context):
+            return chat_pb2.ListAccountsResponse(accounts=[], **self.read_position())
         pattern = request.pattern if request.pattern else "%"
         pattern = f"%{pattern}%"
         self.cursor.execute("SELECT username FROM users WHERE username LIKE ?", (pattern,))
         accounts = [row[0] for row in self.cursor.fetchall()]
-        return chat_pb2.ListAccountsResponse(accounts=accounts)
+        return chat_pb2.ListAccountsResponse(accounts=accounts, **self.read_position())
 
     def ListMessages(self, request, context):
-        if not self.is_leader:
-            return chat_pb2.ListMessagesResponse(messages=[])
+        if not self.can_serve_read(request.max_staleness_ms, context):
+            return chat_pb2.ListMessagesResponse(messages=[], **self.read_position())
         username = request.username
         if not username:
             return chat_pb2.ListMessagesResponse(messages=[])
@@ -338,34 +1619,33 @@ class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationSer
                 timestamp=msg[3]
             )
             message_list.append(chat_msg)
-        return chat_pb2.ListMessagesResponse(messages=message_list)
+        return chat_pb2.ListMessagesResponse(messages=message_list, **self.read_position())
 
     def DeleteMessages(self, request, context):
         if not self.is_leader:
-            return chat_pb2.DeleteMessagesResponse(success=False, message=f"Not leader, current leader is {self.leader_address}")
-        operation = f"DeleteMessages:{request.username}:{','.join(map(str, request.message_ids))}"
-        if self.replicate_operation(operation):
-            self.apply_operation(operation)
+            return self.not_leader("DeleteMessages", request, context, chat_pb2.DeleteMessagesResponse(success=False))
+        entry = self.append_to_log(chat_pb2.LogEntry(delete_messages=chat_pb2.DeleteMessagesOp(username=request.username, message_ids=request.message_ids)))
+        if self.replicate_operation(entry):
+            self.apply_operation(entry)
             return chat_pb2.DeleteMessagesResponse(success=True, message="Messages deleted")
         return chat_pb2.DeleteMessagesResponse(success=False, message="Failed to replicate")
     
     def DeleteAccount(self, request, context):
         if not self.is_leader:
-            return chat_pb2.DeleteAccountResponse(success=False, message=f"Not leader, current leader is {self.leader_address}")
-        operation = f"DeleteAccount:{request.username}"
-        if self.replicate_operation(operation):
-            self.apply_operation(operation)
-            if request.username in self.active_subscriptions:
-                del self.active_subscriptions[request.username]
+            return self.not_leader("DeleteAccount", request, context, chat_pb2.DeleteAccountResponse(success=False))
+        entry = self.append_to_log(chat_pb2.LogEntry(delete_account=chat_pb2.DeleteAccountOp(username=request.username)))
+        if self.replicate_operation(entry):
+            self.apply_operation(entry)
+            self.active_subscriptions.close_user(request.username)
             return chat_pb2.DeleteAccountResponse(success=True, message="Account deleted")
         return chat_pb2.DeleteAccountResponse(success=False, message="Failed to replicate")
     
     def GetLeader(self, request, context):
-        return chat_pb2.GetLeaderResponse(leader_address=self.leader_address or self.address)
+        return chat_pb2.GetLeaderResponse(leader_address=self.leader_address or self.address, **self.read_position())
 
     def GetState(self, request, context):
-        self.cursor.execute("SELECT username, password_hash FROM users")
-        users = [chat_pb2.User(username=row[0], password_hash=row[1]) for row in self.cursor.fetchall()]
+        self.cursor.execute("SELECT username, password_hash, session_key FROM users")
+        users = [chat_pb2.User(username=row[0], password_hash=row[1], session_key=row[2]) for row in self.cursor.fetchall()]
         self.cursor.execute("SELECT id, sender, recipient, message, timestamp, delivered FROM messages")
         messages = [chat_pb2.Message(id=row[0], sender=row[1], recipient=row[2], message=row[3], timestamp=row[4], delivered=row[5]) for row in self.cursor.fetchall()]
         return chat_pb2.GetStateResponse(users=users, messages=messages)
@@ -373,36 +1653,458 @@ class ChatServer(chat_pb2_grpc.ChatServiceServicer, chat_pb2_grpc.ReplicationSer
 
     # ReplicationService Methods
     def Heartbeat(self, request, context):
-        self.alive_peers[request.sender_address] = time.time()
-        return chat_pb2.HeartbeatResponse(success=True)
+        # success is a lease grant: only for the leader of our current term, and not while
+        # promised to another. A heartbeat from an older term is refused; our term tells the
+        # sender to step down.
+        granted = False
+        if request.sender_address and request.term >= self.current_term:
+            self.observe_term(request.term)
+            granted = self.on_leader_contact(request.sender_address, request.applied_index)
+        return chat_pb2.HeartbeatResponse(success=granted, last_log_index=self.last_log_index,
+                                          snapshot_index=self.snapshot_index, term=self.current_term)
 
     def RequestElection(self, request, context):
-        self.alive_peers[request.sender_address] = time.time()
-        return chat_pb2.ElectionResponse(ok=self.id > int(request.sender_address.split(':')[-1]) - 50050)
+        """
+        Votes for the candidate if its term is current, we haven't voted for anyone else in
+        it, and its log is at least as up to date as ours, so a winner holds every entry a
+        majority acked. While we have promised a lease to a leader we don't vote at all:
+        that leader may still be serving reads, and a rejoining server can't depose it.
+        """
+        with self.lease_lock:
+            promised = self.lease_holder not in (None, request.sender_address) and time.time() < self.lease_granted_until
+        if promised:
+            return chat_pb2.ElectionResponse(ok=False, term=self.current_term)
+        self.observe_term(request.term)
+        candidate = self.server_ids.get(request.sender_address, -1)
+        with self.log_lock:
+            up_to_date = (request.last_log_term, request.last_log_index) >= (self.entry_term(self.last_log_index), self.last_log_index)
+            granted = request.term == self.current_term and self.voted_for in (0, candidate) and up_to_date
+            if granted:
+                self.voted_for = candidate
+                self.set_sequence_value("voted_for", candidate)
+                self.conn.commit()
+        if granted:
+            self.reset_election_timer()
+        return chat_pb2.ElectionResponse(ok=granted, term=self.current_term)
 
     def SetLeader(self, request, context):
-        self.leader_address = request.leader_address
-        self.is_leader = (self.address == self.leader_address)
+        if request.term < self.current_term:
+            return chat_pb2.SetLeaderResponse(success=False)  # Announcement from an old term
+        self.observe_term(request.term)
+        self.follow(request.leader_address)
         return chat_pb2.SetLeaderResponse(success=True)
 
     def ReplicateOperation(self, request, context):
-        self.apply_operation(request.operation)
-        return chat_pb2.ReplicateResponse(success=True)
+        ok, _ = self.append_entries([request.entry])  # Applied once a heartbeat says it is committed
+        return chat_pb2.ReplicateResponse(success=ok)
+
+    def ReplicateBatch(self, request, context):
+        # The whole batch lands in one transaction, so N entries cost a single commit.
+        ok, last_index = self.append_entries(request.entries, commit_index=request.applied_index)
+        return chat_pb2.ReplicateBatchResponse(success=ok, last_index=last_index)
+
+    def ReplicationStream(self, request_iterator, context):
+        for request in request_iterator:
+            yield self.replicate_streamed_batch(request)
+
+    def replicate_streamed_batch(self, request):
+        """One ReplicationStream batch; it also counts as a heartbeat from the leader."""
+        if request.term < self.current_term:
+            # From a deposed leader: refuse, and our term makes it step down.
+            return chat_pb2.ReplicateBatchResponse(success=False, last_index=self.last_log_index, term=self.current_term)
+        self.observe_term(request.term)
+        granted = request.leader_address and self.on_leader_contact(request.leader_address, request.applied_index)
+        ok, last_index = self.append_entries(request.entries, request.prev_log_term, request.applied_index)
+        return chat_pb2.ReplicateBatchResponse(success=ok, last_index=last_index, term=self.current_term,
+                                               lease_from=request.sent_at if granted else 0)
+
+    def GetStateSince(self, request, context):
+        """Streams every log entry after request.log_index, in chunks bounded by count and size."""
+        max_entries = request.max_chunk_entries if request.max_chunk_entries > 0 else 256
+        next_index = request.log_index + 1
+        while next_index <= self.last_log_index:
+            entries = self.read_log(next_index, max_entries)
+            if not entries:
+                break
+            chunk, chunk_bytes = [], 0
+            for entry in entries:
+                if chunk and chunk_bytes + entry.ByteSize() > MAX_CHUNK_BYTES:
+                    break
+                chunk.append(entry)
+                chunk_bytes += entry.ByteSize()
+            next_index = chunk[-1].index + 1
+            yield chat_pb2.LogChunk(entries=chunk, last_log_index=self.last_log_index)
+
+    def StreamSnapshot(self, request, context):
+        """
+        Pages through users and messages by primary key (keyset pagination) on a separate
+        read connection, so the whole stream comes from one consistent read transaction
+        (in WAL mode this does not block writers).
+        """
+        chunk_size = request.chunk_size if request.chunk_size > 0 else 1000
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT value FROM sequence WHERE name = 'last_applied'")
+            row = cursor.fetchone()
+            last_included = row[0] if row else 0
+            cursor.execute("SELECT term FROM replication_log WHERE log_index = ?", (last_included,))
+            row = cursor.fetchone()
+            if not row:  # Covered by our own snapshot
+                cursor.execute("SELECT value FROM sequence WHERE name = 'snapshot_term'")
+                row = cursor.fetchone()
+            position = dict(last_included_index=last_included, last_included_term=row[0] if row else 0)
+            last_id = 0
+            while True:
+                cursor.execute("SELECT id, username, password_hash, session_key FROM users WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                users = [chat_pb2.User(username=r[1], password_hash=r[2], session_key=r[3]) for r in rows]
+                yield chat_pb2.SnapshotChunk(users=users, **position)
+            last_id = 0
+            while True:
+                cursor.execute(
+                    "SELECT id, sender, recipient, message, timestamp, delivered FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                messages = [chat_pb2.Message(id=r[0], sender=r[1], recipient=r[2], message=r[3], timestamp=r[4], delivered=r[5]) for r in rows]
+                yield chat_pb2.SnapshotChunk(messages=messages, **position)
+            # Always send one chunk so the receiver learns last_included_index.
+            yield chat_pb2.SnapshotChunk(**position)
+        finally:
+            conn.close()
+
+    def start_replication_streams(self):
+        with self.log_lock:
+            if self.streams_started:
+                return
+            self.streams_started = True
+        for stream in self.follower_streams.values():
+            stream.start()
+
+    def append_to_log(self, entry):
+        """Leader side: stamps the entry with the current term and next index and persists it."""
+        with self.log_lock:
+            entry.term = self.current_term
+            entry.index = self.last_log_index + 1
+            self.write_log_entry(entry)
+            self.conn.commit()
+        return entry
+
+    def replicate_operation(self, entry):
+        """
+        Streams a logged entry to the followers and blocks until a majority of the
+        cluster has acknowledged its index (or the timeout expires).
+        """
+        self.start_replication_streams()
+        for stream in self.follower_streams.values():
+            stream.notify()
+        with self.replication_acked:
+            # Stop waiting if we are deposed meanwhile: the new leader may overwrite the entry.
+            acked = self.replication_acked.wait_for(
+                lambda: not self.is_leader or sum(1 for s in self.follower_streams.values() if s.acked_index >= entry.index) >= self.quorum,
+                timeout=self.replication_timeout,
+            )
+            return acked and self.is_leader
 
-    def replicate_operation(self, operation):
-        acks = 0
-        for peer in self.peers:
+class AioPeerPool(PeerPool):
+    """PeerPool over grpc.aio channels: call() is a coroutine, backoff bookkeeping is shared."""
+    def new_channel(self, peer):
+        return grpc.aio.insecure_channel(peer, options=self.CHANNEL_OPTIONS)
+
+    async def call(self, peer, method, request, timeout=1, service="replication"):
+        stub = self.stub(peer, service)
+        try:
+            response = await getattr(stub, method)(request, timeout=timeout)
+        except Exception:
+            self.mark_failure(peer)
+            raise
+        self.mark_success(peer)
+        return response
+
+    async def close(self):
+        with self.lock:
+            channels = list(self.channels.values())
+            self.channels.clear()
+            self.stubs.clear()
+        for channel in channels:
             try:
-                with grpc.insecure_channel(peer) as channel:
-                    stub = chat_pb2_grpc.ReplicationServiceStub(channel)
-                    response = stub.ReplicateOperation(chat_pb2.ReplicateRequest(operation=operation), timeout=1)
-                    if response.success:
-                        acks += 1
-                        if acks >= 2:
-                            return True
-            except:
+                await channel.close()
+            except Exception:
                 pass
-        return False
+
+class AioSubscription(Subscription):
+    """
+    Subscription for the aio server. ChatServer's handlers call put() from executor
+    threads; the item is handed to the event loop, where the stream awaits get().
+    depth() also counts items still on their way to the loop.
+    """
+    def __init__(self, username, loop):
+        super().__init__(username)
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def put(self, item):
+        with self.lock:
+            self.pending += 1
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    async def get(self):
+        item = await self.queue.get()
+        with self.lock:
+            self.pending -= 1
+        return None if self.evicted else item
+
+    def depth(self):
+        return self.pending
+
+class AioConcurrencyLimitInterceptor(grpc.aio.ServerInterceptor):
+    """
+    ConcurrencyLimitInterceptor for grpc.aio. Open calls here hold no thread, so limits are
+    only a guard on how many of a method may be open at once. All calls run on the event
+    loop, so a plain counter is enough.
+    """
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self.active = {method: 0 for method in self.limits}
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        method = method_name(handler_call_details)
+        if handler is None or method not in self.limits:
+            return handler
+        if handler.response_streaming:
+            field = "stream_stream" if handler.request_streaming else "unary_stream"
+            wrapper = self.limit_stream(getattr(handler, field), method)
+        else:
+            field = "stream_unary" if handler.request_streaming else "unary_unary"
+            wrapper = self.limit_unary(getattr(handler, field), method)
+        return handler._replace(**{field: wrapper})
+
+    async def acquire(self, method, context):
+        if self.active[method] >= self.limits[method]:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Too many concurrent {method} calls ({self.limits[method]})")
+        self.active[method] += 1
+
+    def limit_unary(self, behavior, method):
+        async def call(request, context):
+            await self.acquire(method, context)
+            try:
+                return await behavior(request, context)
+            finally:
+                self.active[method] -= 1
+        return call
+
+    def limit_stream(self, behavior, method):
+        async def call(request, context):
+            await self.acquire(method, context)
+            try:
+                async for response in behavior(request, context):
+                    yield response
+            finally:
+                self.active[method] -= 1
+        return call
+
+class ExecutorContext:
+    """
+    Stands in for a grpc.aio context while a synchronous handler runs on the executor, since
+    the aio context may only be used from the event loop. It records the trailing metadata,
+    status and abort the handler asks for; apply() replays them on the loop afterwards.
+    """
+    class Aborted(Exception):
+        pass
+
+    def __init__(self, context):
+        self.metadata = tuple(context.invocation_metadata() or ())
+        self.trailing_metadata = None
+        self.code = None
+        self.details = None
+        self.aborted = False
+
+    def invocation_metadata(self):
+        return self.metadata
+
+    def set_trailing_metadata(self, metadata):
+        self.trailing_metadata = tuple(metadata)
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    def abort(self, code, details=""):
+        self.code, self.details, self.aborted = code, details, True
+        raise ExecutorContext.Aborted()
+
+    async def apply(self, context):
+        """Copies what the handler set onto the real context; call on the event loop."""
+        if self.trailing_metadata is not None:
+            context.set_trailing_metadata(self.trailing_metadata)
+        if self.aborted:
+            await context.abort(self.code, self.details)
+        if self.code is not None:
+            context.set_code(self.code)
+        if self.details is not None:
+            context.set_details(self.details)
+
+class AioChatServer:
+    """
+    Serves a ChatServer (ChatService + ReplicationService) on grpc.aio. Unary handlers run
+    the existing synchronous code on a thread executor, so its size bounds only the work in
+    progress, not the number of open RPCs; they get an ExecutorContext, not the aio context. Subscriptions and the streaming RPCs are native
+    coroutines (an idle subscriber holds no thread), and heartbeats and elections use async
+    peer stubs, contacting all peers concurrently. Follower replication keeps its dedicated
+    per-peer stream threads.
+    """
+    UNARY_METHODS = {
+        "CreateAccount", "Login", "ResumeSession", "Logout", "ListAccounts", "SendMessage", "ReadMessages", "AckMessages",
+        "ListMessages", "DeleteMessages", "DeleteAccount", "GetLeader", "GetState",
+        "Heartbeat", "RequestElection", "SetLeader", "ReplicateOperation", "ReplicateBatch",
+    }
+
+    def __init__(self, server, executor_workers=64):
+        self.server = server
+        self.executor = futures.ThreadPoolExecutor(max_workers=executor_workers)
+        self.peer_pool = AioPeerPool(server.peers)
+
+    def __getattr__(self, name):
+        if name not in self.UNARY_METHODS:
+            raise AttributeError(name)
+        handler = getattr(self.server, name)
+
+        async def call(request, context):
+            shim = ExecutorContext(context)
+            try:
+                response = await self.run(handler, request, shim)
+            except ExecutorContext.Aborted:
+                response = None
+            await shim.apply(context)
+            return response
+        return call
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def stream(self, generator):
+        """Drives a synchronous streaming handler on the executor, one item at a time."""
+        done = object()
+        while True:
+            item = await self.run(next, generator, done)
+            if item is done:
+                return
+            yield item
+
+    # Streaming RPCs
+    async def SubscribeMessages(self, request, context):
+        if not self.server.is_leader:
+            self.server.leader_hint(context)
+            context.set_code(grpc.StatusCode.UNAVAILABLE)
+            context.set_details(f"Not leader, current leader is {self.server.leader_address}")
+            return
+        username = request.username
+        print(f"User {username} subscribed for instant messages.")
+        subscription = AioSubscription(username, asyncio.get_running_loop())
+        self.server.active_subscriptions.add(subscription)
+        try:
+            while True:
+                chat_msg = await subscription.get()
+                if chat_msg is None:  # Logged out, account deleted or evicted
+                    if subscription.evicted:
+                        await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, SUBSCRIPTION_OVERFLOW, trailing_metadata=((EVICTED_KEY, "1"),))
+                    return
+                yield chat_msg
+        finally:
+            # A client disconnect cancels this coroutine.
+            self.server.active_subscriptions.remove(subscription)
+
+    async def ReplicationStream(self, request_iterator, context):
+        async for request in request_iterator:
+            yield await self.run(self.server.replicate_streamed_batch, request)
+
+    async def GetStateSince(self, request, context):
+        shim = ExecutorContext(context)
+        try:
+            async for chunk in self.stream(self.server.GetStateSince(request, shim)):
+                yield chunk
+        except ExecutorContext.Aborted:
+            pass
+        await shim.apply(context)
+
+    async def StreamSnapshot(self, request, context):
+        shim = ExecutorContext(context)
+        try:
+            async for chunk in self.stream(self.server.StreamSnapshot(request, shim)):
+                yield chunk
+        except ExecutorContext.Aborted:
+            pass
+        await shim.apply(context)
+
+    # Heartbeats and elections
+    async def heartbeat_loop(self):
+        server = self.server
+        server.hold_off_elections()
+        while True:
+            if server.is_leader:
+                started = time.time()
+                peers = server.heartbeat_peers(started)
+                request = server.heartbeat_request()
+                responses = await asyncio.gather(*(self.peer_pool.call(peer, "Heartbeat", request, timeout=server.heartbeat_interval)
+                                                   for peer in peers), return_exceptions=True)
+                await self.run(server.on_heartbeat_responses, started, peers, responses)
+                await asyncio.sleep(server.heartbeat_interval)
+            elif server.election_due():
+                await self.initiate_election()
+            else:
+                await asyncio.sleep(server.heartbeat_interval / 2)
+
+    async def initiate_election(self):
+        server = self.server
+        request = await self.run(server.new_election)
+        responses = await asyncio.gather(*(self.peer_pool.call(peer, "RequestElection", request, timeout=server.heartbeat_interval)
+                                           for peer in server.peers), return_exceptions=True)
+        if await self.run(server.won_election, request, responses):
+            await self.become_leader()
+
+    async def become_leader(self):
+        await self.run(self.server.take_leadership)
+        request = chat_pb2.SetLeaderRequest(leader_address=self.server.address, term=self.server.current_term)
+        await asyncio.gather(*(self.peer_pool.call(peer, "SetLeader", request) for peer in self.server.peers),
+                             return_exceptions=True)
+
+    async def serve(self):
+        server = grpc.aio.server(
+            interceptors=[AioConcurrencyLimitInterceptor(self.server.method_limits)],
+            options=server_options(self.server.keepalive_time_ms, self.server.keepalive_timeout_ms),
+            maximum_concurrent_rpcs=self.server.max_concurrent_rpcs,
+        )
+        chat_pb2_grpc.add_ChatServiceServicer_to_server(self, server)
+        chat_pb2_grpc.add_ReplicationServiceServicer_to_server(self, server)
+        server.add_insecure_port(self.server.address)
+        print(f"Server {self.server.id} starting on {self.server.address} (grpc.aio)...")
+        await server.start()
+        # Bootstrap (snapshot if empty or far behind) and catch up before taking part in elections.
+        await self.run(self.server.synchronize_database)
+        heartbeat = asyncio.create_task(self.heartbeat_loop())
+        threading.Thread(target=self.server.delivery_flush_loop, daemon=True).start()
+        try:
+            await server.wait_for_termination()
+        finally:
+            print("Server shutting down...")
+            heartbeat.cancel()
+            await server.stop(0)
+            await self.peer_pool.close()
+            self.executor.shutdown(wait=False)
+            self.server.close()
 
 # ----- gRPC Server Starter -----
 def serve(host, port):
@@ -423,6 +2125,40 @@ if __name__ == "__main__":
     parser.add_argument("--id", type=int, required=True, help="Server ID (1-5)")
     parser.add_argument("--address", type=str, required=True, help="My address (host:port)")
     parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--max-batch-size", type=int, default=None, help="Max operations per replication batch (default: 64)")
+    parser.add_argument("--max-linger-ms", type=float, default=None, help="Max time a batch waits for more operations (default: 2ms)")
+    parser.add_argument("--aio", action="store_true", help="Serve with grpc.aio instead of a fixed thread pool")
+    parser.add_argument("--executor-workers", type=int, default=64, help="Threads running handlers in --aio mode (default: 64)")
+    parser.add_argument("--workers", type=int, default=None, help="gRPC worker threads (default: 10)")
+    parser.add_argument("--max-concurrent-rpcs", type=int, default=None, help="Reject RPCs beyond this many in flight (default: unlimited)")
+    parser.add_argument("--method-limit", action="append", metavar="METHOD=N",
+                        help="Max concurrent calls of one method, e.g. SubscribeMessages=8 (repeatable)")
+    parser.add_argument("--keepalive-time-ms", type=int, default=None, help="Server keepalive ping interval (default: 20000)")
+    parser.add_argument("--keepalive-timeout-ms", type=int, default=None, help="Keepalive ping ack timeout (default: 10000)")
+    parser.add_argument("--forward-writes", action="store_true",
+                        help="On a follower, proxy leader-only RPCs to the leader instead of refusing them")
+    parser.add_argument("--subscription-queue-size", type=int, default=None,
+                        help="Messages queued per subscription stream before it is evicted as a slow consumer (default: 256)")
     args = parser.parse_args()
-    server = ChatServer(args.id, args.address, args.config)
-    server.start()
\ No newline at end of file
+    server = ChatServer(args.id, args.address, args.config, args.max_batch_size, args.max_linger_ms)
+    # Serving flags override config.json ("server").
+    if args.workers is not None:
+        server.workers = args.workers
+    if args.max_concurrent_rpcs is not None:
+        server.max_concurrent_rpcs = args.max_concurrent_rpcs
+    server.method_limits.update(parse_method_limits(args.method_limit))
+    if args.keepalive_time_ms is not None:
+        server.keepalive_time_ms = args.keepalive_time_ms
+    if args.keepalive_timeout_ms is not None:
+        server.keepalive_timeout_ms = args.keepalive_timeout_ms
+    if args.subscription_queue_size is not None:
+        server.active_subscriptions.max_queue = args.subscription_queue_size
+    if args.forward_writes:
+        server.forward_writes = True
+    if args.aio:
+        try:
+            asyncio.run(AioChatServer(server, args.executor_workers).serve())
+        except KeyboardInterrupt:
+            pass
+    else:
+        server.start()
\ No newline at end of file
@@ -1,17 +1,33 @@
+import os
+import sys
 import socket
 import selectors
 import sqlite3
 import json
-import bcrypt
 import types
 import struct
 import argparse
+import threading
+
+# Modules shared by the chat servers live in common/ at the repo root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from loop_callbacks import LoopCallbacks
+from password_pool import PasswordPool, PasswordPoolBusy
+from storage_writer import StorageWriter
 
 # Initialize selector for handling multiple clients
 sel = selectors.DefaultSelector()
 
-# Database connection
-conn = sqlite3.connect("chat.db", check_same_thread=False)
+# Work finished on other threads (storage writer, password pool) comes back to the selector
+# thread through call_in_loop.
+loop_callbacks = LoopCallbacks(sel)
+call_in_loop = loop_callbacks.call_in_loop
+
+# Database connection (reads and account writes); message inserts go through storage_writer.
+DB_PATH = "chat.db"
+conn = sqlite3.connect(DB_PATH, timeout=5, check_same_thread=False)
+conn.execute("PRAGMA journal_mode=WAL")
+conn.execute("PRAGMA synchronous=NORMAL")
 cursor = conn.cursor()
 
 # Create users table
@@ -35,11 +51,41 @@ cursor.execute('''
     )
 ''')
 
+# Indexes for the per-recipient unread and list queries (sorted by id) and the sender/recipient delete.
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient_delivered ON messages (recipient, delivered, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages (recipient, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender)")
+
 conn.commit()
 
 # Store online clients
 clients = {}
 
+# Started in __main__.
+storage_writer = None
+password_pool = None
+
+# Per-user count of undelivered messages, so Login doesn't COUNT(*) on every call.
+unread_counts = {}
+unread_lock = threading.Lock()
+
+def rebuild_unread_counts():
+    """Reloads unread_counts from the messages table (at startup)."""
+    cursor.execute("SELECT recipient, COUNT(*) FROM messages WHERE delivered = 0 GROUP BY recipient")
+    with unread_lock:
+        unread_counts.clear()
+        unread_counts.update(cursor.fetchall())
+
+def adjust_unread(username, delta):
+    with unread_lock:
+        count = unread_counts.get(username, 0) + delta
+        if count > 0:
+            unread_counts[username] = count
+        else:
+            unread_counts.pop(username, None)
+
+rebuild_unread_counts()
+
 # ---------------------------- Helper Functions ----------------------------
 def send_response(sock, response):
     """Send a JSON response to the client."""
@@ -59,15 +105,23 @@ def handle_register(client_socket, request):
         send_response(client_socket, {"status": "error", "message": "Username and password required"})
         return
 
-    # Hash password
-    password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-
+    def on_hashed(future):
+        try:
+            cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, future.result()))
+            conn.commit()
+            send_response(client_socket, {"status": "success", "message": "Registration successful"})
+        except sqlite3.IntegrityError:
+            send_response(client_socket, {"status": "error", "message": "Username already exists"})
+        except Exception as e:
+            # The pool job or the insert failed; the client still gets an answer.
+            print(f"Registration of {username} failed: {e}")
+            send_response(client_socket, {"status": "error", "message": "Registration failed, please try again"})
+
+    # Hash password in the password pool; the selector loop keeps serving other clients meanwhile
     try:
-        cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
-        conn.commit()
-        send_response(client_socket, {"status": "success", "message": "Registration successful"})
-    except sqlite3.IntegrityError:
-        send_response(client_socket, {"status": "error", "message": "Username already exists"})
+        password_pool.hash(password).add_done_callback(lambda future: call_in_loop(on_hashed, future))
+    except PasswordPoolBusy:
+        send_response(client_socket, {"status": "error", "message": "Server busy, please try again"})
 
 def handle_login(client_socket, request):
     """Handles user login."""
@@ -80,21 +134,36 @@ def handle_login(client_socket, request):
 
     cursor.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
     result = cursor.fetchone()
+    if not result:
+        send_response(client_socket, {"status": "error", "message": "Invalid username or password"})
+        return
 
-    if result and bcrypt.checkpw(password.encode("utf-8"), result[0]):
-        clients[username] = client_socket  # Store client as online
+    def on_checked(future):
+        try:
+            password_ok = future.result()
+        except Exception as e:
+            print(f"Password check for {username} failed: {e}")
+            send_response(client_socket, {"status": "error", "message": "Login failed, please try again"})
+            return
+        if password_ok:
+            clients[username] = client_socket  # Store client as online
 
-        # Check unread messages
-        cursor.execute("SELECT COUNT(*) FROM messages WHERE recipient = ? AND delivered = 0", (username,))
-        unread_count = cursor.fetchone()[0]
+            # Check unread messages
+            unread_count = unread_counts.get(username, 0)
 
-        send_response(client_socket, {
-            "status": "success",
-            "message": "Login successful",
-            "unread_messages": unread_count
-        })
-    else:
-        send_response(client_socket, {"status": "error", "message": "Invalid username or password"})
+            send_response(client_socket, {
+                "status": "success",
+                "message": "Login successful",
+                "unread_messages": unread_count
+            })
+        else:
+            send_response(client_socket, {"status": "error", "message": "Invalid username or password"})
+
+    # Check the password in the password pool; the selector loop keeps serving other clients meanwhile
+    try:
+        password_pool.check(password, result[0]).add_done_callback(lambda future: call_in_loop(on_checked, future))
+    except PasswordPoolBusy:
+        send_response(client_socket, {"status": "error", "message": "Server busy, please try again"})
 
 def log_message_size(sender, recipient, message):
     """Logs the size of a sent message."""
@@ -115,28 +184,34 @@ def handle_send_message(client_socket, request):
         send_response(client_socket, {"status": "error", "message": "Missing sender, recipient, or message"})
         return
 
-    # Store the message in the database
-    cursor.execute("INSERT INTO messages (sender, recipient, message, delivered) VALUES (?, ?, ?, 0)", 
-                   (sender, recipient, message))
-    conn.commit()
-
-    log_message_size(sender, recipient, message)  # Log the size of the message
-
-    # Check if the recipient is online
-    if recipient in clients:
-        recipient_sock = clients[recipient]
-        
-        # Deliver message immediately
-        send_response(recipient_sock, {"type": "message", "from": sender, "message": message})
-
-        # Mark message as delivered in the database
-        cursor.execute("UPDATE messages SET delivered = 1 WHERE sender = ? AND recipient = ? AND message = ?", 
+    # Stored unread; only once it has actually been pushed is it marked delivered, so a
+    # recipient who goes offline before the commit still gets it from READ.
+    def insert(cursor):
+        cursor.execute("INSERT INTO messages (sender, recipient, message, delivered) VALUES (?, ?, ?, 0)",
                        (sender, recipient, message))
-        conn.commit()
+        return cursor.lastrowid
+
+    def on_committed(future):
+        # Runs on the selector thread once the group commit holding this insert is durable.
+        if future.exception() is not None:
+            send_response(client_socket, {"status": "error", "message": "Failed to store message"})
+            return
 
-        send_response(client_socket, {"status": "success", "message": "Message delivered instantly"})
-    else:
-        send_response(client_socket, {"status": "success", "message": "Message stored for offline delivery"})
+        log_message_size(sender, recipient, message)  # Log the size of the message
+        message_id = future.result()
+        recipient_sock = clients.get(recipient)
+        if recipient_sock is not None:
+            # Deliver message immediately
+            send_response(recipient_sock, {"type": "message", "from": sender, "message": message})
+            storage_writer.submit(lambda cursor: cursor.execute(
+                "UPDATE messages SET delivered = 1 WHERE id = ?", (message_id,)))
+            send_response(client_socket, {"status": "success", "message": "Message delivered instantly"})
+        else:
+            adjust_unread(recipient, 1)
+            send_response(client_socket, {"status": "success", "message": "Message stored for offline delivery"})
+
+    # Don't block the selector loop on the commit; respond from the callback instead.
+    storage_writer.submit(insert).add_done_callback(lambda future: call_in_loop(on_committed, future))
 
 def handle_read_messages(client_socket, request):
     """Retrieves undelivered messages, allowing users to specify how many they want."""
@@ -154,8 +229,11 @@ def handle_read_messages(client_socket, request):
     # Mark retrieved messages as delivered
     message_ids = [msg[0] for msg in messages]
     if message_ids:
-        cursor.execute(f"UPDATE messages SET delivered = 1 WHERE id IN ({','.join(['?']*len(message_ids))})", message_ids)
+        # Only count rows this call flipped, in case they were already delivered.
+        cursor.execute(f"UPDATE messages SET delivered = 1 WHERE id IN ({','.join(['?']*len(message_ids))}) AND delivered = 0", message_ids)
+        delivered = cursor.rowcount
         conn.commit()
+        adjust_unread(username, -delivered)
 
     # Format messages to send to client
     message_list = [{"id": msg[0], "from": msg[1], "message": msg[2], "timestamp": msg[3]} for msg in messages]
@@ -231,9 +309,14 @@ def handle_delete_messages(client_socket, request):
     message_ids = [int(msg_id) for msg_id in message_ids]
 
     # Delete messages only if they belong to the user
-    cursor.execute(f"DELETE FROM messages WHERE id IN ({','.join(['?']*len(message_ids))}) AND recipient = ?", 
+    placeholders = ','.join(['?']*len(message_ids))
+    cursor.execute(f"SELECT COUNT(*) FROM messages WHERE id IN ({placeholders}) AND recipient = ? AND delivered = 0",
+                   message_ids + [username])
+    unread_deleted = cursor.fetchone()[0]
+    cursor.execute(f"DELETE FROM messages WHERE id IN ({placeholders}) AND recipient = ?", 
                    message_ids + [username])
     conn.commit()
+    adjust_unread(username, -unread_deleted)
 
     send_response(client_socket, {"status": "success", "message": "Messages deleted successfully"})
 
@@ -245,6 +328,11 @@ def handle_delete_account(client_socket, request):
         send_response(client_socket, {"status": "error", "message": "Username required"})
         return
 
+    # Unread messages this user sent to others disappear with the account too
+    cursor.execute("SELECT recipient, COUNT(*) FROM messages WHERE sender = ? AND recipient != ? AND delivered = 0 GROUP BY recipient",
+                   (username, username))
+    unread_sent = cursor.fetchall()
+
     # First, delete all messages associated with the user
     cursor.execute("DELETE FROM messages WHERE sender = ? OR recipient = ?", (username, username))
 
@@ -252,6 +340,11 @@ def handle_delete_account(client_socket, request):
     cursor.execute("DELETE FROM users WHERE username = ?", (username,))
     conn.commit()
 
+    for recipient, count in unread_sent:
+        adjust_unread(recipient, -count)
+    with unread_lock:
+        unread_counts.pop(username, None)
+
     # Remove user from active connections if they are online
     if username in clients:
         del clients[username]
@@ -277,14 +370,22 @@ def handle_binary_message(client_socket):
         recipient = client_socket.recv(recipient_len).decode("utf-8")
         message = client_socket.recv(message_len).decode("utf-8")
 
-        # Store message in SQLite
-        cursor.execute("INSERT INTO messages (sender, recipient, message, delivered) VALUES (?, ?, ?, 0)", 
-                       (sender, recipient, message))
-        conn.commit()
+        def on_committed(future):
+            # Runs on the selector thread once the insert is committed.
+            if future.exception() is not None:
+                print(f"Binary message error: {future.exception()}")
+                client_socket.sendall(b"[server] Failed to store message")
+                return
+            adjust_unread(recipient, 1)
+
+            # If recipient is online, deliver immediately
+            if recipient in clients:
+                clients[recipient].sendall(f"[{sender}] {message}".encode("utf-8"))
 
-        # If recipient is online, deliver immediately
-        if recipient in clients:
-            clients[recipient].sendall(f"[{sender}] {message}".encode("utf-8"))
+        # Store message in SQLite; the counter and the push wait for the commit.
+        storage_writer.submit(lambda cursor: cursor.execute(
+            "INSERT INTO messages (sender, recipient, message, delivered) VALUES (?, ?, ?, 0)",
+            (sender, recipient, message))).add_done_callback(lambda future: call_in_loop(on_committed, future))
 
     except Exception as e:
         print(f"Binary message error: {e}")
@@ -349,8 +450,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Chat Server")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Server IP address (default: 0.0.0.0)")
     parser.add_argument("--port", type=int, default=54400, help="Server port number (default: 54400)")
+    parser.add_argument("--commit-interval-ms", type=float, default=2,
+                        help="How long the storage writer gathers message inserts into one commit (default: 2)")
+    parser.add_argument("--auth-workers", type=int, default=2, help="Processes used for bcrypt hashing/checking (default: 2)")
+    parser.add_argument("--auth-max-pending", type=int, default=64,
+                        help="Max queued + running password jobs before auth requests are rejected (default: 64)")
     args = parser.parse_args()
 
+    storage_writer = StorageWriter(DB_PATH, max_delay_ms=args.commit_interval_ms)
+    password_pool = PasswordPool(args.auth_workers, args.auth_max_pending)
+
     HOST = args.host
     PORT = args.port
 
@@ -367,7 +476,9 @@ if __name__ == "__main__":
         while True:
             events = sel.select(timeout=None)
             for key, mask in events:
-                if key.data is None:
+                if key.fileobj is loop_callbacks.wakeup_recv:
+                    loop_callbacks.run_pending()
+                elif key.data is None:
                     accept_wrapper(key.fileobj)
                 else:
                     service_connection(key, mask)
@@ -375,3 +486,5 @@ if __name__ == "__main__":
         print("Server shutting down")
     finally:
         sel.close()
+        storage_writer.stop()
+        password_pool.close()
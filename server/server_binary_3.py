@@ -35,6 +35,11 @@ cursor.execute('''
     )
 ''')
 
+# Indexes for the per-recipient unread and list queries (sorted by id) and the sender/recipient delete.
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient_delivered ON messages (recipient, delivered, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages (recipient, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender)")
+
 conn.commit()
 
 # Store online clients
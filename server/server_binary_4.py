@@ -1,12 +1,18 @@
+import os
+import sys
 import socket
 import selectors
 import sqlite3
 import json
-import bcrypt
 import types
 import struct
 import argparse
 
+# Modules shared by the chat servers live in common/ at the repo root.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from loop_callbacks import LoopCallbacks
+from password_pool import PasswordPool, PasswordPoolBusy
+
 # Command codes (1 byte each)
 CMD_REGISTER        = 1
 CMD_LOGIN           = 2
@@ -133,6 +139,11 @@ def reconstruct_json_request(command, fields):
 # Initialize selector for handling multiple clients
 sel = selectors.DefaultSelector()
 
+# Work finished on other threads (storage writer, password pool) comes back to the selector
+# thread through call_in_loop.
+loop_callbacks = LoopCallbacks(sel)
+call_in_loop = loop_callbacks.call_in_loop
+
 # Database connection
 conn = sqlite3.connect("chat.db", check_same_thread=False)
 cursor = conn.cursor()
@@ -158,11 +169,19 @@ cursor.execute('''
     )
 ''')
 
+# Indexes for the per-recipient unread and list queries (sorted by id) and the sender/recipient delete.
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient_delivered ON messages (recipient, delivered, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages (recipient, id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender)")
+
 conn.commit()
 
 # Store online clients
 clients = {}
 
+# Started in __main__.
+password_pool = None
+
 # ---------------------------- Helper Functions ----------------------------
 def send_response(sock, response):
     """Send a JSON response to the client."""
@@ -182,15 +201,23 @@ def handle_register(client_socket, request):
         send_response(client_socket, {"status": "error", "message": "Username and password required"})
         return
 
-    # Hash password
-    password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    def on_hashed(future):
+        try:
+            cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, future.result()))
+            conn.commit()
+            send_response(client_socket, {"status": "success", "message": "Registration successful"})
+        except sqlite3.IntegrityError:
+            send_response(client_socket, {"status": "error", "message": "Username already exists"})
+        except Exception as e:
+            # The pool job or the insert failed; the client still gets an answer.
+            print(f"Registration of {username} failed: {e}")
+            send_response(client_socket, {"status": "error", "message": "Registration failed, please try again"})
 
+    # Hash password in the password pool; the selector loop keeps serving other clients meanwhile
     try:
-        cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
-        conn.commit()
-        send_response(client_socket, {"status": "success", "message": "Registration successful"})
-    except sqlite3.IntegrityError:
-        send_response(client_socket, {"status": "error", "message": "Username already exists"})
+        password_pool.hash(password).add_done_callback(lambda future: call_in_loop(on_hashed, future))
+    except PasswordPoolBusy:
+        send_response(client_socket, {"status": "error", "message": "Server busy, please try again"})
 
 def handle_login(client_socket, request):
     """Handles user login."""
@@ -203,21 +230,37 @@ def handle_login(client_socket, request):
 
     cursor.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
     result = cursor.fetchone()
-
-    if result and bcrypt.checkpw(password.encode("utf-8"), result[0]):
-        clients[username] = client_socket  # Store client as online
-
-        # Check unread messages
-        cursor.execute("SELECT COUNT(*) FROM messages WHERE recipient = ? AND delivered = 0", (username,))
-        unread_count = cursor.fetchone()[0]
-
-        send_response(client_socket, {
-            "status": "success",
-            "message": "Login successful",
-            "unread_messages": unread_count
-        })
-    else:
+    if not result:
         send_response(client_socket, {"status": "error", "message": "Invalid username or password"})
+        return
+
+    def on_checked(future):
+        try:
+            password_ok = future.result()
+        except Exception as e:
+            print(f"Password check for {username} failed: {e}")
+            send_response(client_socket, {"status": "error", "message": "Login failed, please try again"})
+            return
+        if password_ok:
+            clients[username] = client_socket  # Store client as online
+
+            # Check unread messages
+            cursor.execute("SELECT COUNT(*) FROM messages WHERE recipient = ? AND delivered = 0", (username,))
+            unread_count = cursor.fetchone()[0]
+
+            send_response(client_socket, {
+                "status": "success",
+                "message": "Login successful",
+                "unread_messages": unread_count
+            })
+        else:
+            send_response(client_socket, {"status": "error", "message": "Invalid username or password"})
+
+    # Check the password in the password pool; the selector loop keeps serving other clients meanwhile
+    try:
+        password_pool.check(password, result[0]).add_done_callback(lambda future: call_in_loop(on_checked, future))
+    except PasswordPoolBusy:
+        send_response(client_socket, {"status": "error", "message": "Server busy, please try again"})
 
 def log_message_size(sender, recipient, message):
     """Logs the size of a sent message."""
@@ -477,8 +520,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Chat Server")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Server IP address (default: 0.0.0.0)")
     parser.add_argument("--port", type=int, default=54400, help="Server port number (default: 54400)")
+    parser.add_argument("--auth-workers", type=int, default=2, help="Processes used for bcrypt hashing/checking (default: 2)")
+    parser.add_argument("--auth-max-pending", type=int, default=64,
+                        help="Max queued + running password jobs before auth requests are rejected (default: 64)")
     args = parser.parse_args()
 
+    password_pool = PasswordPool(args.auth_workers, args.auth_max_pending)
+
     HOST = args.host
     PORT = args.port
 
@@ -495,7 +543,9 @@ if __name__ == "__main__":
         while True:
             events = sel.select(timeout=None)
             for key, mask in events:
-                if key.data is None:
+                if key.fileobj is loop_callbacks.wakeup_recv:
+                    loop_callbacks.run_pending()
+                elif key.data is None:
                     accept_wrapper(key.fileobj)
                 else:
                     service_connection(key, mask)
@@ -503,3 +553,4 @@ if __name__ == "__main__":
         print("Server shutting down")
     finally:
         sel.close()
+        password_pool.close()
@@ -0,0 +1,5 @@
+# Lets the tests import the replication server (server, chat_pb2, ...) from any working directory.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "replication"))
@@ -3,28 +3,49 @@ import json
 import time
 import sqlite3
 import unittest
-import bcrypt
+import threading
+import asyncio
+import collections
+import grpc
 
 import chat_pb2
 import chat_pb2_grpc
-from server import ChatServer
+from server import ChatServer, AioChatServer, ConcurrencyLimitInterceptor, PhiAccrualDetector, load_session_secret
 
 
 # A simple fake gRPC context to pass to our RPC methods.
 class FakeContext:
-    def __init__(self):
+    def __init__(self, metadata=()):
         self.code = None
         self.details = None
+        self.callbacks = []
+        self.metadata = metadata
+        self.trailing_metadata = None
 
     def is_active(self):
         return True
 
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+        return True
+
     def set_code(self, code):
         self.code = code
 
     def set_details(self, details):
         self.details = details
 
+    def invocation_metadata(self):
+        return self.metadata
+
+    def set_trailing_metadata(self, metadata):
+        self.trailing_metadata = metadata
+
+    def abort(self, code, details):
+        self.code = code
+        self.details = details
+        raise grpc.RpcError(details)
+
 import gc
 
 def safe_remove(filename, retries=10, delay=0.1):
@@ -143,6 +164,468 @@ class TestChatServer(unittest.TestCase):
         delivered_flag = self.server.cursor.fetchone()[0]
         self.assertEqual(delivered_flag, 1)
 
+    def test_session_token_resumes_without_password(self):
+        context = FakeContext()
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="user4", password="pw"), context)
+        login_resp = self.server.Login(chat_pb2.LoginRequest(username="user4", password="pw"), context)
+        self.assertTrue(login_resp.session_token)
+        self.assertGreater(login_resp.token_expires_at, time.time())
+
+        resume_resp = self.server.ResumeSession(chat_pb2.ResumeSessionRequest(session_token=login_resp.session_token), context)
+        self.assertTrue(resume_resp.success)
+        self.assertTrue(resume_resp.session_token)
+
+        # A replica sharing the secret (e.g. the next leader) accepts the same token.
+        other = ChatServer(6, "localhost:50051", self.config_filename)
+        other.session_secret = self.server.session_secret
+        self.assertEqual(other.verify_session_token(login_resp.session_token), "user4")
+        other.close()
+
+        # Forged and expired tokens are rejected.
+        payload, signature = login_resp.session_token.split(".")
+        forged = payload + "." + ("0" if signature[0] != "0" else "1") + signature[1:]
+        self.assertFalse(self.server.ResumeSession(chat_pb2.ResumeSessionRequest(session_token=forged), context).success)
+        self.server.session_ttl = -1
+        expired, _ = self.server.issue_session_token("user4")
+        self.assertFalse(self.server.ResumeSession(chat_pb2.ResumeSessionRequest(session_token=expired), context).success)
+
+    def test_session_tokens_are_revoked_by_logout_and_account_deletion(self):
+        context = FakeContext()
+        resume = lambda token: self.server.ResumeSession(chat_pb2.ResumeSessionRequest(session_token=token), context).success
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="user5", password="pw"), context)
+        token = self.server.Login(chat_pb2.LoginRequest(username="user5", password="pw"), context).session_token
+        self.assertTrue(resume(token))
+        self.server.Logout(chat_pb2.LogoutRequest(username="user5"), context)
+        self.assertFalse(resume(token))
+
+        # A token from before the account was deleted doesn't log into a new account of the same name.
+        token = self.server.Login(chat_pb2.LoginRequest(username="user5", password="pw"), context).session_token
+        self.server.DeleteAccount(chat_pb2.DeleteAccountRequest(username="user5"), context)
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="user5", password="other"), context)
+        self.assertFalse(resume(token))
+
+    def test_session_secret_is_never_taken_from_config_json(self):
+        self.assertRaises(ValueError, load_session_secret, {"session_secret": "s3cret"}, self.config_filename)
+        secret_file = "temp_session_secret"
+        self.addCleanup(os.remove, secret_file)
+        with open(secret_file, "w") as f:
+            f.write("change-me-shared-by-all-replicas\n")
+        # A published placeholder is refused, wherever it comes from.
+        self.assertRaises(ValueError, load_session_secret, {"session_secret_file": secret_file}, self.config_filename)
+        with open(secret_file, "w") as f:
+            f.write("from-the-file\n")
+        self.assertEqual(load_session_secret({"session_secret_file": secret_file}, self.config_filename), "from-the-file")
+        self.assertIsNone(load_session_secret({}, self.config_filename))
+        os.environ["CHAT_SESSION_SECRET"] = "from-the-environment"
+        self.addCleanup(os.environ.pop, "CHAT_SESSION_SECRET")
+        self.assertEqual(load_session_secret({"session_secret_file": secret_file}, self.config_filename), "from-the-environment")
+
+    def test_connections_of_exited_threads_are_closed(self):
+        opened = []
+        def query():
+            self.server.cursor.execute("SELECT 1")
+            opened.append(self.server.conn)
+        for _ in range(20):
+            thread = threading.Thread(target=query)
+            thread.start()
+            thread.join()
+        # The next thread to open a connection closes those of the threads that have exited.
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+        self.assertEqual([t for t in self.server.connections if not t.is_alive()], [thread])
+        for conn in opened[:-1]:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    def test_password_pool_sheds_load_when_full(self):
+        context = FakeContext()
+        self.assertTrue(self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="user3", password="pw"), context).success)
+        metrics = self.server.password_pool.metrics()
+        self.assertEqual((metrics["submitted"], metrics["rejected"]), (1, 0))
+
+        # With no room in the pool, auth requests are rejected instead of queued.
+        self.server.password_pool.max_pending = 0
+        resp = self.server.Login(chat_pb2.LoginRequest(username="user3", password="pw"), context)
+        self.assertFalse(resp.success)
+        self.assertIn("busy", resp.message)
+        self.assertEqual(self.server.password_pool.metrics()["rejected"], 1)
+
+    def test_login_unread_count_tracks_sends_reads_and_deletes(self):
+        context = FakeContext()
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="sender", password="pass"), context)
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="receiver", password="pass"), context)
+        for i in range(3):
+            self.server.SendMessage(chat_pb2.SendMessageRequest(sender="sender", to="receiver", message=f"m{i}"), context)
+
+        login_req = chat_pb2.LoginRequest(username="receiver", password="pass")
+        self.assertEqual(self.server.Login(login_req, context).unread_messages, 3)
+
+        read_resp = self.server.ReadMessages(chat_pb2.ReadMessagesRequest(username="receiver", count=2), context)
+        self.assertEqual(len(read_resp.messages), 2)
+        self.assertEqual(self.server.Login(login_req, context).unread_messages, 1)
+
+        # Deleting a delivered message leaves the count alone; deleting the unread one clears it.
+        self.server.DeleteMessages(chat_pb2.DeleteMessagesRequest(username="receiver", message_ids=[read_resp.messages[0].id]), context)
+        self.assertEqual(self.server.Login(login_req, context).unread_messages, 1)
+        self.server.cursor.execute("SELECT id FROM messages WHERE recipient = ? AND delivered = 0", ("receiver",))
+        unread_id = self.server.cursor.fetchone()[0]
+        self.server.DeleteMessages(chat_pb2.DeleteMessagesRequest(username="receiver", message_ids=[unread_id]), context)
+        self.assertEqual(self.server.Login(login_req, context).unread_messages, 0)
+
+        # The counters are rebuilt from the database on startup.
+        self.server.SendMessage(chat_pb2.SendMessageRequest(sender="sender", to="receiver", message="again"), context)
+        self.server.rebuild_unread_counts()
+        self.assertEqual(self.server.unread_counts, {"receiver": 1})
+
+        # Deleting the sender's account also drops the unread messages it sent.
+        self.server.DeleteAccount(chat_pb2.DeleteAccountRequest(username="sender"), context)
+        self.assertEqual(self.server.Login(login_req, context).unread_messages, 0)
+
+    def test_subscription_pushes_until_logout(self):
+        context = FakeContext()
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="sender", password="pass"), context)
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="receiver", password="pass"), context)
+
+        received = []
+        stream = self.server.SubscribeMessages(chat_pb2.SubscribeRequest(username="receiver"), context)
+        reader = threading.Thread(target=lambda: received.extend(msg.message for msg in stream))
+        reader.start()
+        while "receiver" not in self.server.active_subscriptions:
+            time.sleep(0.01)
+
+        self.server.SendMessage(chat_pb2.SendMessageRequest(sender="sender", to="receiver", message="pushed"), context)
+        # Logout ends the stream right away (no polling interval to wait out).
+        self.server.Logout(chat_pb2.LogoutRequest(username="receiver"), context)
+        reader.join(timeout=0.5)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(received, ["pushed"])
+
+    def test_subscriptions_fan_out_per_device_and_evict_slow_ones_to_read_messages(self):
+        context = FakeContext()
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="sender", password="pass"), context)
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="receiver", password="pass"), context)
+        self.server.active_subscriptions.max_queue = 3
+        request = chat_pb2.SubscribeRequest(username="receiver")
+
+        # A stream registers on its first next(), which blocks until a message arrives, so
+        # open both devices from threads; after that the test reads the phone itself.
+        phone = self.server.SubscribeMessages(request, FakeContext())
+        laptop_context = FakeContext()
+        laptop = self.server.SubscribeMessages(request, laptop_context)
+        first = {}
+        openers = [threading.Thread(target=lambda name=name, stream=stream: first.__setitem__(name, next(stream).message))
+                   for name, stream in (("phone", phone), ("laptop", laptop))]
+        for opener in openers:
+            opener.start()
+        while len(self.server.active_subscriptions.streams.get("receiver", [])) < 2:
+            time.sleep(0.01)
+
+        send = lambda text: self.server.SendMessage(chat_pb2.SendMessageRequest(sender="sender", to="receiver", message=text), context)
+        send("m0")
+        for opener in openers:
+            opener.join(timeout=1)
+        self.assertEqual(first, {"phone": "m0", "laptop": "m0"})
+        # The laptop stops reading: three queued messages fill its buffer, the fourth evicts it.
+        # The phone takes each message as it is sent, so only the laptop falls behind.
+        phone_received = ["m0"]
+        for text in ["m1", "m2", "m3", "m4"]:
+            send(text)
+            phone_received.append(next(phone).message)
+        self.assertEqual(len(self.server.active_subscriptions.streams["receiver"]), 1)
+        # The evicted stream ends with RESOURCE_EXHAUSTED so the client falls back to ReadMessages.
+        with self.assertRaises(grpc.RpcError):
+            next(laptop)
+        self.assertEqual(laptop_context.code, grpc.StatusCode.RESOURCE_EXHAUSTED)
+        # Marked as an eviction, unlike a concurrency limit's RESOURCE_EXHAUSTED.
+        self.assertEqual(laptop_context.trailing_metadata, (("subscription-evicted", "1"),))
+        metrics = self.server.active_subscriptions.metrics()
+        self.assertEqual((metrics["evicted"], metrics["dropped"], metrics["max_depth"]), (1, 4, 3))
+        # Pushing never marks messages delivered, so the laptop can still read all of them.
+        read = self.server.ReadMessages(chat_pb2.ReadMessagesRequest(username="receiver", count=10), context)
+        self.assertEqual([msg.message for msg in read.messages], ["m0", "m1", "m2", "m3", "m4"])
+
+        self.server.Logout(chat_pb2.LogoutRequest(username="receiver"), context)
+        self.assertEqual(list(phone), [])  # Logout ends the phone's stream
+        self.assertEqual(phone_received, ["m0", "m1", "m2", "m3", "m4"])
+        self.assertNotIn("receiver", self.server.active_subscriptions)
+
+    def test_pushed_messages_stay_unread_until_acked(self):
+        context = FakeContext()
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="sender", password="pass"), context)
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="receiver", password="pass"), context)
+        received = []
+        stream = self.server.SubscribeMessages(chat_pb2.SubscribeRequest(username="receiver"), context)
+        reader = threading.Thread(target=lambda: received.extend(stream))
+        reader.start()
+        while "receiver" not in self.server.active_subscriptions:
+            time.sleep(0.01)
+        for text in ["one", "two", "three"]:
+            self.server.SendMessage(chat_pb2.SendMessageRequest(sender="sender", to="receiver", message=text), context)
+        self.server.Logout(chat_pb2.LogoutRequest(username="receiver"), context)
+        reader.join(timeout=1)
+        self.assertEqual([msg.message for msg in received], ["one", "two", "three"])
+
+        # The client acks the first two; the third (say its ack was lost) is still unread.
+        ack = self.server.AckMessages(chat_pb2.AckMessagesRequest(username="receiver", message_ids=[m.id for m in received[:2]]), context)
+        self.assertTrue(ack.success)
+        self.assertEqual(ack.acked, 2)
+        login = self.server.Login(chat_pb2.LoginRequest(username="receiver", password="pass"), context)
+        self.assertEqual(login.unread_messages, 1)
+        read = self.server.ReadMessages(chat_pb2.ReadMessagesRequest(username="receiver", count=10), context)
+        self.assertEqual([msg.message for msg in read.messages], ["three"])
+        # Acking again (or someone else's messages) changes nothing.
+        again = self.server.AckMessages(chat_pb2.AckMessagesRequest(username="sender", message_ids=[m.id for m in received]), context)
+        self.assertEqual(again.acked, 0)
+
+    def test_reads_and_acks_replicate_as_one_ranged_mark_delivered_entry(self):
+        context = FakeContext()
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="sender", password="pass"), context)
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="receiver", password="pass"), context)
+        for i in range(6):
+            self.server.SendMessage(chat_pb2.SendMessageRequest(sender="sender", to="receiver", message=f"m{i}"), context)
+        self.server.SendMessage(chat_pb2.SendMessageRequest(sender="receiver", to="sender", message="reply"), context)
+        self.server.cursor.execute("SELECT id FROM messages WHERE recipient = 'receiver' ORDER BY id")
+        ids = [row[0] for row in self.server.cursor.fetchall()]
+        replicated = []
+        self.server.replicate_operation = lambda entry: replicated.append(entry) or True
+
+        # Read the first three, then ack the last two (the fourth stays unread).
+        self.server.ReadMessages(chat_pb2.ReadMessagesRequest(username="receiver", count=3), context)
+        self.server.AckMessages(chat_pb2.AckMessagesRequest(username="receiver", message_ids=ids[4:]), context)
+        self.assertEqual(replicated, [], "Reads and acks don't replicate one by one")
+
+        self.assertTrue(self.server.flush_delivered())
+        self.assertEqual(len(replicated), 1)
+        ranges = [(r.recipient, r.first_id, r.last_id) for r in replicated[0].mark_delivered.ranges]
+        self.assertEqual(ranges, [("receiver", ids[0], ids[2]), ("receiver", ids[4], ids[5])])
+        self.assertEqual(self.server.last_applied, replicated[0].index)
+        self.assertFalse(self.server.flush_delivered(), "Nothing left to flush")
+        login = self.server.Login(chat_pb2.LoginRequest(username="receiver", password="pass"), context)
+        self.assertEqual(login.unread_messages, 1)
+
+    def test_aio_adapter_delegates_and_pushes(self):
+        context = FakeContext()
+        adapter = AioChatServer(self.server, executor_workers=4)
+
+        async def scenario():
+            await adapter.CreateAccount(chat_pb2.CreateAccountRequest(username="sender", password="pass"), context)
+            await adapter.CreateAccount(chat_pb2.CreateAccountRequest(username="receiver", password="pass"), context)
+            stream = adapter.SubscribeMessages(chat_pb2.SubscribeRequest(username="receiver"), context)
+            first = asyncio.ensure_future(stream.__anext__())
+            while "receiver" not in self.server.active_subscriptions:
+                await asyncio.sleep(0.01)
+            # SendMessage runs on an executor thread and hands the push to the event loop.
+            send_resp = await adapter.SendMessage(chat_pb2.SendMessageRequest(sender="sender", to="receiver", message="aio"), context)
+            pushed = await asyncio.wait_for(first, timeout=1)
+            await adapter.Logout(chat_pb2.LogoutRequest(username="receiver"), context)
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(stream.__anext__(), timeout=1)
+            return send_resp, pushed
+
+        send_resp, pushed = asyncio.run(scenario())
+        adapter.executor.shutdown()
+        self.assertTrue(send_resp.success)
+        self.assertEqual(pushed.message, "aio")
+
+    def test_aio_adapter_touches_the_context_only_on_the_loop(self):
+        class LoopContext(FakeContext):
+            # Like a grpc.aio context: only usable from the event loop thread, abort is a coroutine.
+            def check_thread(self):
+                assert threading.current_thread() is threading.main_thread(), "aio context used off the loop"
+
+            def set_code(self, code):
+                self.check_thread()
+                super().set_code(code)
+
+            def set_trailing_metadata(self, metadata):
+                self.check_thread()
+                super().set_trailing_metadata(metadata)
+
+            async def abort(self, code, details):
+                self.check_thread()
+                FakeContext.abort(self, code, details)
+
+        adapter = AioChatServer(self.server, executor_workers=4)
+        self.server.is_leader = False
+        self.server.leader_address = "localhost:50052"
+        context = LoopContext()
+        response = asyncio.run(adapter.ListAccounts(chat_pb2.ListAccountsRequest(max_staleness_ms=1000), context))
+        self.assertEqual(list(response.accounts), [])
+        self.assertEqual(context.code, grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(dict(context.trailing_metadata), {"leader-address": "localhost:50052"})
+
+        # An abort from the handler becomes an abort of the RPC, raised on the loop.
+        self.server.GetLeader = lambda request, context: context.abort(grpc.StatusCode.INTERNAL, "boom")
+        context = LoopContext()
+        with self.assertRaises(grpc.RpcError):
+            asyncio.run(adapter.GetLeader(chat_pb2.GetLeaderRequest(), context))
+        adapter.executor.shutdown()
+        self.assertEqual((context.code, context.details), (grpc.StatusCode.INTERNAL, "boom"))
+
+    def test_method_limit_rejects_streams_over_the_cap(self):
+        HandlerCallDetails = collections.namedtuple("HandlerCallDetails", ["method", "invocation_metadata"])
+        details = HandlerCallDetails("/chat.ChatService/SubscribeMessages", ())
+        handler = grpc.unary_stream_rpc_method_handler(lambda request, context: iter(["a", "b"]))
+        interceptor = ConcurrencyLimitInterceptor({"SubscribeMessages": 1})
+        limited = interceptor.intercept_service(lambda _: handler, details)
+
+        first = limited.unary_stream(None, FakeContext())
+        self.assertEqual(next(first), "a")  # Holds the only slot while open
+        context = FakeContext()
+        with self.assertRaises(grpc.RpcError):
+            next(limited.unary_stream(None, context))
+        self.assertEqual(context.code, grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+        first.close()  # Client went away; the slot is released
+        self.assertEqual(list(limited.unary_stream(None, FakeContext())), ["a", "b"])
+        # Methods without a limit are passed through untouched.
+        other = HandlerCallDetails("/chat.ChatService/SendMessage", ())
+        self.assertIs(interceptor.intercept_service(lambda _: handler, other), handler)
+
+    def test_follower_reads_within_staleness_bound(self):
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="alice", password="pass"), FakeContext())
+        self.server.is_leader = False
+        self.server.leader_address = "localhost:50052"
+
+        # Without max_staleness_ms a follower still refuses, as before.
+        response = self.server.ListAccounts(chat_pb2.ListAccountsRequest(), FakeContext())
+        self.assertEqual(list(response.accounts), [])
+        # No heartbeat from the leader yet: staleness unknown, so the client should go elsewhere.
+        context = FakeContext()
+        self.server.ListAccounts(chat_pb2.ListAccountsRequest(max_staleness_ms=1000), context)
+        self.assertEqual(context.code, grpc.StatusCode.UNAVAILABLE)
+
+        # A heartbeat from the leader at an index we have applied makes us fresh.
+        self.server.Heartbeat(chat_pb2.HeartbeatRequest(sender_address="localhost:50052",
+                                                        applied_index=self.server.last_applied), FakeContext())
+        response = self.server.ListAccounts(chat_pb2.ListAccountsRequest(max_staleness_ms=1000), FakeContext())
+        self.assertEqual(list(response.accounts), ["alice"])
+        self.assertEqual(response.applied_index, self.server.last_applied)
+        self.assertLess(response.staleness_ms, 1000)
+
+        # The leader is ahead of what we applied: too stale, whatever the bound.
+        self.server.Heartbeat(chat_pb2.HeartbeatRequest(sender_address="localhost:50052",
+                                                        applied_index=self.server.last_applied + 1), FakeContext())
+        context = FakeContext()
+        self.server.ListMessages(chat_pb2.ListMessagesRequest(username="alice", max_staleness_ms=1000), context)
+        self.assertEqual(context.code, grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(self.server.GetLeader(chat_pb2.GetLeaderRequest(), FakeContext()).staleness_ms, -1)
+
+    def test_leader_serves_reads_only_while_holding_a_majority_lease(self):
+        self.server.CreateAccount(chat_pb2.CreateAccountRequest(username="alice", password="pass"), FakeContext())
+        # A fresh leader has no lease yet, so it refuses rather than risk a stale answer.
+        context = FakeContext()
+        response = self.server.ListAccounts(chat_pb2.ListAccountsRequest(), context)
+        self.assertEqual(context.code, grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(response.staleness_ms, -1)
+
+        # A grant for a heartbeat sent a lease_duration ago has already run out.
+        self.server.record_lease_grants([("localhost:50052", time.time() - self.server.lease_duration)])
+        self.assertFalse(self.server.has_lease())
+        self.server.record_lease_grants([("localhost:50052", time.time())])
+        response = self.server.ListAccounts(chat_pb2.ListAccountsRequest(), FakeContext())
+        self.assertEqual(list(response.accounts), ["alice"])
+        self.assertEqual(response.staleness_ms, 0)
+
+    def test_follower_grants_lease_to_one_leader_at_a_time(self):
+        self.server.is_leader = False
+        time.sleep(self.server.lease_duration)  # Let the promise assumed at startup run out
+        heartbeat = lambda sender, term: self.server.Heartbeat(
+            chat_pb2.HeartbeatRequest(sender_address=sender, term=term), FakeContext()).success
+        self.assertTrue(heartbeat("localhost:50052", 1))
+        self.assertEqual(self.server.leader_address, "localhost:50052")
+
+        # While promised to 50052 we don't vote, so no one else can win an election...
+        election = chat_pb2.ElectionRequest(sender_address="localhost:50053", term=2)
+        self.assertFalse(self.server.RequestElection(election, FakeContext()).ok)
+        # ...and a leader of a later term (elected by others) gets no grant until the promise runs out.
+        self.server.SetLeader(chat_pb2.SetLeaderRequest(leader_address="localhost:50053", term=2), FakeContext())
+        self.assertFalse(heartbeat("localhost:50053", 2))
+        self.assertFalse(heartbeat("localhost:50052", 1))  # Its term is over
+        self.server.lease_granted_until = time.time()
+        self.assertTrue(heartbeat("localhost:50053", 2))
+
+    def test_restarted_follower_keeps_an_unknown_lease_promise(self):
+        self.server.is_leader = False
+        time.sleep(self.server.lease_duration)
+        self.assertTrue(self.server.Heartbeat(chat_pb2.HeartbeatRequest(sender_address="localhost:50052", term=1), FakeContext()).success)
+        # After a restart we no longer know whom we promised; 50052 may still be serving reads
+        # on that promise, so nobody gets our vote or a grant until it would have run out.
+        self.server.close()
+        self.server = ChatServer(6, "localhost:50051", self.config_filename)
+        election = chat_pb2.ElectionRequest(sender_address="localhost:50053", term=2)
+        self.assertFalse(self.server.RequestElection(election, FakeContext()).ok)
+        self.assertFalse(self.server.Heartbeat(chat_pb2.HeartbeatRequest(sender_address="localhost:50053", term=2), FakeContext()).success)
+        time.sleep(self.server.lease_duration)
+        self.assertTrue(self.server.RequestElection(chat_pb2.ElectionRequest(sender_address="localhost:50053", term=3), FakeContext()).ok)
+
+    def test_replication_batches_double_as_heartbeats(self):
+        self.server.is_leader = False
+        self.server.leader_address = None
+        time.sleep(self.server.lease_duration)  # Let the promise assumed at startup run out
+        batch = chat_pb2.ReplicateBatchRequest(term=1, leader_address="localhost:50052",
+                                               applied_index=self.server.last_applied, sent_at=123.5)
+        [ack] = self.server.ReplicationStream(iter([batch]), FakeContext())
+        self.assertTrue(ack.success)
+        self.assertEqual(ack.lease_from, 123.5)  # The leader's own send time, so clock skew doesn't matter
+        self.assertEqual(self.server.leader_address, "localhost:50052")
+        self.assertEqual(self.server.GetLeader(chat_pb2.GetLeaderRequest(), FakeContext()).leader_address, "localhost:50052")
+        self.assertLess(self.server.failure_detector.phi(), self.server.phi_threshold)
+
+    def test_follower_refuses_leader_only_rpcs_with_a_leader_hint(self):
+        self.server.is_leader = False
+        self.server.leader_address = "localhost:50052"
+        context = FakeContext()
+        response = self.server.SendMessage(chat_pb2.SendMessageRequest(sender="alice", to="bob", message="hi"), context)
+        self.assertFalse(response.success)
+        self.assertEqual(context.trailing_metadata, (("leader-address", "localhost:50052"),))
+        context = FakeContext()
+        self.server.ReadMessages(chat_pb2.ReadMessagesRequest(username="bob", count=10), context)
+        self.assertEqual(context.trailing_metadata, (("leader-address", "localhost:50052"),))
+        # No leader known (e.g. mid-election): an empty hint, so the client asks around.
+        self.server.leader_address = None
+        context = FakeContext()
+        self.server.DeleteAccount(chat_pb2.DeleteAccountRequest(username="bob"), context)
+        self.assertEqual(context.trailing_metadata, (("leader-address", ""),))
+
+    def test_follower_forwards_leader_only_rpcs_when_enabled(self):
+        self.server.is_leader = False
+        self.server.leader_address = "localhost:50052"
+        self.server.forward_writes = True
+        calls = []
+        def call(peer, method, request, timeout=1, service="replication", metadata=None):
+            calls.append((peer, method, service, metadata))
+            return chat_pb2.SendMessageResponse(success=True, message="Message sent")
+        self.server.peer_pool.call = call
+        request = chat_pb2.SendMessageRequest(sender="alice", to="bob", message="hi")
+        context = FakeContext()
+        self.assertTrue(self.server.SendMessage(request, context).success)
+        self.assertIsNone(context.trailing_metadata)
+        self.assertEqual(calls, [("localhost:50052", "SendMessage", "chat", (("forwarded-by", "localhost:50051"),))])
+
+        # A request another follower already forwarded is refused, so it can't bounce around.
+        context = FakeContext(metadata=(("forwarded-by", "localhost:50053"),))
+        self.assertFalse(self.server.SendMessage(request, context).success)
+        self.assertEqual(context.trailing_metadata, (("leader-address", "localhost:50052"),))
+        self.assertEqual(len(calls), 1)
+
+    def test_phi_accrual_detector_suspects_a_silent_leader(self):
+        regular = PhiAccrualDetector(0.1, 0.01)
+        jittery = PhiAccrualDetector(0.1, 0.01)
+        now = regular.last = jittery.last = 1000.0
+        for i in range(20):
+            now += 0.1
+            regular.heartbeat(now)
+            jittery.heartbeat(now - 0.05 if i % 2 else now + 0.05)
+            jittery.last = now
+        self.assertLess(regular.phi(now + 0.1), 1)
+        self.assertGreater(regular.phi(now + 0.3), 8)
+        # The same silence is less suspicious after irregular heartbeats.
+        self.assertLess(jittery.phi(now + 0.3), regular.phi(now + 0.3))
+        regular.reset()
+        self.assertLess(regular.phi(), 1)
+
     def test_delete_messages(self):
         context = FakeContext()
         # Create accounts and send a message.
@@ -4,7 +4,6 @@ import os
 import shutil
 import time
 import json
-import sqlite3
 import bcrypt
 import grpc
 import gc
@@ -17,17 +16,58 @@ import chat_pb2_grpc
 
 # --- Fake gRPC Channel and Stub for Testing Fault Tolerance ---
 TEST_ALIVE_STATUS = {}
+BATCH_SIZES = []
+SERVERS_BY_ADDRESS = {}  # Lets fake stubs route catch-up calls to in-process servers
 
 class FakeReplicationStub:
     def __init__(self, address):
         self.address = address
 
-    def ReplicateOperation(self, request, timeout=None):
-        print(f"FakeReplicationStub called for address {self.address} with operation: {request.operation}")
+    def ReplicateOperation(self, request, timeout=None, metadata=None):
+        print(f"FakeReplicationStub called for address {self.address} with entry {request.entry.index}")
         if not TEST_ALIVE_STATUS.get(self.address, False):
             raise grpc.RpcError("Simulated server failure")
         return chat_pb2.ReplicateResponse(success=True)
 
+    def ReplicateBatch(self, request, timeout=None, metadata=None):
+        print(f"FakeReplicationStub called for address {self.address} with {len(request.entries)} entries")
+        BATCH_SIZES.append(len(request.entries))
+        if not TEST_ALIVE_STATUS.get(self.address, False):
+            raise grpc.RpcError("Simulated server failure")
+        return chat_pb2.ReplicateBatchResponse(success=True, last_index=request.entries[-1].index)
+
+    def ReplicationStream(self, request_iterator, timeout=None):
+        last_index = 0
+        for request in request_iterator:
+            print(f"FakeReplicationStub streamed {len(request.entries)} entries to {self.address}")
+            if request.entries:
+                BATCH_SIZES.append(len(request.entries))
+            if not TEST_ALIVE_STATUS.get(self.address, False):
+                raise grpc.RpcError("Simulated server failure")
+            if request.entries:
+                last_index = request.entries[-1].index
+            yield chat_pb2.ReplicateBatchResponse(success=True, last_index=last_index)
+
+    def _in_process_server(self):
+        if not TEST_ALIVE_STATUS.get(self.address, False) or self.address not in SERVERS_BY_ADDRESS:
+            raise grpc.RpcError("Simulated server failure")
+        return SERVERS_BY_ADDRESS[self.address]
+
+    def Heartbeat(self, request, timeout=None, metadata=None):
+        return self._in_process_server().Heartbeat(request, None)
+
+    def RequestElection(self, request, timeout=None, metadata=None):
+        return self._in_process_server().RequestElection(request, None)
+
+    def SetLeader(self, request, timeout=None, metadata=None):
+        return self._in_process_server().SetLeader(request, None)
+
+    def GetStateSince(self, request, timeout=None, metadata=None):
+        return self._in_process_server().GetStateSince(request, None)
+
+    def StreamSnapshot(self, request, timeout=None, metadata=None):
+        return self._in_process_server().StreamSnapshot(request, None)
+
 class FakeChannel:
     def __init__(self, address):
         self.address = address
@@ -38,12 +78,24 @@ class FakeChannel:
     def close(self):
         pass
 
-def fake_insecure_channel(address):
+def fake_insecure_channel(address, options=None):
     return FakeChannel(address)
 
 _original_insecure_channel = grpc.insecure_channel
 _original_replication_stub = chat_pb2_grpc.ReplicationServiceStub
 
+def create_account_entry(username, index=0):
+    password_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt())
+    return chat_pb2.LogEntry(index=index, create_account=chat_pb2.CreateAccountOp(username=username, password_hash=password_hash))
+
+def send_message_entry(message_id, sender, recipient, text, timestamp, index=0, term=0):
+    return chat_pb2.LogEntry(index=index, term=term, send_message=chat_pb2.SendMessageOp(
+        id=message_id, sender=sender, recipient=recipient, message=text, timestamp=timestamp))
+
+def committed_batch(entries):
+    """A batch whose entries the sending leader has already applied, so the follower applies them too."""
+    return chat_pb2.ReplicateBatchRequest(entries=entries, applied_index=entries[-1].index)
+
 # --- Extended Test Suite ---
 
 class TestChatSystemExtended(unittest.TestCase):
@@ -71,6 +123,7 @@ class TestChatSystemExtended(unittest.TestCase):
         chat_pb2_grpc.ReplicationServiceStub = lambda channel: FakeReplicationStub(channel.address)
 
         self.servers = []
+        SERVERS_BY_ADDRESS.clear()
 
     def tearDown(self):
         for server in self.servers:
@@ -96,24 +149,22 @@ class TestChatSystemExtended(unittest.TestCase):
         server7.is_leader = True
 
         # Create two accounts: alice and bob.
-        for username in ["alice", "bob"]:
-            pwd_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt()).decode()
-            op = f"CreateAccount:{username}:{pwd_hash}"
-            server7.apply_operation(op)
+        for index, username in enumerate(["alice", "bob"], start=1):
+            server7.apply_operation(create_account_entry(username, index=index))
         
         # Send three messages.
         now = int(time.time())
         ops = [
-            f"SendMessage:1:alice:bob:Hello Bob:{now}",
-            f"SendMessage:2:bob:alice:Hi Alice:{now+1}",
-            f"SendMessage:3:alice:bob:How are you?:{now+2}"
+            send_message_entry(1, "alice", "bob", "Hello Bob", now, index=3),
+            send_message_entry(2, "bob", "alice", "Hi Alice", now + 1, index=4),
+            send_message_entry(3, "alice", "bob", "How are you?", now + 2, index=5)
         ]
         for op in ops:
             server7.apply_operation(op)
         
         # Delete message with id 2.
         # IMPORTANT: Since message 2 is sent to "alice", we must use "alice" as the recipient.
-        del_op = "DeleteMessages:alice:2"
+        del_op = chat_pb2.LogEntry(index=6, delete_messages=chat_pb2.DeleteMessagesOp(username="alice", message_ids=[2]))
         server7.apply_operation(del_op)
 
         # Verify state before restart.
@@ -140,6 +191,40 @@ class TestChatSystemExtended(unittest.TestCase):
         new_message_ids = sorted([row[0] for row in server7_new.cursor.fetchall()])
         self.assertEqual(new_message_ids, [1, 3], "Messages should persist after restart.")
 
+        # Replaying already-applied entries after the restart is a no-op.
+        server7_new.apply_operation(ops[1])
+        server7_new.cursor.execute("SELECT id FROM messages")
+        self.assertEqual(sorted(row[0] for row in server7_new.cursor.fetchall()), [1, 3],
+                         "Replayed entries at or below last_applied should be skipped.")
+
+    def test_message_with_colons_round_trips(self):
+        server7 = ChatServer(7, "127.0.0.1:50057", config_file="config.json")
+        self.servers.append(server7)
+        text = "meet at 10:30: bring the key:value notes"
+        server7.apply_operation(send_message_entry(1, "alice", "bob", text, int(time.time()), index=1))
+        server7.cursor.execute("SELECT message FROM messages WHERE id = 1")
+        self.assertEqual(server7.cursor.fetchone()[0], text)
+
+    def test_hot_message_queries_use_indexes(self):
+        """
+        The unread/read/list queries and the account-deletion delete should be served
+        by the secondary indexes created at startup, not by full table scans.
+        """
+        server7 = ChatServer(7, "127.0.0.1:50057", config_file="config.json")
+        self.servers.append(server7)
+        queries = [
+            ("SELECT COUNT(*) FROM messages WHERE recipient = ? AND delivered = 0", ("bob",)),
+            ("SELECT id, sender, message, timestamp FROM messages WHERE recipient = ? AND delivered = 0 ORDER BY id ASC LIMIT ?", ("bob", 10)),
+            ("SELECT id, sender, message, timestamp, delivered FROM messages WHERE recipient = ? ORDER BY id ASC", ("bob",)),
+            ("DELETE FROM messages WHERE sender = ? OR recipient = ?", ("bob", "bob")),
+        ]
+        for query, params in queries:
+            server7.cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+            plan = " | ".join(row[-1] for row in server7.cursor.fetchall())
+            self.assertIn("INDEX", plan, f"Expected an index lookup for: {query}\nPlan: {plan}")
+            self.assertNotIn("SCAN messages", plan, f"Unexpected table scan for: {query}\nPlan: {plan}")
+            self.assertNotIn("TEMP B-TREE", plan, f"Unexpected sort for: {query}\nPlan: {plan}")
+
     # Other tests remain unchanged...
     def test_concurrent_operations_partial_failure(self):
         from server import ChatServer
@@ -152,7 +237,7 @@ class TestChatSystemExtended(unittest.TestCase):
         leader.is_leader = True
         leader.leader_address = leader.address
 
-        op_initial = f"CreateAccount:concurrentuser:{bcrypt.hashpw(b'pwd', bcrypt.gensalt()).decode()}"
+        op_initial = leader.append_to_log(create_account_entry("concurrentuser"))
         self.assertTrue(leader.replicate_operation(op_initial),
                         "Initial replication should succeed with all peers up.")
 
@@ -168,7 +253,7 @@ class TestChatSystemExtended(unittest.TestCase):
         results = [None] * num_ops
         base_time = int(time.time())
         for i in range(num_ops):
-            op = f"SendMessage:{i+10}:concurrentuser:otheruser:Msg{i}:{base_time+i}"
+            op = leader.append_to_log(send_message_entry(i + 10, "concurrentuser", "otheruser", f"Msg{i}", base_time + i))
             t = threading.Thread(target=send_message, args=(op, results, i))
             threads.append(t)
             t.start()
@@ -177,27 +262,353 @@ class TestChatSystemExtended(unittest.TestCase):
         self.assertTrue(all(results), "All concurrent replications should succeed with two peers down.")
 
         TEST_ALIVE_STATUS["127.0.0.1:50060"] = False
-        op_fail = f"SendMessage:100:concurrentuser:otheruser:This should fail:{int(time.time())}"
+        op_fail = leader.append_to_log(send_message_entry(100, "concurrentuser", "otheruser", "This should fail", int(time.time())))
         self.assertFalse(leader.replicate_operation(op_fail),
                          "Replication should fail when more than 2 peers are down.")
 
-    def test_leader_election_simulation(self):
-        from server import ChatServer
+    def test_concurrent_operations_are_batched(self):
+        leader = ChatServer(11, "127.0.0.1:50061", config_file="config.json", max_linger_ms=50)
+        self.servers.append(leader)
+        leader.is_leader = True
+        leader.leader_address = leader.address
+        BATCH_SIZES.clear()
+
+        results = [None] * 8
+        def send_message(idx):
+            entry = leader.append_to_log(send_message_entry(idx + 1, "alice", "bob", f"Msg{idx}", int(time.time())))
+            results[idx] = leader.replicate_operation(entry)
+        threads = [threading.Thread(target=send_message, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertTrue(all(results), "All batched operations should be acknowledged.")
+        self.assertGreater(max(BATCH_SIZES), 1, "Concurrent operations should share replication batches.")
+
+    def test_rejected_acks_do_not_count_towards_quorum(self):
+        leader = ChatServer(11, "127.0.0.1:50061", config_file="config.json")
+        self.servers.append(leader)
+        leader.is_leader = True
+        leader.leader_address = leader.address
+        leader.replication_timeout = 0.2
+        leader.start_replication_streams = lambda: None  # The test plays the followers' acks itself
+        entry = leader.append_to_log(send_message_entry(1, "alice", "bob", "First", int(time.time())))
+        # Every follower refuses the batch (e.g. it holds a committed entry 1 from another
+        # term) and reports its own last index, which is as far as our entry.
+        for stream in leader.follower_streams.values():
+            stream.synced = True
+            stream.sent_index = 1
+            stream.on_ack(chat_pb2.ReplicateBatchResponse(success=False, last_index=1, term=leader.current_term))
+        self.assertEqual([stream.acked_index for stream in leader.follower_streams.values()], [0, 0, 0, 0])
+        self.assertFalse(leader.replicate_operation(entry))
+
+    def test_stream_resends_unacked_entries_after_reconnect(self):
+        leader = ChatServer(11, "127.0.0.1:50061", config_file="config.json")
+        self.servers.append(leader)
+        leader.is_leader = True
+        leader.leader_address = leader.address
+        first = leader.append_to_log(send_message_entry(1, "alice", "bob", "First", int(time.time())))
+        self.assertTrue(leader.replicate_operation(first))
+
+        for address in ["127.0.0.1:50058", "127.0.0.1:50059", "127.0.0.1:50060"]:
+            TEST_ALIVE_STATUS[address] = False
+        second = leader.append_to_log(send_message_entry(2, "alice", "bob", "Second", int(time.time())))
+        self.assertFalse(leader.replicate_operation(second),
+                         "Write should not be acknowledged without a majority.")
+
+        # Once the followers recover, the unacked entry is resent and later writes succeed.
+        for address in ["127.0.0.1:50058", "127.0.0.1:50059", "127.0.0.1:50060"]:
+            TEST_ALIVE_STATUS[address] = True
+        third = leader.append_to_log(send_message_entry(3, "alice", "bob", "Third", int(time.time())))
+        self.assertTrue(leader.replicate_operation(third))
+        acked = [stream.acked_index for stream in leader.follower_streams.values()]
+        self.assertGreaterEqual(sorted(acked)[-2], 3)
+
+    def test_follower_applies_batch(self):
+        follower = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        self.servers.append(follower)
+        now = int(time.time())
+        request = committed_batch([
+            send_message_entry(1, "alice", "bob", "One", now, index=1),
+            send_message_entry(2, "alice", "bob", "Two", now, index=2),
+            chat_pb2.LogEntry(index=3, delete_messages=chat_pb2.DeleteMessagesOp(username="bob", message_ids=[1])),
+        ])
+        response = follower.ReplicateBatch(request, None)
+        self.assertTrue(response.success)
+        self.assertEqual(response.last_index, 3)
+        self.assertEqual(follower.last_applied, 3)
+        follower.cursor.execute("SELECT id FROM messages")
+        self.assertEqual([row[0] for row in follower.cursor.fetchall()], [2])
+
+        # Resending the same entries is idempotent.
+        response = follower.ReplicateBatch(request, None)
+        self.assertTrue(response.success)
+        self.assertEqual(response.last_index, 3)
+        follower.cursor.execute("SELECT id FROM messages")
+        self.assertEqual([row[0] for row in follower.cursor.fetchall()], [2])
+
+    def test_follower_applies_only_what_the_leader_has_applied(self):
+        follower = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        self.servers.append(follower)
+        now = int(time.time())
+        stream = lambda request: list(follower.ReplicationStream(iter([request]), None))
+        entries = [send_message_entry(i, "alice", "bob", f"Msg {i}", now, index=i, term=1) for i in (1, 2, 3)]
+        [ack] = stream(chat_pb2.ReplicateBatchRequest(term=1, leader_address="127.0.0.1:50057", applied_index=1, entries=entries))
+        self.assertEqual((ack.success, ack.last_index), (True, 3))
+        # Entries 2 and 3 are logged but may not be committed yet, so they aren't in the tables.
+        self.assertEqual(follower.last_applied, 1)
+        follower.cursor.execute("SELECT id FROM messages")
+        self.assertEqual([row[0] for row in follower.cursor.fetchall()], [1])
+        self.assertEqual(follower.unread_counts, {"bob": 1})
+        # The leader's next heartbeat says it applied them.
+        follower.Heartbeat(chat_pb2.HeartbeatRequest(sender_address="127.0.0.1:50057", term=1, applied_index=3), None)
+        self.assertEqual(follower.last_applied, 3)
+        self.assertEqual(follower.unread_counts, {"bob": 3})
+
+    def test_follower_applies_mark_delivered_ranges(self):
+        follower = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        self.servers.append(follower)
+        now = int(time.time())
+        entries = [send_message_entry(i, "alice", "bob", f"Message {i}", now, index=i) for i in range(1, 5)]
+        entries.append(send_message_entry(5, "bob", "alice", "Reply", now, index=5))
+        # bob read 1-2 and 4 on the leader; 3 is still unread.
+        entries.append(chat_pb2.LogEntry(index=6, mark_delivered=chat_pb2.MarkDeliveredOp(ranges=[
+            chat_pb2.DeliveredRange(recipient="bob", first_id=1, last_id=2),
+            chat_pb2.DeliveredRange(recipient="bob", first_id=4, last_id=5),
+        ])))
+        response = follower.ReplicateBatch(committed_batch(entries), None)
+        self.assertTrue(response.success)
+        follower.cursor.execute("SELECT id, delivered FROM messages ORDER BY id")
+        # Message 5 falls in bob's range but is alice's, so it stays unread.
+        self.assertEqual(follower.cursor.fetchall(), [(1, 1), (2, 1), (3, 0), (4, 1), (5, 0)])
+        self.assertEqual(follower.unread_counts, {"bob": 1, "alice": 1})
+
+    def test_follower_rejects_gap_in_log(self):
+        follower = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        self.servers.append(follower)
+        request = chat_pb2.ReplicateBatchRequest(entries=[
+            send_message_entry(5, "alice", "bob", "Too far ahead", int(time.time()), index=5),
+        ])
+        catch_up_requests = []
+        follower.request_catch_up = lambda: catch_up_requests.append(True)
+        response = follower.ReplicateBatch(request, None)
+        self.assertFalse(response.success, "A batch that skips log indexes should be rejected.")
+        self.assertEqual(response.last_index, 0, "Follower should report where the leader must resend from.")
+        self.assertEqual(catch_up_requests, [True], "A gap should trigger an out-of-band catch-up.")
+
+    def test_empty_replica_bootstraps_from_snapshot(self):
+        source = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        replica = ChatServer(9, "127.0.0.1:50059", config_file="config.json")
+        self.servers.extend([source, replica])
+        SERVERS_BY_ADDRESS[source.address] = source
+
+        now = int(time.time())
+        entries = [create_account_entry("alice", index=1), create_account_entry("bob", index=2)]
+        entries += [send_message_entry(i, "alice", "bob", f"Msg {i}", now, index=i + 2) for i in range(1, 6)]
+        source.ReplicateBatch(committed_batch(entries), None)
+        # Rows written before the replicated log existed only reach a new replica via a snapshot.
+        source.cursor.execute("INSERT INTO messages (id, sender, recipient, message, timestamp) VALUES (100, 'bob', 'alice', 'legacy', ?)", (now,))
+        source.conn.commit()
+
+        chunks = list(source.StreamSnapshot(chat_pb2.SnapshotRequest(chunk_size=2), None))
+        self.assertTrue(all(len(chunk.users) + len(chunk.messages) <= 2 for chunk in chunks))
+        self.assertTrue(all(chunk.last_included_index == 7 for chunk in chunks))
+
+        replica.on_leader_contact(source.address, source.last_applied)
+        replica.synchronize_database()
+        self.assertEqual(replica.snapshot_index, 7)
+        self.assertEqual(replica.last_log_index, 7)
+        replica.cursor.execute("SELECT id FROM messages ORDER BY id")
+        self.assertEqual([row[0] for row in replica.cursor.fetchall()], [1, 2, 3, 4, 5, 100])
+        replica.cursor.execute("SELECT COUNT(*) FROM users")
+        self.assertEqual(replica.cursor.fetchone()[0], 2)
+
+        # Later entries stream in on top of the snapshot; replays of covered entries are skipped.
+        later = send_message_entry(6, "bob", "alice", "After snapshot", now, index=8)
+        self.assertTrue(replica.ReplicateBatch(committed_batch(entries[-1:] + [later]), None).success)
+        self.assertEqual(replica.last_applied, 8)
+
+    def test_snapshot_keeps_the_term_of_its_last_entry(self):
+        source = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        replica = ChatServer(9, "127.0.0.1:50059", config_file="config.json")
+        self.servers.extend([source, replica])
+        SERVERS_BY_ADDRESS[source.address] = source
+        now = int(time.time())
+        source.ReplicateBatch(committed_batch([
+            send_message_entry(i, "alice", "bob", f"Msg {i}", now, index=i, term=3) for i in range(1, 4)]), None)
+
+        replica.on_leader_contact(source.address, source.last_applied)
+        replica.synchronize_database()
+        self.assertEqual((replica.snapshot_index, replica.entry_term(3)), (3, 3))
+        # Persisted: a restarted replica still knows it.
+        replica.close()
+        replica = ChatServer(9, "127.0.0.1:50059", config_file="config.json")
+        self.servers.append(replica)
+        self.assertEqual(replica.entry_term(3), 3)
+        # So a candidate whose log ends in an older term doesn't get our vote.
+        candidate = ChatServer(10, "127.0.0.1:50060", config_file="config.json")
+        self.servers.append(candidate)
+        response = replica.RequestElection(chat_pb2.ElectionRequest(
+            sender_address=candidate.address, term=4, last_log_index=5, last_log_term=2), None)
+        self.assertFalse(response.ok)
+
+    def test_new_leader_catches_up_incrementally(self):
+        follower = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        candidate = ChatServer(10, "127.0.0.1:50060", config_file="config.json")
+        self.servers.extend([follower, candidate])
+        SERVERS_BY_ADDRESS[follower.address] = follower
+
+        now = int(time.time())
+        entries = [send_message_entry(i, "alice", "bob", f"Msg {i}", now, index=i) for i in range(1, 6)]
+        follower.ReplicateBatch(committed_batch(entries[:3]), None)
+        candidate.ReplicateBatch(committed_batch(entries[:3]), None)
+        follower.ReplicateBatch(committed_batch(entries[3:]), None)
+
+        # Only the entries after the requested index are sent, in bounded chunks.
+        chunks = list(follower.GetStateSince(chat_pb2.GetStateSinceRequest(log_index=2, max_chunk_entries=2), None))
+        self.assertEqual([len(chunk.entries) for chunk in chunks], [2, 1])
+        self.assertEqual(chunks[-1].entries[-1].index, 5)
+
+        candidate.on_leader_contact(follower.address, follower.last_applied)
+        candidate.synchronize_database()
+        self.assertEqual(candidate.last_log_index, 5)
+        candidate.cursor.execute("SELECT id FROM messages ORDER BY id")
+        self.assertEqual([row[0] for row in candidate.cursor.fetchall()], [1, 2, 3, 4, 5])
+
+    def test_catch_up_never_copies_a_stale_peers_log(self):
+        stale = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        leader = ChatServer(9, "127.0.0.1:50059", config_file="config.json")
+        replica = ChatServer(10, "127.0.0.1:50060", config_file="config.json")
+        self.servers.extend([stale, leader, replica])
+        SERVERS_BY_ADDRESS.update({stale.address: stale, leader.address: leader})
+
+        now = int(time.time())
+        # The stale peer holds a deposed leader's longer log from term 1; the leader is in term 2.
+        stale.ReplicateBatch(committed_batch([
+            send_message_entry(i, "alice", "bob", f"Old {i}", now, index=i, term=1) for i in range(1, 5)]), None)
+        leader.ReplicateBatch(committed_batch([
+            send_message_entry(i, "alice", "bob", f"New {i}", now, index=i, term=2) for i in range(1, 3)]), None)
+        replica.current_term = 2
+
+        # Without a known leader, nobody is copied from.
+        replica.synchronize_database()
+        self.assertEqual(replica.last_log_index, 0)
+        replica.on_leader_contact(leader.address, leader.last_applied)
+        replica.synchronize_database()
+        self.assertEqual(replica.last_log_index, 2)
+        replica.cursor.execute("SELECT message FROM messages ORDER BY id")
+        self.assertEqual([row[0] for row in replica.cursor.fetchall()], ["New 1", "New 2"])
+
+        # A peer named as leader but behind our term is not copied from either.
+        replica.leader_address = stale.address
+        replica.current_term = 3
+        replica.synchronize_database()
+        self.assertEqual(replica.last_log_index, 2)
+
+    def start_cluster(self):
         cluster = {}
         for info in self.config_data["servers"]:
-            s = ChatServer(info["id"], info["address"], config_file="config.json")
-            cluster[info["id"]] = s
-            self.servers.append(s)
-        
+            server = ChatServer(info["id"], info["address"], config_file="config.json")
+            cluster[info["id"]] = server
+            self.servers.append(server)
+            SERVERS_BY_ADDRESS[info["address"]] = server
+        time.sleep(max(server.lease_duration for server in cluster.values()))  # Let the promises assumed at startup run out
+        return cluster
+
+    def test_leader_election_simulation(self):
+        cluster = self.start_cluster()
         TEST_ALIVE_STATUS["127.0.0.1:50061"] = False  # Simulate current leader failure
 
         candidate = cluster[10]
-        candidate.is_leader = False
-        candidate.leader_address = None
-
         candidate.initiate_election()
-        self.assertTrue(candidate.is_leader,
-                        "Candidate should elect itself as leader when all higher peers are down.")
+        self.assertTrue(candidate.is_leader, "Candidate should win the votes of the live majority.")
+        self.assertEqual(candidate.current_term, 1)
+        for server_id in (7, 8, 9):
+            self.assertEqual(cluster[server_id].leader_address, candidate.address)
+            self.assertEqual(cluster[server_id].voted_for, 10)
+
+        # Each server votes once per term: a rival in the same term gets nothing.
+        rival = chat_pb2.ElectionRequest(sender_address=cluster[7].address, term=1)
+        self.assertFalse(cluster[8].RequestElection(rival, None).ok)
+
+    def test_election_requires_an_up_to_date_log(self):
+        cluster = self.start_cluster()
+        TEST_ALIVE_STATUS["127.0.0.1:50061"] = False
+        now = int(time.time())
+        entries = [send_message_entry(i, "alice", "bob", f"Message {i}", now, index=i, term=1) for i in (1, 2)]
+        for server_id in (7, 8, 9):
+            cluster[server_id].ReplicateBatch(chat_pb2.ReplicateBatchRequest(entries=entries), None)
+        cluster[10].ReplicateBatch(chat_pb2.ReplicateBatchRequest(entries=entries[:1]), None)
+
+        # 10 missed entry 2, which a majority holds; electing it would lose that write.
+        cluster[10].initiate_election()
+        self.assertFalse(cluster[10].is_leader)
+        cluster[9].initiate_election()
+        self.assertTrue(cluster[9].is_leader)
+        self.assertEqual(cluster[10].leader_address, cluster[9].address)
+        self.assertEqual(cluster[9].current_term, 3)
+
+        # Its no-op entry from term 3 commits the term 1 entries under it, so they are
+        # applied without waiting for a client write.
+        leader = cluster[9]
+        deadline = time.time() + 5
+        while leader.last_applied < 3 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual((leader.last_applied, leader.entry_term(3)), (3, 3))
+        leader.cursor.execute("SELECT id FROM messages ORDER BY id")
+        self.assertEqual([row[0] for row in leader.cursor.fetchall()], [1, 2])
+
+    def test_deposed_leader_steps_down_and_its_entries_are_overwritten(self):
+        follower = ChatServer(8, "127.0.0.1:50058", config_file="config.json")
+        self.servers.append(follower)
+        now = int(time.time())
+        stream = lambda *requests: list(follower.ReplicationStream(iter(requests), None))
+        messages = lambda: follower.cursor.execute("SELECT id, sender, message FROM messages ORDER BY id").fetchall()
+        # Entry 2 came from a leader of term 1 that was deposed before a majority had it, so
+        # that leader had only applied entry 1.
+        stream(chat_pb2.ReplicateBatchRequest(term=1, applied_index=1, entries=[
+            send_message_entry(1, "alice", "bob", "Committed", now, index=1, term=1),
+            send_message_entry(2, "alice", "bob", "Lost", now, index=2, term=1),
+        ]))
+        self.assertEqual(messages(), [(1, "alice", "Committed")])
+
+        # The term 2 leader has a different entry 3 after its entry 2: the prev_log_term check
+        # finds our entry 2 conflicts, drops it, and asks for it again.
+        new_leader = "127.0.0.1:50057"
+        new_entries = [send_message_entry(2, "carol", "bob", "Replacement", now, index=2, term=2),
+                       send_message_entry(3, "carol", "bob", "Next", now, index=3, term=2)]
+        [ack] = stream(chat_pb2.ReplicateBatchRequest(term=2, leader_address=new_leader, prev_log_term=2, entries=new_entries[1:]))
+        self.assertEqual((ack.success, ack.last_index, ack.term), (False, 1, 2))
+        [ack] = stream(chat_pb2.ReplicateBatchRequest(term=2, leader_address=new_leader, prev_log_term=1, entries=new_entries))
+        self.assertEqual((ack.success, ack.last_index), (True, 3))
+        self.assertEqual([follower.entry_term(i) for i in (1, 2, 3)], [1, 2, 2])
+        # Once the new leader has applied them, its entries are what reaches the tables.
+        follower.Heartbeat(chat_pb2.HeartbeatRequest(sender_address=new_leader, term=2, applied_index=3), None)
+        self.assertEqual(messages(), [(1, "alice", "Committed"), (2, "carol", "Replacement"), (3, "carol", "Next")])
+        self.assertEqual(follower.unread_counts, {"bob": 3})
+
+        # Applied entries are committed: a batch that conflicts with them is refused, not applied.
+        [ack] = stream(chat_pb2.ReplicateBatchRequest(term=2, leader_address=new_leader, entries=[
+            send_message_entry(3, "dave", "bob", "Conflicting", now, index=3, term=1)]))
+        self.assertFalse(ack.success)
+        self.assertEqual(follower.entry_term(3), 2)
+        self.assertEqual(messages()[-1], (3, "carol", "Next"))
+
+        # The old leader's late batches are refused with the newer term...
+        [ack] = stream(chat_pb2.ReplicateBatchRequest(term=1, prev_log_term=1, entries=[
+            send_message_entry(3, "alice", "bob", "Stale", now, index=3, term=1)]))
+        self.assertFalse(ack.success)
+        self.assertEqual(follower.entry_term(3), 2)
+        # ...and seeing that term makes it step down.
+        old_leader = ChatServer(9, "127.0.0.1:50059", config_file="config.json")
+        self.servers.append(old_leader)
+        old_leader.current_term = 1
+        old_leader.is_leader = True
+        old_leader.leader_address = old_leader.address
+        old_leader.on_heartbeat_responses(time.time(), old_leader.peers[:1], [chat_pb2.HeartbeatResponse(term=ack.term)])
+        self.assertFalse(old_leader.is_leader)
+        self.assertEqual(old_leader.current_term, 2)
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
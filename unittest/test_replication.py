@@ -25,13 +25,31 @@ class FakeReplicationStub:
 
     def ReplicateOperation(self, request, timeout=None):
         # Debug print to see which address is being contacted.
-        print(f"FakeReplicationStub called for address {self.address} with operation: {request.operation}")
+        print(f"FakeReplicationStub called for address {self.address} with entry {request.entry.index}")
         if not TEST_ALIVE_STATUS.get(self.address, False):
             raise grpc.RpcError("Simulated server failure")
         # Return a fake successful response.
         from chat_pb2 import ReplicateResponse
         return ReplicateResponse(success=True)
 
+    def ReplicateBatch(self, request, timeout=None):
+        print(f"FakeReplicationStub called for address {self.address} with {len(request.entries)} entries")
+        if not TEST_ALIVE_STATUS.get(self.address, False):
+            raise grpc.RpcError("Simulated server failure")
+        from chat_pb2 import ReplicateBatchResponse
+        return ReplicateBatchResponse(success=True, last_index=request.entries[-1].index)
+
+    def ReplicationStream(self, request_iterator, timeout=None):
+        from chat_pb2 import ReplicateBatchResponse
+        last_index = 0
+        for request in request_iterator:
+            print(f"FakeReplicationStub streamed {len(request.entries)} entries to {self.address}")
+            if not TEST_ALIVE_STATUS.get(self.address, False):
+                raise grpc.RpcError("Simulated server failure")
+            if request.entries:
+                last_index = request.entries[-1].index
+            yield ReplicateBatchResponse(success=True, last_index=last_index)
+
 class FakeChannel:
     def __init__(self, address):
         self.address = address
@@ -45,7 +63,7 @@ class FakeChannel:
     def close(self):
         pass
 
-def fake_insecure_channel(address):
+def fake_insecure_channel(address, options=None):
     return FakeChannel(address)
 
 # Save original functions to restore later.
@@ -118,13 +136,14 @@ class TestChatSystem(unittest.TestCase):
         server7.is_leader = True
 
         # Simulate CreateAccount operation.
-        password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt()).decode()
-        create_op = f"CreateAccount:testuser:{password_hash}"
+        password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt())
+        create_op = chat_pb2.LogEntry(index=1, create_account=chat_pb2.CreateAccountOp(username="testuser", password_hash=password_hash))
         server7.apply_operation(create_op)
 
         # Simulate sending a message.
         current_time = int(time.time())
-        send_op = f"SendMessage:1:testuser:anotheruser:Hello:{current_time}"
+        send_op = chat_pb2.LogEntry(index=2, send_message=chat_pb2.SendMessageOp(
+            id=1, sender="testuser", recipient="anotheruser", message="Hello", timestamp=current_time))
         server7.apply_operation(send_op)
 
         # Verify that the data exists.
@@ -142,6 +161,7 @@ class TestChatSystem(unittest.TestCase):
         self.assertIsNotNone(server7_new.cursor.fetchone(), "User should persist after a restart.")
         server7_new.cursor.execute("SELECT message FROM messages WHERE id = 1")
         self.assertIsNotNone(server7_new.cursor.fetchone(), "Message should persist after a restart.")
+        self.assertEqual(server7_new.last_applied, 2, "Applied log index should persist after a restart.")
 
     def test_fault_tolerance(self):
         """
@@ -161,7 +181,8 @@ class TestChatSystem(unittest.TestCase):
         leader.leader_address = leader.address
 
         # With all peers up, replication should succeed.
-        op1 = f"CreateAccount:replicauser:{bcrypt.hashpw(b'password', bcrypt.gensalt()).decode()}"
+        op1 = leader.append_to_log(chat_pb2.LogEntry(create_account=chat_pb2.CreateAccountOp(
+            username="replicauser", password_hash=bcrypt.hashpw(b"password", bcrypt.gensalt()))))
         result1 = leader.replicate_operation(op1)
         self.assertTrue(result1, "Replication should succeed when all peers are up.")
 
@@ -169,13 +190,15 @@ class TestChatSystem(unittest.TestCase):
         TEST_ALIVE_STATUS["127.0.0.1:50058"] = False
         TEST_ALIVE_STATUS["127.0.0.1:50059"] = False
 
-        op2 = f"SendMessage:2:replicauser:otheruser:Hi:{int(time.time())}"
+        op2 = leader.append_to_log(chat_pb2.LogEntry(send_message=chat_pb2.SendMessageOp(
+            id=2, sender="replicauser", recipient="otheruser", message="Hi", timestamp=int(time.time()))))
         result2 = leader.replicate_operation(op2)
         self.assertTrue(result2, "Replication should succeed with two peers down (meeting 2-fault tolerance).")
 
         # Simulate failure of a third peer (e.g., take down 127.0.0.1:50060).
         TEST_ALIVE_STATUS["127.0.0.1:50060"] = False
-        op3 = f"SendMessage:3:replicauser:otheruser:Hey:{int(time.time())}"
+        op3 = leader.append_to_log(chat_pb2.LogEntry(send_message=chat_pb2.SendMessageOp(
+            id=3, sender="replicauser", recipient="otheruser", message="Hey", timestamp=int(time.time()))))
         result3 = leader.replicate_operation(op3)
         self.assertFalse(result3, "Replication should fail if more than 2 peers are down.")
 
@@ -0,0 +1,78 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from storage_writer import StorageWriter
+
+
+class TestStorageWriter(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.test_dir, "chat.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE NOT NULL)")
+        conn.commit()
+        conn.close()
+        self.writers = []
+
+    def tearDown(self):
+        for writer in self.writers:
+            writer.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def start(self, **kwargs):
+        writer = StorageWriter(self.db_path, **kwargs)
+        self.writers.append(writer)
+        return writer
+
+    def usernames(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return [row[0] for row in conn.execute("SELECT username FROM users ORDER BY id")]
+        finally:
+            conn.close()
+
+    def insert(self, username):
+        return lambda cursor: cursor.execute("INSERT INTO users (username) VALUES (?)", (username,)).lastrowid
+
+    def test_writes_queued_together_share_one_commit(self):
+        # The batch fills up (5 writes) long before max_delay_ms runs out.
+        writer = self.start(max_batch_size=5, max_delay_ms=1000)
+        statements = []
+        trace = writer.submit(lambda cursor: cursor.connection.set_trace_callback(statements.append))
+        inserts = [writer.submit(self.insert(f"user{i}")) for i in range(4)]
+        for future in [trace] + inserts:
+            future.result(timeout=5)
+        self.assertEqual(statements.count("COMMIT"), 1)
+
+    def test_commits_are_fsynced(self):
+        # synchronous=FULL (2): a resolved future means the write is on disk.
+        writer = self.start()
+        self.assertEqual(writer.execute(lambda cursor: cursor.execute("PRAGMA synchronous").fetchone()[0]), 2)
+
+    def test_failing_write_rolls_back_alone(self):
+        writer = self.start(max_batch_size=3, max_delay_ms=1000)
+        first = writer.submit(self.insert("alice"))
+        duplicate = writer.submit(self.insert("alice"))
+        last = writer.submit(self.insert("bob"))
+        self.assertIsNotNone(first.result(timeout=5))
+        self.assertIsNotNone(last.result(timeout=5))
+        with self.assertRaises(sqlite3.IntegrityError):
+            duplicate.result(timeout=5)
+        self.assertEqual(self.usernames(), ["alice", "bob"])
+
+    def test_futures_resolve_after_the_commit_is_visible(self):
+        writer = self.start()
+        future = writer.submit(self.insert("carol"))
+        future.result(timeout=5)
+        # Another connection sees the row as soon as the future has resolved.
+        self.assertIn("carol", self.usernames())
+        # execute() waits for the commit and returns the write's result.
+        self.assertIsInstance(writer.execute(self.insert("carol_2")), int)
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)